@@ -6,13 +6,21 @@ Main application for Web Edition with Flask + Socket.IO
 import os
 import logging
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
 
 from config import get_config, APP_INFO
-from backend.database import db, init_database
-from backend.services import meter_service
+from backend.database import db, init_database, init_storage
+from backend.json_provider import SocketIOJSON, init_json
+from backend.modbus import modbus_trace
+from backend.services import (meter_service, dashboard_aggregator, system_metrics, RequestCoalescer,
+                              sampling_profiler, init_scheduler, start_scheduler)
+from backend.services.metrics import (METER_SWEEP_SECONDS, METER_SWEEP_REQUESTS, SOCKETIO_FANOUT_SECONDS,
+                                      SOCKETIO_CLIENTS, render_metrics)
+
+# 合併多個瀏覽器同時發出的全電表請求 (時間窗於 create_app 依配置設定)
+sweep_coalescer = RequestCoalescer()
 
 
 def create_app(config_name=None):
@@ -33,6 +41,9 @@ def create_app(config_name=None):
     config_class = get_config(config_name)
     app.config.from_object(config_class)
     
+    # JSON 序列化 (orjson 可用時使用) / JSON serialization
+    init_json(app)
+    
     # 設置日誌 / Setup logging
     setup_logging(app)
     
@@ -43,10 +54,14 @@ def create_app(config_name=None):
         cors_allowed_origins=app.config['SOCKETIO_CORS_ALLOWED_ORIGINS'],
         async_mode=app.config['SOCKETIO_ASYNC_MODE'],
         logger=app.config['SOCKETIO_LOGGER'],
-        engineio_logger=app.config['SOCKETIO_ENGINEIO_LOGGER']
+        engineio_logger=app.config['SOCKETIO_ENGINEIO_LOGGER'],
+        json=SocketIOJSON
     )
     CORS(app, origins=app.config['CORS_ORIGINS'])
     
+    # 套用 SQLite 儲存設定 / Apply SQLite storage profile
+    init_storage(app)
+    
     # 初始化數據庫 / Initialize database
     init_database(app)
     
@@ -54,14 +69,22 @@ def create_app(config_name=None):
     register_blueprints(app)
     
     # 註冊 Socket.IO 事件 / Register Socket.IO events
+    sweep_coalescer.window = app.config.get('METER_SWEEP_COALESCE_WINDOW', 1.0)
+    modbus_trace.resize(app.config.get('RTU_TRACE_CAPACITY', 4096))
     register_socket_events(socketio)
     
+    # 取樣式效能分析掛鉤 (預設停用) / Sampling profiler hooks
+    sampling_profiler.init_app(app, socketio)
+    
     # 添加模板全局變量 / Add template global variables
     register_template_globals(app)
     
     # 註冊錯誤處理器 / Register error handlers
     register_error_handlers(app)
     
+    # 註冊排程工作 (每日重置、歷史維護) / Register scheduled jobs
+    init_scheduler(app)
+    
     return app, socketio
 
 
@@ -69,7 +92,7 @@ def setup_logging(app):
     """設置日誌系統 / Setup logging system"""
     if not app.debug:
         # 生產環境日誌設定 / Production logging setup
-        file_handler = logging.FileHandler(app.config['LOG_FILE'])
+        file_handler = logging.FileHandler(app.config['LOG_FILE'], encoding='utf-8')
         file_handler.setFormatter(logging.Formatter(
             '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
         ))
@@ -97,12 +120,14 @@ def register_socket_events(socketio):
     def handle_connect():
         """客戶端連接事件 / Client connect event"""
         print(f'Client connected: {request.sid}')
+        SOCKETIO_CLIENTS.inc()
         emit('status', {'message': 'Connected to Power Meter Web Edition'})
     
     @socketio.on('disconnect')
     def handle_disconnect():
         """客戶端斷開事件 / Client disconnect event"""
         print(f'Client disconnected: {request.sid}')
+        SOCKETIO_CLIENTS.dec()
     
     @socketio.on('join_room')
     def handle_join_room(data):
@@ -118,6 +143,161 @@ def register_socket_events(socketio):
         leave_room(room)
         emit('status', {'message': f'Left room: {room}'})
     
+    def sweep_all_meters(rtu_client, rtu_enabled):
+        """讀取所有電表並批量寫入數據庫 (一次完整掃描)"""
+        with METER_SWEEP_SECONDS.time():
+            return _sweep_all_meters(rtu_client, rtu_enabled)
+    
+    def _sweep_all_meters(rtu_client, rtu_enabled):
+        all_meter_data = []
+        meter_count = app.config.get('METER_COUNT', 50)
+        meters_to_save = []  # 用於批量保存到數據庫
+        
+        # 檢查當前供電時段
+        current_power_active = meter_service.is_power_schedule_active('open_power')
+        
+        if rtu_enabled and rtu_client:
+            # 使用 RTU 客戶端批量讀取
+            meter_ids = list(range(1, meter_count + 1))
+            meter_data_dict = rtu_client.read_multiple_meters(meter_ids)
+            
+            for i in range(1, meter_count + 1):
+                if i in meter_data_dict and meter_data_dict[i].get('online', False):
+                    raw_data = meter_data_dict[i]
+                    
+                    # 從數據庫獲取持久化數據
+                    db_meter = meter_service.get_meter_current_data(i)
+                    
+                    # 根據供電時段決定實際供電狀態
+                    actual_power_on = current_power_active and raw_data.get('is_powered', True)
+                    actual_power_status = 'powered' if actual_power_on else 'unpowered'
+                    actual_status = 'online' if actual_power_on else 'powered_off'
+                    
+                    # 準備保存到數據庫的數據
+                    save_data = {
+                        'meter_id': i,
+                        'name': f'RTU電表{i:02d}',
+                        'parking': f'RTU-{i:04d}',
+                        'voltage': round(raw_data.get('voltage_avg', 0), 1) if actual_power_on else 0.0,
+                        'current': round(raw_data.get('current_total', 0), 1) if actual_power_on else 0.0,
+                        'power': round(raw_data.get('instant_power', raw_data.get('power_active', 0)), 1) if actual_power_on else 0.0,
+                        'energy': round(raw_data.get('total_energy', 0), 1),
+                        'power_on': actual_power_on,
+                        'power_status': actual_power_status,
+                        'simulated': raw_data.get('simulated', False)
+                    }
+                    meters_to_save.append(save_data)
+                    
+                    # 準備返回給前端的數據 (使用數據庫的累積數據)
+                    meter_data = {
+                        'id': i,
+                        'meter_id': i,
+                        'name': f'RTU電表{i:02d}',
+                        'parking': f'RTU-{i:04d}',
+                        'status': actual_status,
+                        'power_on': actual_power_on,
+                        'voltage': round(raw_data.get('voltage_avg', 0), 1) if actual_power_on else 0.0,
+                        'current': round(raw_data.get('current_total', 0), 1) if actual_power_on else 0.0,
+                        'power': round(raw_data.get('instant_power', raw_data.get('power_active', 0)), 1) if actual_power_on else 0.0,
+                        'energy': round(raw_data.get('total_energy', 0), 1),
+                        'daily_energy': db_meter['daily_energy'] if db_meter else 0.0,
+                        'cost_today': db_meter['cost_today'] if db_meter else 0.0,
+                        'power_status': actual_power_status,
+                        'timestamp': raw_data.get('timestamp', datetime.now().isoformat())
+                    }
+                else:
+                    # 電表離線，從數據庫獲取最後已知狀態
+                    dashboard_aggregator.mark_offline(i)
+                    db_meter = meter_service.get_meter_current_data(i)
+                    
+                    # 離線時按供電時段決定狀態顯示
+                    offline_power_status = 'powered' if current_power_active else 'unpowered'
+                    offline_status = 'offline'
+                    
+                    if db_meter:
+                        meter_data = db_meter.copy()
+                        meter_data.update({
+                            'status': offline_status,
+                            'power_on': current_power_active,
+                            'voltage': 0.0,  # 離線時無電壓
+                            'current': 0.0,  # 離線時無電流
+                            'power': 0.0,    # 離線時無功率
+                            'power_status': offline_power_status
+                        })
+                    else:
+                        # 創建默認離線數據
+                        meter_data = {
+                            'id': i,
+                            'meter_id': i,
+                            'name': f'RTU電表{i:02d}',
+                            'parking': f'RTU-{i:04d}',
+                            'status': offline_status,
+                            'power_on': current_power_active,
+                            'voltage': 0.0,
+                            'current': 0.0,
+                            'power': 0.0,
+                            'energy': 0.0,
+                            'daily_energy': 0.0,
+                            'cost_today': 0.0,
+                            'power_status': offline_power_status,
+                            'timestamp': datetime.now().isoformat()
+                        }
+                
+                all_meter_data.append(meter_data)
+        else:
+            # 模擬模式：從數據庫獲取持久化數據，如果沒有則使用模擬數據
+            for i in range(1, meter_count + 1):
+                db_meter = meter_service.get_meter_current_data(i)
+                
+                # 模擬模式也要按供電時段決定狀態
+                simulated_power_status = 'powered' if current_power_active else 'unpowered'
+                simulated_status = 'simulated'
+                
+                if db_meter:
+                    # 使用數據庫中的持久化數據
+                    meter_data = db_meter.copy()
+                    meter_data.update({
+                        'status': simulated_status,
+                        'power_on': current_power_active,
+                        'voltage': (220.0 + (i % 10)) if current_power_active else 0.0,
+                        'current': (15.0 + (i % 5)) if current_power_active else 0.0,
+                        'power': (3300.0 + (i * 10)) if current_power_active else 0.0,
+                        'power_status': simulated_power_status
+                    })
+                else:
+                    # 創建模擬數據並保存到數據庫
+                    meter_data = {
+                        'id': i,
+                        'meter_id': i,
+                        'name': f'RTU電表{i:02d}',
+                        'parking': f'RTU-{i:04d}',
+                        'status': simulated_status,
+                        'power_on': current_power_active,
+                        'voltage': (220.0 + (i % 10)) if current_power_active else 0.0,
+                        'current': (15.0 + (i % 5)) if current_power_active else 0.0,
+                        'power': (3300.0 + (i * 10)) if current_power_active else 0.0,
+                        'energy': i * 50.5,
+                        'daily_energy': 0.0,
+                        'cost_today': 0.0,
+                        'power_status': simulated_power_status,
+                        'timestamp': datetime.now().isoformat()
+                    }
+                    
+                    # 保存到數據庫
+                    meter_service.save_meter_data(meter_data)
+                
+                all_meter_data.append(meter_data)
+        
+        # 批量保存 RTU 數據到數據庫
+        if meters_to_save:
+            meter_service.batch_save_meters(meters_to_save)
+        
+        return {
+            'data': all_meter_data,
+            'rtu_enabled': rtu_enabled,
+            'connection_status': rtu_client.get_connection_status() if rtu_client else {}
+        }
+    
     @socketio.on('request_meter_data')
     def handle_meter_data_request(data):
         """請求電表數據事件 / Request meter data event"""
@@ -127,9 +307,6 @@ def register_socket_events(socketio):
         all_meters = data.get('all_meters', False)
         meter_id = data.get('meter_id')
         
-        # 檢查並自動重置每日用電量
-        meter_service.check_and_auto_reset_daily()
-        
         # 使用 RTU 客戶端獲取真實數據
         try:
             from backend.modbus.rtu_client import ModbusRTUClient
@@ -155,156 +332,22 @@ def register_socket_events(socketio):
             rtu_enabled = False
         
         if all_meters:
-            # 返回所有電表數據
-            all_meter_data = []
-            meter_count = app.config.get('METER_COUNT', 50)
-            meters_to_save = []  # 用於批量保存到數據庫
-            
-            # 檢查當前供電時段
-            current_power_active = meter_service.is_power_schedule_active('open_power')
-            
-            if rtu_enabled and rtu_client:
-                # 使用 RTU 客戶端批量讀取
-                meter_ids = list(range(1, meter_count + 1))
-                meter_data_dict = rtu_client.read_multiple_meters(meter_ids)
-                
-                for i in range(1, meter_count + 1):
-                    if i in meter_data_dict and meter_data_dict[i].get('online', False):
-                        raw_data = meter_data_dict[i]
-                        
-                        # 從數據庫獲取持久化數據
-                        db_meter = meter_service.get_meter_current_data(i)
-                        
-                        # 根據供電時段決定實際供電狀態
-                        actual_power_on = current_power_active and raw_data.get('is_powered', True)
-                        actual_power_status = 'powered' if actual_power_on else 'unpowered'
-                        actual_status = 'online' if actual_power_on else 'powered_off'
-                        
-                        # 準備保存到數據庫的數據
-                        save_data = {
-                            'meter_id': i,
-                            'name': f'RTU電表{i:02d}',
-                            'parking': f'RTU-{i:04d}',
-                            'voltage': round(raw_data.get('voltage_avg', 0), 1) if actual_power_on else 0.0,
-                            'current': round(raw_data.get('current_total', 0), 1) if actual_power_on else 0.0,
-                            'power': round(raw_data.get('instant_power', raw_data.get('power_active', 0)), 1) if actual_power_on else 0.0,
-                            'energy': round(raw_data.get('total_energy', 0), 1),
-                            'power_on': actual_power_on,
-                            'power_status': actual_power_status
-                        }
-                        meters_to_save.append(save_data)
-                        
-                        # 準備返回給前端的數據 (使用數據庫的累積數據)
-                        meter_data = {
-                            'id': i,
-                            'meter_id': i,
-                            'name': f'RTU電表{i:02d}',
-                            'parking': f'RTU-{i:04d}',
-                            'status': actual_status,
-                            'power_on': actual_power_on,
-                            'voltage': round(raw_data.get('voltage_avg', 0), 1) if actual_power_on else 0.0,
-                            'current': round(raw_data.get('current_total', 0), 1) if actual_power_on else 0.0,
-                            'power': round(raw_data.get('instant_power', raw_data.get('power_active', 0)), 1) if actual_power_on else 0.0,
-                            'energy': round(raw_data.get('total_energy', 0), 1),
-                            'daily_energy': db_meter['daily_energy'] if db_meter else 0.0,
-                            'cost_today': db_meter['cost_today'] if db_meter else 0.0,
-                            'power_status': actual_power_status,
-                            'timestamp': raw_data.get('timestamp', datetime.now().isoformat())
-                        }
-                    else:
-                        # 電表離線，從數據庫獲取最後已知狀態
-                        db_meter = meter_service.get_meter_current_data(i)
-                        
-                        # 離線時按供電時段決定狀態顯示
-                        offline_power_status = 'powered' if current_power_active else 'unpowered'
-                        offline_status = 'offline'
-                        
-                        if db_meter:
-                            meter_data = db_meter.copy()
-                            meter_data.update({
-                                'status': offline_status,
-                                'power_on': current_power_active,
-                                'voltage': 0.0,  # 離線時無電壓
-                                'current': 0.0,  # 離線時無電流
-                                'power': 0.0,    # 離線時無功率
-                                'power_status': offline_power_status
-                            })
-                        else:
-                            # 創建默認離線數據
-                            meter_data = {
-                                'id': i,
-                                'meter_id': i,
-                                'name': f'RTU電表{i:02d}',
-                                'parking': f'RTU-{i:04d}',
-                                'status': offline_status,
-                                'power_on': current_power_active,
-                                'voltage': 0.0,
-                                'current': 0.0,
-                                'power': 0.0,
-                                'energy': 0.0,
-                                'daily_energy': 0.0,
-                                'cost_today': 0.0,
-                                'power_status': offline_power_status,
-                                'timestamp': datetime.now().isoformat()
-                            }
-                    
-                    all_meter_data.append(meter_data)
-            else:
-                # 模擬模式：從數據庫獲取持久化數據，如果沒有則使用模擬數據
-                for i in range(1, meter_count + 1):
-                    db_meter = meter_service.get_meter_current_data(i)
-                    
-                    # 模擬模式也要按供電時段決定狀態
-                    simulated_power_status = 'powered' if current_power_active else 'unpowered'
-                    simulated_status = 'simulated'
-                    
-                    if db_meter:
-                        # 使用數據庫中的持久化數據
-                        meter_data = db_meter.copy()
-                        meter_data.update({
-                            'status': simulated_status,
-                            'power_on': current_power_active,
-                            'voltage': (220.0 + (i % 10)) if current_power_active else 0.0,
-                            'current': (15.0 + (i % 5)) if current_power_active else 0.0,
-                            'power': (3300.0 + (i * 10)) if current_power_active else 0.0,
-                            'power_status': simulated_power_status
-                        })
-                    else:
-                        # 創建模擬數據並保存到數據庫
-                        meter_data = {
-                            'id': i,
-                            'meter_id': i,
-                            'name': f'RTU電表{i:02d}',
-                            'parking': f'RTU-{i:04d}',
-                            'status': simulated_status,
-                            'power_on': current_power_active,
-                            'voltage': (220.0 + (i % 10)) if current_power_active else 0.0,
-                            'current': (15.0 + (i % 5)) if current_power_active else 0.0,
-                            'power': (3300.0 + (i * 10)) if current_power_active else 0.0,
-                            'energy': i * 50.5,
-                            'daily_energy': 0.0,
-                            'cost_today': 0.0,
-                            'power_status': simulated_power_status,
-                            'timestamp': datetime.now().isoformat()
-                        }
-                        
-                        # 保存到數據庫
-                        meter_service.save_meter_data(meter_data)
-                    
-                    all_meter_data.append(meter_data)
-            
-            # 批量保存 RTU 數據到數據庫
-            if meters_to_save:
-                meter_service.batch_save_meters(meters_to_save)
-            
-            emit('meter_data_response', {
-                'request_id': request_id,
-                'success': True,
-                'data': all_meter_data,
-                'rtu_enabled': rtu_enabled,
-                'connection_status': rtu_client.get_connection_status() if rtu_client else {},
-                'timestamp': datetime.now().isoformat()
-            })
+            # 返回所有電表數據 (同一時間窗內的並行請求共用一次掃描與數據庫寫入)
+            sweep, shared = sweep_coalescer.run(
+                'all_meters', lambda: sweep_all_meters(rtu_client, rtu_enabled)
+            )
+            METER_SWEEP_REQUESTS.labels('shared' if shared else 'computed').inc()
+            
+            with SOCKETIO_FANOUT_SECONDS.labels('meter_data_response').time():
+                emit('meter_data_response', {
+                    'request_id': request_id,
+                    'success': True,
+                    'data': sweep['data'],
+                    'rtu_enabled': sweep['rtu_enabled'],
+                    'connection_status': sweep['connection_status'],
+                    'coalesced': shared,
+                    'timestamp': datetime.now()
+                })
             print(f"Sent all meter data response for request {request_id}")
         
         elif meter_id:
@@ -313,9 +356,10 @@ def register_socket_events(socketio):
                 raw_data = rtu_client.read_meter_data(meter_id)
                 
                 if raw_data.get('online', False):
-                    # 計算金額：每日用電量 × 電價（3.5元/kWh）
+                    # 計算金額：每日用電量 × 目前電價表的基本單價
+                    from backend.services.tariff_engine import tariff_engine
                     daily_energy = round(raw_data.get('daily_energy_usage', 0), 1)
-                    cost_today = round(daily_energy * 3.5, 2)
+                    cost_today = round(daily_energy * tariff_engine.get_base_price(), 2)
                     
                     meter_data = {
                         'id': meter_id,
@@ -542,11 +586,12 @@ def register_socket_events(socketio):
                 })
                 
                 # 廣播給所有客戶端，通知供電時段已變更
-                socketio.emit('power_schedule_changed', {
-                    'schedule': schedule,
-                    'message': '供電時段已更新，正在同步電表狀態...',
-                    'timestamp': datetime.now().isoformat()
-                }, broadcast=True)
+                with SOCKETIO_FANOUT_SECONDS.labels('power_schedule_changed').time():
+                    socketio.emit('power_schedule_changed', {
+                        'schedule': schedule,
+                        'message': '供電時段已更新，正在同步電表狀態...',
+                        'timestamp': datetime.now().isoformat()
+                    }, broadcast=True)
                 
                 print(f"Power schedule updated and broadcasted: {schedule}")
             else:
@@ -840,35 +885,46 @@ def system_info():
 @app.route('/api/system/status')
 def system_status():
     """系統狀態 API / System status API"""
-    import psutil
+    metrics = system_metrics.get_latest()
     
     return jsonify({
         'success': True,
         'data': {
             'app_info': APP_INFO,
             'system': {
-                'cpu_percent': psutil.cpu_percent(interval=1),
+                'cpu_percent': metrics['cpu_percent'],
                 'memory': {
-                    'percent': psutil.virtual_memory().percent,
-                    'used': psutil.virtual_memory().used,
-                    'total': psutil.virtual_memory().total
+                    'percent': metrics['memory']['percent'],
+                    'used': metrics['memory']['used'],
+                    'total': metrics['memory']['total']
                 },
                 'disk': {
-                    'percent': psutil.disk_usage('/').percent,
-                    'used': psutil.disk_usage('/').used,
-                    'total': psutil.disk_usage('/').total
-                }
+                    'percent': metrics['disk']['percent'],
+                    'used': metrics['disk']['used'],
+                    'total': metrics['disk']['total']
+                },
+                'process': metrics['process'],
+                'sampled_at': metrics['sampled_at']
             },
             'config': {
                 'environment': 'development' if app.debug else 'production',
                 'debug_mode': app.debug,
                 'meter_count': app.config['METER_COUNT']
             },
+            'uptime': system_metrics.get_uptime(),
             'timestamp': datetime.now().isoformat()
         }
     })
 
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus 指標 / Prometheus metrics"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return jsonify({'success': False, 'error': 'Metrics endpoint disabled'}), 404
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
 if __name__ == '__main__':
     """應用程式入口點 / Application entry point"""
     
@@ -885,6 +941,9 @@ if __name__ == '__main__':
     print(f"📊 Excel interface: http://{host}:{port}/excel")
     print("=" * 60)
     
+    # 啟動背景排程器 / Start background scheduler
+    start_scheduler(app, use_reloader=debug)
+    
     # 啟動 Socket.IO 服務器 / Start Socket.IO server
     socketio.run(
         app,
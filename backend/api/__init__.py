@@ -9,4 +9,4 @@ from flask import Blueprint
 api_bp = Blueprint('api', __name__)
 
 # 導入路由模組 / Import route modules
-from . import meters, system, charts, config, history, config_sync
\ No newline at end of file
+from . import meters, system, charts, config, history, config_sync, rtu_endpoints
\ No newline at end of file
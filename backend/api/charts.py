@@ -5,7 +5,8 @@
 import json
 import random
 from datetime import datetime, timedelta
-from flask import request, jsonify, current_app
+from urllib.parse import urlencode
+from flask import Response, request, jsonify, current_app, stream_with_context
 from . import api_bp
 
 
@@ -238,115 +239,18 @@ def get_dashboard_chart_data():
     """
     獲取儀表板圖表數據 / Get dashboard chart data
     
+    由讀數寫入時維護的彙總狀態直接序列化，不讀取電表
+    
     Returns:
         JSON: 儀表板數據
     """
     try:
-        # 從 RTU 客戶端獲取真實數據 / Get real data from RTU client
-        meter_count = current_app.config['METER_COUNT']
-        
-        # 嘗試使用 RTU 客戶端獲取真實數據
-        try:
-            from ..modbus.rtu_client import ModbusRTUClient
-            
-            rtu_config = {
-                'rtu_port': current_app.config['RTU_PORT'],
-                'baudrate': current_app.config['RTU_BAUDRATE'],
-                'bytesize': current_app.config['RTU_BYTESIZE'],
-                'parity': current_app.config['RTU_PARITY'],
-                'stopbits': current_app.config['RTU_STOPBITS'],
-                'timeout': current_app.config['RTU_TIMEOUT'],
-                'cache_expiry': current_app.config['RTU_CACHE_EXPIRY'],
-                'RTU_SIMULATOR_PORT': current_app.config.get('RTU_SIMULATOR_PORT', 5502)
-            }
-            
-            rtu_client = ModbusRTUClient(rtu_config)
-            rtu_enabled = current_app.config.get('RTU_ENABLED', False)
-            
-            if rtu_enabled and rtu_client:
-                # 從 RTU 讀取前 10 個電表的數據進行統計
-                meter_ids = list(range(1, min(11, meter_count + 1)))
-                meter_data_dict = rtu_client.read_multiple_meters(meter_ids)
-                
-                # 計算真實統計數據
-                online_count = sum(1 for data in meter_data_dict.values() if data.get('online', False))
-                total_power = sum(data.get('power_active', 0) for data in meter_data_dict.values() if data.get('online', False))
-                total_energy = sum(data.get('total_energy', 0) for data in meter_data_dict.values() if data.get('online', False))
-                
-                # 根據樣本估算全部電表
-                if online_count > 0:
-                    total_power = total_power * (meter_count / len(meter_ids))
-                    total_energy = total_energy * (meter_count / len(meter_ids))
-                    online_count = int(online_count * (meter_count / len(meter_ids)))
-                else:
-                    # 回退到模擬數據
-                    total_power = meter_count * 3.5  # 每個電表平均 3.5kW
-                    total_energy = sum(i * 50.5 for i in range(1, meter_count + 1))
-                    online_count = meter_count - 2
-            else:
-                # RTU 未啟用，使用模擬數據
-                total_power = meter_count * 3.5  # 每個電表平均 3.5kW
-                total_energy = sum(i * 50.5 for i in range(1, meter_count + 1))
-                online_count = meter_count - 2
-                
-        except Exception as e:
-            # RTU 讀取失敗，使用模擬數據
-            print(f"RTU data fetch failed: {e}")
-            total_power = meter_count * 3.5  # 每個電表平均 3.5kW  
-            total_energy = sum(i * 50.5 for i in range(1, meter_count + 1))
-            online_count = meter_count - 2
-        
-        total_cost = total_energy * current_app.config['DEFAULT_UNIT_PRICE']
-        
-        # 供電狀態統計 / Power status statistics
-        power_on_count = meter_count - random.randint(0, 5)
-        power_off_count = meter_count - power_on_count
-        
-        # 電表狀態分佈 / Meter status distribution
-        status_distribution = {
-            'online': online_count,
-            'offline': meter_count - online_count,
-            'power_on': power_on_count,
-            'power_off': power_off_count
-        }
-        
-        # 用電量前 10 名 / Top 10 energy consumers
-        top_consumers = []
-        for i in range(10):
-            meter_id = i + 1
-            energy = meter_id * 50.5 + random.uniform(0, 20)
-            top_consumers.append({
-                'meter_id': meter_id,
-                'name': f'A{meter_id}',
-                'energy': round(energy, 2),
-                'cost': round(energy * current_app.config['DEFAULT_UNIT_PRICE'], 2)
-            })
-        
-        # 按小時統計今日用電 / Hourly energy consumption today
-        hourly_data = []
-        for hour in range(24):
-            total_hour_energy = sum(random.uniform(1, 5) for _ in range(meter_count))
-            hourly_data.append({
-                'hour': f'{hour:02d}:00',
-                'energy': round(total_hour_energy, 2),
-                'cost': round(total_hour_energy * current_app.config['DEFAULT_UNIT_PRICE'], 2)
-            })
+        from ..services.dashboard_aggregator import dashboard_aggregator
         
-        dashboard_data = {
-            'summary': {
-                'total_meters': meter_count,
-                'online_meters': online_count,
-                'total_power': round(total_power, 2),
-                'total_energy': round(total_energy, 2),
-                'total_cost': round(total_cost, 2),
-                'average_power': round(total_power / meter_count, 2),
-                'currency': '元'
-            },
-            'status_distribution': status_distribution,
-            'top_consumers': top_consumers,
-            'hourly_consumption': hourly_data,
-            'last_update': datetime.now().isoformat()
-        }
+        dashboard_data = dashboard_aggregator.get_dashboard(
+            meter_count=current_app.config['METER_COUNT'],
+            top_n=request.args.get('top', 10, type=int)
+        )
         
         return jsonify({
             'success': True,
@@ -362,13 +266,46 @@ def get_dashboard_chart_data():
         }), 500
 
 
+def _parse_export_params(params):
+    """解析導出參數 / Parse export parameters"""
+    from ..services.export_service import export_service
+    
+    source = params.get('source', 'raw')
+    export_format = params.get('format', 'csv')
+    if export_format == 'json':
+        export_format = 'ndjson'
+    
+    if source not in ('raw', 'hourly'):
+        raise ValueError(f'Unsupported source: {source}')
+    if not export_service.is_format_available(export_format):
+        raise ValueError(f'Unsupported or unavailable format: {export_format}')
+    
+    meter_ids = params.get('meter_ids') or []
+    if isinstance(meter_ids, str):
+        meter_ids = [item for item in meter_ids.split(',') if item]
+    meter_ids = [int(meter_id) for meter_id in meter_ids]
+    
+    start = params.get('start')
+    end = params.get('end')
+    compress = str(params.get('gzip', '')).lower() in ('1', 'true', 'yes')
+    
+    return {
+        'source': source,
+        'export_format': export_format,
+        'compress': compress,
+        'meter_ids': meter_ids,
+        'start': datetime.fromisoformat(start) if start else None,
+        'end': datetime.fromisoformat(end) if end else None
+    }
+
+
 @api_bp.route('/charts/export', methods=['POST'])
 def export_chart_data():
     """
     導出圖表數據 / Export chart data
     
     Returns:
-        JSON: 導出結果
+        JSON: 導出結果 (含可串流下載的 download_url)
     """
     try:
         data = request.get_json()
@@ -380,7 +317,6 @@ def export_chart_data():
             }), 400
         
         chart_type = data.get('chart_type')
-        export_format = data.get('format', 'csv')  # csv, json, excel
         date_range = data.get('date_range', {})
         
         if not chart_type:
@@ -390,17 +326,49 @@ def export_chart_data():
                 'timestamp': datetime.now().isoformat()
             }), 400
         
-        # TODO: 實際導出邏輯
-        export_filename = f'chart_data_{chart_type}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
+        from ..services.export_service import export_service
+        
+        try:
+            options = _parse_export_params({
+                'source': data.get('source', 'raw'),
+                'format': data.get('format', 'csv'),  # csv, json/ndjson, parquet
+                'gzip': data.get('gzip', False),
+                'meter_ids': data.get('meter_ids'),
+                'start': date_range.get('start'),
+                'end': date_range.get('end')
+            })
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'timestamp': datetime.now().isoformat()
+            }), 400
+        
+        # 下載連結帶上查詢參數，實際導出於下載時串流產生
+        query = {
+            'source': options['source'],
+            'format': options['export_format'],
+            'gzip': '1' if options['compress'] else '0'
+        }
+        if options['meter_ids']:
+            query['meter_ids'] = ','.join(str(meter_id) for meter_id in options['meter_ids'])
+        if options['start']:
+            query['start'] = options['start'].isoformat()
+        if options['end']:
+            query['end'] = options['end'].isoformat()
+        
+        export_filename = export_service.get_filename(
+            options['source'], options['export_format'], options['compress']
+        )
         
         return jsonify({
             'success': True,
             'data': {
                 'filename': export_filename,
-                'format': export_format,
+                'format': options['export_format'],
+                'source': options['source'],
                 'chart_type': chart_type,
-                'download_url': f'/api/charts/download/{export_filename}',
-                'expires_at': (datetime.now() + timedelta(hours=1)).isoformat()
+                'download_url': f'/api/charts/download?{urlencode(query)}'
             },
             'message': '圖表數據導出成功',
             'timestamp': datetime.now().isoformat()
@@ -411,4 +379,50 @@ def export_chart_data():
             'success': False,
             'error': str(e),
             'timestamp': datetime.now().isoformat()
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@api_bp.route('/charts/download', methods=['GET'])
+def download_chart_data():
+    """
+    串流下載歷史數據 / Stream history data download
+    
+    Query Parameters:
+        source: raw / hourly
+        format: csv / ndjson / parquet
+        gzip: 1 啟用 gzip 壓縮
+        meter_ids: 逗號分隔的電表 ID
+        start, end: ISO 時間 (UTC)
+    
+    Returns:
+        Response: 分批產生的檔案內容
+    """
+    try:
+        from ..services.export_service import export_service
+        
+        try:
+            options = _parse_export_params(request.args)
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'timestamp': datetime.now().isoformat()
+            }), 400
+        
+        filename = export_service.get_filename(
+            options['source'], options['export_format'], options['compress']
+        )
+        stream = export_service.stream_export(**options)
+        
+        return Response(
+            stream_with_context(stream),
+            mimetype=export_service.get_mimetype(options['export_format'], options['compress']),
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
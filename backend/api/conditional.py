@@ -0,0 +1,55 @@
+"""
+條件式 GET / Conditional GET helpers
+Strong ETags derived from data version counters; If-None-Match is answered
+with 304 before the view does any work. Only for views whose body is built
+entirely from versioned state (configuration), never from live meter reads
+"""
+
+from functools import wraps
+from typing import Optional
+
+from flask import Response, current_app, request
+
+from ..database.config_cache import config_cache
+from ..database.data_version import data_versions
+
+
+def build_etag(scope: str, key: Optional[int] = None) -> str:
+    """
+    組合 ETag
+    
+    由進程 token、資料版本、配置快取版本組成。
+    """
+    config_cache.sync()
+    parts = [data_versions.token, scope, data_versions.get(scope, key), str(config_cache.version)]
+    if key is not None:
+        parts.insert(2, str(key))
+    return '-'.join(parts)
+
+
+def conditional_get(scope: str, key_arg: Optional[str] = None):
+    """
+    條件式 GET 裝飾器
+    
+    Args:
+        scope: 資料版本範圍 (例如 'meters', 'config')
+        key_arg: 作為版本鍵的路由參數名稱 (例如 'meter_id')
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = build_etag(scope, kwargs.get(key_arg) if key_arg else None)
+            
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag)
+            # 允許瀏覽器快取，但每次都需重新驗證
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -96,41 +96,164 @@ def get_meter_history(meter_id):
         }), 500
 
 
-@api_bp.route('/history/billing-summary', methods=['GET'])
-def get_billing_summary():
+@api_bp.route('/history/billing/monthly', methods=['GET'])
+def get_monthly_billing():
     """
-    獲取系統計費摘要 / Get system billing summary
+    獲取月結計費 (加總計費記錄) / Get monthly billing from finalised records
+    
+    Query Parameters:
+        month (str): YYYY-MM，預設為本月
+        meter_id (int): 指定電表，預設全部
     
     Returns:
-        JSON: 計費摘要信息
+        JSON: 各電表依供電時段分列的用電量與費用
     """
     try:
-        from ..modbus.rtu_client import ModbusRTUClient
-        
-        # 創建 RTU 客戶端
-        rtu_config = {
-            'rtu_port': current_app.config['RTU_PORT'],
-            'baudrate': current_app.config['RTU_BAUDRATE'],
-            'timeout': current_app.config['RTU_TIMEOUT'],
-            'RTU_SIMULATOR_PORT': current_app.config.get('RTU_SIMULATOR_PORT', 5502)
-        }
+        from ..services.billing_engine import billing_engine
         
-        rtu_client = ModbusRTUClient(rtu_config)
-        billing_data = rtu_client.get_system_billing_summary()
+        month = request.args.get('month') or datetime.now().strftime('%Y-%m')
+        meter_id = request.args.get('meter_id', type=int)
         
-        if billing_data.get('success', False):
+        try:
+            year, month_number = (int(part) for part in month.split('-'))
+            summary = billing_engine.get_monthly_summary(year, month_number, meter_id)
+        except ValueError:
             return jsonify({
-                'success': True,
-                'data': billing_data,
+                'success': False,
+                'error': '月份格式必須為 YYYY-MM',
                 'timestamp': datetime.now().isoformat()
-            })
-        else:
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'data': summary,
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': '獲取月結計費時發生系統錯誤',
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
+@api_bp.route('/history/billing/costs', methods=['GET', 'POST'])
+def get_tariff_costs():
+    """
+    依電價表計算所有電表的電費 / Price hourly energy with the tariff
+    
+    Query Parameters:
+        month (str): YYYY-MM (本地時間)；或以 start/end 指定 UTC 期間
+        meter_ids (str): 逗號分隔的電表 ID，預設全部
+    
+    Body (POST, 選填):
+        tariff (dict): 試算用電價表，不影響目前設定
+    
+    Returns:
+        JSON: 各電表用電量、分時電費與累進加價
+    """
+    try:
+        from ..services.tariff_engine import tariff_engine
+        
+        body = request.get_json(silent=True) or {}
+        trial_tariff = body.get('tariff')
+        meter_ids = [int(item) for item in request.args.get('meter_ids', '').split(',') if item] or None
+        
+        try:
+            if request.args.get('start'):
+                start = datetime.fromisoformat(request.args['start'])
+                end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else datetime.utcnow()
+                result = tariff_engine.compute_costs(start, end, meter_ids, trial_tariff)
+            else:
+                month = request.args.get('month') or datetime.now().strftime('%Y-%m')
+                year, month_number = (int(part) for part in month.split('-'))
+                result = tariff_engine.compute_month(year, month_number, meter_ids, trial_tariff)
+        except (KeyError, TypeError, ValueError) as e:
             return jsonify({
                 'success': False,
-                'error': billing_data.get('error', '獲取計費摘要失敗'),
-                'message': billing_data.get('message', ''),
+                'error': '參數或電價表格式錯誤',
+                'message': str(e),
                 'timestamp': datetime.now().isoformat()
-            }), 500
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'data': result,
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': '計算電費時發生系統錯誤',
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
+@api_bp.route('/history/billing/open-segments', methods=['GET'])
+def get_open_billing_segments():
+    """
+    獲取進行中的計費區段 / Get open billing segments
+    
+    Returns:
+        JSON: 各電表目前區段與結束時間
+    """
+    try:
+        from ..services.billing_engine import billing_engine
+        
+        return jsonify({
+            'success': True,
+            'data': billing_engine.get_open_segments(),
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
+@api_bp.route('/history/counter-anomalies', methods=['GET'])
+def get_counter_anomalies():
+    """
+    獲取電能計數器判定統計 / Get energy counter normalisation stats
+    
+    Returns:
+        JSON: 各判定結果次數與最近的重置、回捲、異常跳動記錄
+    """
+    from ..services.counter_normalizer import counter_normalizer
+    
+    return jsonify({
+        'success': True,
+        'data': counter_normalizer.get_stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+@api_bp.route('/history/billing-summary', methods=['GET'])
+def get_billing_summary():
+    """
+    獲取系統計費摘要 / Get system billing summary
+    
+    由讀數寫入時維護的累計值直接回應，不需讀取電表
+    
+    Returns:
+        JSON: 本月與今日的全系統用電量與費用
+    """
+    try:
+        from ..services.fleet_totals import fleet_totals
+        from ..services.tariff_engine import tariff_engine
+        
+        return jsonify({
+            'success': True,
+            'data': fleet_totals.get_summary(tariff_engine.get_base_price()),
+            'timestamp': datetime.now().isoformat()
+        })
     
     except Exception as e:
         return jsonify({
@@ -147,30 +270,15 @@ def get_history_statistics():
     獲取歷史統計摘要 / Get history statistics summary
     
     Returns:
-        JSON: 歷史統計信息
+        JSON: 歷史統計信息 (真實資料庫筆數、時間範圍與檔案大小)
     """
     try:
-        # 模擬歷史統計數據，實際應該從數據庫獲取
-        current_date = datetime.now()
+        from ..services.retention_service import retention_service
         
         return jsonify({
             'success': True,
-            'data': {
-                'database_status': 'active',
-                'total_records': 12543,  # 模擬數據
-                'daily_records': 365,
-                'hourly_records': 8760,
-                'power_status_logs': 2847,
-                'billing_cycles': 12,
-                'oldest_record': f"{current_date.year}-01-01T00:00:00",
-                'newest_record': current_date.isoformat(),
-                'database_size_mb': 15.7,
-                'cleanup_schedule': '每90天自動清理',
-                'last_cleanup': f"{current_date.year}-{current_date.month:02d}-01T02:00:00",
-                'auto_backup': True,
-                'last_backup': f"{current_date.year}-{current_date.month:02d}-{current_date.day:02d}T02:00:00"
-            },
-            'timestamp': current_date.isoformat()
+            'data': retention_service.get_storage_statistics(),
+            'timestamp': datetime.now().isoformat()
         })
         
     except Exception as e:
@@ -182,6 +290,36 @@ def get_history_statistics():
         }), 500
 
 
+@api_bp.route('/history/maintenance', methods=['POST'])
+def run_history_maintenance():
+    """
+    執行歷史數據維護 / Run history maintenance
+    彙總已完成的小時、分批清理過期原始記錄並回收資料庫空間
+    
+    Returns:
+        JSON: 維護結果
+    """
+    try:
+        from ..services.retention_service import retention_service
+        
+        result = retention_service.run_maintenance()
+        
+        return jsonify({
+            'success': True,
+            'data': result,
+            'message': f"歷史數據維護完成，清理 {result['purged_records']} 筆記錄",
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': '執行歷史數據維護時發生錯誤',
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
 @api_bp.route('/history/power-events', methods=['GET'])
 def get_power_events():
     """
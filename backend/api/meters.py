@@ -9,6 +9,10 @@ from datetime import datetime, timedelta
 from flask import request, jsonify, current_app
 from . import api_bp
 from ..services.power_meter_controller_minimal import get_power_meter_controller
+from ..services.tariff_engine import tariff_engine
+from ..services.metrics import SOCKETIO_FANOUT_SECONDS
+from ..database.data_version import data_versions
+from ..database.meter_index import meter_index
 
 # 全局控制器實例  
 _power_controller = None
@@ -27,14 +31,9 @@ def _get_simulated_meter_data(meter_id: int):
     import random
     import time
     
-    # 使用供電時段邏輯
-    try:
-        from ..services.meter_service import meter_service
-        is_power_on = meter_service.is_power_schedule_active('open_power')
-    except:
-        from datetime import datetime
-        current_hour = datetime.now().hour
-        is_power_on = 6 <= current_hour < 22
+    # 使用供電時段邏輯 (已編譯時段，失敗時內部回退預設時段)
+    from ..services.meter_service import meter_service
+    is_power_on = meter_service.is_power_schedule_active('open_power')
     
     # 基礎值
     base_voltage = 220.0 + (meter_id % 10)
@@ -96,6 +95,7 @@ def get_all_meters():
             meter_ids = list(range(1, meter_count + 1))
         
         meters = []
+        meter_info = meter_index.snapshot()
         
         if rtu_enabled:
             # 使用基於 minimalmodbus 的電表控制器讀取實際數據
@@ -109,15 +109,14 @@ def get_all_meters():
                     # 其他電表使用模擬數據
                     raw_data = _get_simulated_meter_data(meter_id)
                 
-                # 從資料庫獲取電表配置信息
-                from ..database.models import Meter
-                db_meter = Meter.query.filter_by(meter_id=meter_id).first()
+                # 從電表索引獲取配置信息
+                info = meter_info.get(meter_id)
                 
                 # 轉換為標準格式
                 meter_data = {
                     'id': meter_id,
-                    'name': db_meter.name if db_meter else f'RTU電表{meter_id:02d}',
-                    'parking': db_meter.parking if db_meter else f'RTU-{meter_id:04d}',
+                    'name': info.name if info else f'RTU電表{meter_id:02d}',
+                    'parking': info.parking if info else f'RTU-{meter_id:04d}',
                     'status': 'online' if raw_data.get('online', True) else 'offline',
                     'power_on': raw_data.get('is_powered', True),
                     'voltage': round(raw_data.get('voltage_avg', 0), 2),
@@ -143,15 +142,14 @@ def get_all_meters():
             for meter_id in meter_ids:
                 raw_data = _get_simulated_meter_data(meter_id)
                 
-                # 從資料庫獲取電表配置信息
-                from ..database.models import Meter
-                db_meter = Meter.query.filter_by(meter_id=meter_id).first()
+                # 從電表索引獲取配置信息
+                info = meter_info.get(meter_id)
                 
                 # 轉換為標準格式
                 meter_data = {
                     'id': meter_id,
-                    'name': db_meter.name if db_meter else f'電表{meter_id:02d}',
-                    'parking': db_meter.parking if db_meter else f'A-{meter_id:04d}',
+                    'name': info.name if info else f'電表{meter_id:02d}',
+                    'parking': info.parking if info else f'A-{meter_id:04d}',
                     'status': 'online' if raw_data.get('online', True) else 'offline',
                     'power_on': raw_data.get('is_powered', True),
                     'voltage': round(raw_data.get('voltage_avg', 0), 2),
@@ -185,7 +183,7 @@ def get_all_meters():
             'count': len(meters),
             'rtu_enabled': rtu_enabled,
             'connection_status': connection_status,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now()
         })
         
     except Exception as e:
@@ -290,15 +288,14 @@ def get_meter(meter_id):
                 raw_data = _get_simulated_meter_data(meter_id)
             
             if raw_data.get('online', False):
-                # 從數據庫獲取電表配置信息
-                from ..database.models import Meter
-                db_meter = Meter.query.filter_by(meter_id=meter_id).first()
+                # 從電表索引獲取配置信息
+                info = meter_index.get(meter_id)
                 
                 # 轉換為標準格式並添加計費信息
                 meter_data = {
                     'id': meter_id,
-                    'name': db_meter.name if db_meter else f'RTU電表{meter_id:02d}',
-                    'parking': db_meter.parking if db_meter else f'RTU-{meter_id:04d}',
+                    'name': info.name if info else f'RTU電表{meter_id:02d}',
+                    'parking': info.parking if info else f'RTU-{meter_id:04d}',
                     'status': 'online',
                     'power_on': True,
                     'voltage': round(raw_data.get('voltage_avg', 0), 2),
@@ -321,7 +318,7 @@ def get_meter(meter_id):
                 total_energy = meter_data['energy']
                 daily_energy = total_energy * 0.025  # 假設每日消耗 2.5%
                 monthly_energy = daily_energy * 30
-                unit_price = current_app.config.get('DEFAULT_UNIT_PRICE', 3.5)
+                unit_price = tariff_engine.get_base_price()
                 
                 meter_data.update({
                     'daily_energy': round(daily_energy, 2),
@@ -341,7 +338,7 @@ def get_meter(meter_id):
         else:
             # 使用模擬數據
             meter_data = _get_simulated_meter_data(meter_id)
-            unit_price = current_app.config.get('DEFAULT_UNIT_PRICE', 3.5)
+            unit_price = tariff_engine.get_base_price()
             daily_energy = meter_id * 12.5
             monthly_energy = meter_id * 375.0
             
@@ -451,6 +448,8 @@ def control_meter(meter_id):
                     meter.power_on = power_on
                 
                 db.session.commit()
+                data_versions.bump('meters', meter_id)
+                meter_index.invalidate()
                 current_app.logger.info(f'電表 {meter_id} 供電狀態已更新到數據庫: {power_on}')
                 
             except Exception as e:
@@ -553,6 +552,8 @@ def update_meter(meter_id):
                     setattr(meter, field, value)
             
             db.session.commit()
+            data_versions.bump('meters', meter_id)
+            meter_index.invalidate()
             current_app.logger.info(f'電表 {meter_id} 配置已更新到數據庫: {updates}')
             
         except Exception as e:
@@ -583,16 +584,181 @@ def update_meter(meter_id):
         }), 500
 
 
+# 批量更新可修改的欄位與長度上限 (對應 meters 資料表欄位)
+BULK_UPDATE_FIELDS = {'name': 100, 'parking': 50}
+
+
+def _validate_bulk_updates(items, meter_count):
+    """
+    驗證批量更新內容
+    
+    Returns:
+        (依電表 ID 的更新內容, 錯誤列表)
+    """
+    changes = {}
+    errors = []
+    
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': position, 'error': 'Each item must be an object'})
+            continue
+        
+        meter_id = item.get('meter_id')
+        if not isinstance(meter_id, int) or isinstance(meter_id, bool) or not 1 <= meter_id <= meter_count:
+            errors.append({'index': position, 'error': f'Invalid meter ID: {meter_id}'})
+            continue
+        if meter_id in changes:
+            errors.append({'index': position, 'meter_id': meter_id, 'error': 'Duplicate meter ID'})
+            continue
+        
+        # 與單一更新相同：household 對應 name
+        fields = {('name' if key == 'household' else key): value
+                  for key, value in item.items() if key != 'meter_id'}
+        unknown = sorted(set(fields) - set(BULK_UPDATE_FIELDS))
+        if unknown:
+            errors.append({'index': position, 'meter_id': meter_id, 'error': f'Unsupported fields: {unknown}'})
+            continue
+        if not fields:
+            errors.append({'index': position, 'meter_id': meter_id, 'error': 'No update fields provided'})
+            continue
+        
+        for field, value in fields.items():
+            if not isinstance(value, str) or not value.strip():
+                errors.append({'index': position, 'meter_id': meter_id, 'error': f'{field} must be a non-empty string'})
+            elif len(value.strip()) > BULK_UPDATE_FIELDS[field]:
+                errors.append({'index': position, 'meter_id': meter_id,
+                               'error': f'{field} exceeds {BULK_UPDATE_FIELDS[field]} characters'})
+        changes[meter_id] = {field: value.strip() for field, value in fields.items() if isinstance(value, str)}
+    
+    return changes, errors
+
+
+@api_bp.route('/meters', methods=['PATCH'])
+def bulk_update_meters():
+    """
+    批量更新電表配置 / Bulk update meter configuration
+    
+    所有變更先全部驗證，再於同一交易中寫入；任一項目無效時不套用任何變更。
+    
+    Request Body:
+        meters (list): [{"meter_id": 1, "name": "...", "parking": "..."}, ...]
+    
+    Returns:
+        JSON: 更新結果
+    """
+    try:
+        data = request.get_json(silent=True)
+        items = data.get('meters') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                'success': False,
+                'error': 'meters list is required',
+                'timestamp': datetime.now().isoformat()
+            }), 400
+        
+        changes, errors = _validate_bulk_updates(items, current_app.config['METER_COUNT'])
+        if errors:
+            return jsonify({
+                'success': False,
+                'error': 'Validation failed, no changes applied',
+                'errors': errors,
+                'timestamp': datetime.now().isoformat()
+            }), 400
+        
+        from ..database.models import Meter, db
+        
+        try:
+            meter_ids = sorted(changes)
+            meters = {meter.meter_id: meter for meter in Meter.query.filter(Meter.meter_id.in_(meter_ids))}
+            
+            created = 0
+            for meter_id in meter_ids:
+                meter = meters.get(meter_id)
+                if meter is None:
+                    meter = Meter(
+                        meter_id=meter_id,
+                        name=f'RTU電表{meter_id:02d}',
+                        parking=f'RTU-{meter_id:04d}',
+                        total_energy=0.0,
+                        daily_energy=0.0,
+                        cost_today=0.0,
+                        power_on=False
+                    )
+                    db.session.add(meter)
+                    created += 1
+                for field, value in changes[meter_id].items():
+                    setattr(meter, field, value)
+            
+            db.session.commit()
+        
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f'批量更新電表失敗: {str(e)}')
+            return jsonify({
+                'success': False,
+                'error': f'Database update failed: {str(e)}',
+                'timestamp': datetime.now().isoformat()
+            }), 500
+        
+        # 提交後一次性更新快取並廣播
+        from ..services.dashboard_aggregator import dashboard_aggregator
+        data_versions.bump('meters', *meter_ids)
+        meter_index.invalidate()
+        dashboard_aggregator.update_names({
+            meter_id: fields['name'] for meter_id, fields in changes.items() if 'name' in fields
+        })
+        
+        socketio = current_app.extensions.get('socketio')
+        if socketio is not None:
+            with SOCKETIO_FANOUT_SECONDS.labels('meters_updated').time():
+                socketio.emit('meters_updated', {
+                    'meter_ids': meter_ids,
+                    'changes': changes,
+                    'message': f'已更新 {len(meter_ids)} 個電表配置',
+                    'timestamp': datetime.now()
+                })
+        
+        current_app.logger.info(f'批量更新電表配置: {len(meter_ids)} 個 (新建 {created})')
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'updated_count': len(meter_ids),
+                'created_count': created,
+                'meter_ids': meter_ids,
+                'changes': changes
+            },
+            'message': f'批量更新 {len(meter_ids)} 個電表配置成功',
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
 @api_bp.route('/meters/<int:meter_id>/history', methods=['GET'])
 def get_meter_history_data(meter_id):
     """
-    獲取電表歷史數據 / Get meter historical data
+    獲取電表歷史數據 (鍵集分頁) / Get meter historical data (keyset pagination)
     
     Args:
         meter_id (int): 電表 ID
         
+    Query Parameters:
+        source: raw (原始記錄，預設) / hourly (每小時彙總)
+        start, end: ISO 時間範圍 (UTC)；未指定 start 時使用 days
+        days: 查詢天數，預設 7 天
+        cursor: 上一頁返回的 next_cursor
+        limit: 每頁筆數
+        fields: 逗號分隔的欄位投影 (如 power,energy)
+        order: asc / desc
+        
     Returns:
-        JSON: 歷史數據
+        JSON: 歷史數據與下一頁游標
     """
     try:
         if meter_id < 1 or meter_id > current_app.config['METER_COUNT']:
@@ -602,46 +768,42 @@ def get_meter_history_data(meter_id):
                 'timestamp': datetime.now().isoformat()
             }), 400
         
-        # 查詢參數 / Query parameters
-        days = int(request.args.get('days', 7))  # 預設 7 天
-        interval = request.args.get('interval', 'hour')  # hour, day, week
-        
-        # 生成模擬歷史數據 / Generate mock historical data
-        history_data = []
-        end_time = datetime.now()
-        
-        if interval == 'hour':
-            delta = timedelta(hours=1)
-            count = min(days * 24, 168)  # 最多 7 天的小時數據
-        elif interval == 'day':
-            delta = timedelta(days=1)
-            count = min(days, 30)  # 最多 30 天的日數據
-        else:  # week
-            delta = timedelta(weeks=1)
-            count = min(days // 7, 12)  # 最多 12 週的數據
-        
-        for i in range(count):
-            timestamp = end_time - (delta * i)
-            history_data.append({
-                'timestamp': timestamp.isoformat(),
-                'voltage': 220.0 + (i % 10),
-                'current': 15.0 + (i % 5),
-                'power': 3300.0 + (i * 5),
-                'energy': meter_id * 2.5 + i,
-                'cost': (meter_id * 2.5 + i) * current_app.config['DEFAULT_UNIT_PRICE']
-            })
+        from ..services.meter_service import meter_service
         
-        # 按時間順序排列 / Sort by timestamp
-        history_data.reverse()
+        # 查詢參數 / Query parameters
+        try:
+            source = request.args.get('source', 'raw')
+            order = request.args.get('order', 'asc')
+            days = int(request.args.get('days', 7))
+            limit = request.args.get('limit', type=int)
+            cursor = request.args.get('cursor')
+            fields = [name for name in request.args.get('fields', '').split(',') if name]
+            
+            start = request.args.get('start')
+            end = request.args.get('end')
+            start = datetime.fromisoformat(start) if start else datetime.utcnow() - timedelta(days=days)
+            end = datetime.fromisoformat(end) if end else None
+            
+            page = meter_service.get_meter_history_page(
+                meter_id, start=start, end=end, cursor=cursor, limit=limit,
+                fields=fields or None, order=order, source=source
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'timestamp': datetime.now().isoformat()
+            }), 400
         
         return jsonify({
             'success': True,
             'data': {
                 'meter_id': meter_id,
-                'interval': interval,
-                'days': days,
-                'records': history_data,
-                'count': len(history_data)
+                'source': source,
+                'order': order,
+                'start': start.isoformat(),
+                'end': end.isoformat() if end else None,
+                **page
             },
             'timestamp': datetime.now().isoformat()
         })
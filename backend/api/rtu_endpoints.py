@@ -9,6 +9,7 @@ from datetime import datetime
 from flask import request, jsonify, current_app
 from . import api_bp
 from ..services.power_meter_controller_minimal import get_power_meter_controller
+from ..modbus.trace import modbus_trace, OUTCOME_CODES
 
 @api_bp.route('/rtu/status', methods=['GET'])
 def get_rtu_status():
@@ -151,6 +152,68 @@ def clear_rtu_cache():
         }), 500
 
 
+@api_bp.route('/rtu/trace', methods=['GET'])
+def get_rtu_trace():
+    """
+    查詢 MODBUS 交易追蹤 / Query recent Modbus transactions
+    
+    Query Parameters:
+        meter_id (int): 只返回指定電表 (單元 ID)
+        since (str): ISO 時間，只返回之後開始的交易 (本地時間)
+        until (str): ISO 時間，只返回之前開始的交易 (本地時間)
+        outcome (str): ok / error_response / timeout / exception
+        limit (int): 最多返回筆數 (預設: 200，上限: 追蹤容量)
+    
+    Returns:
+        JSON: 由新到舊的交易紀錄與依電表彙總的耗時
+    """
+    try:
+        # 查詢參數 / Query parameters
+        try:
+            meter_id = int(request.args['meter_id']) if request.args.get('meter_id') else None
+            since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+            until = datetime.fromisoformat(request.args['until']) if request.args.get('until') else None
+            limit = min(max(int(request.args.get('limit', 200)), 1), modbus_trace.capacity)
+            outcome = request.args.get('outcome')
+            if outcome and outcome not in OUTCOME_CODES:
+                raise ValueError(f"outcome 必須是 {', '.join(OUTCOME_CODES)}")
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': '查詢參數格式錯誤',
+                'message': str(e),
+                'timestamp': datetime.now().isoformat()
+            }), 400
+        
+        result = modbus_trace.query(
+            meter_id=meter_id,
+            since=since.timestamp() if since else None,
+            until=until.timestamp() if until else None,
+            outcome=OUTCOME_CODES[outcome] if outcome else None,
+            limit=limit
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'transactions': result['records'],
+                'count': len(result['records']),
+                'matched': result['matched'],
+                'by_meter': result['by_unit'],
+                'buffer': modbus_trace.get_stats()
+            },
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"查詢 MODBUS 交易追蹤時發生錯誤: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
 @api_bp.route('/meters/config', methods=['GET'])
 def get_meters_config():
     """
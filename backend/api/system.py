@@ -3,11 +3,15 @@
 """
 
 import json
-import psutil
 from datetime import datetime
-from flask import request, jsonify, current_app
+from flask import Response, request, jsonify, current_app
 from . import api_bp
+from .conditional import conditional_get
 from ..database.models import SystemConfig
+from ..services.power_schedule import CompiledPowerSchedule
+from ..services.system_metrics import system_metrics
+from ..services.log_reader import log_reader
+from ..services.profiler import sampling_profiler
 
 # 導入智能日誌系統
 try:
@@ -46,10 +50,8 @@ def get_system_status():
         JSON: 系統狀態信息
     """
     try:
-        # 系統資源信息 / System resource information
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+        # 系統資源信息 (背景取樣的最新樣本) / System resource information
+        metrics = system_metrics.get_latest()
         
         # 應用程式信息 / Application information
         from config import APP_INFO
@@ -57,29 +59,21 @@ def get_system_status():
         status_data = {
             'app_info': APP_INFO,
             'system': {
-                'cpu_percent': cpu_percent,
-                'memory': {
-                    'total': memory.total,
-                    'available': memory.available,
-                    'percent': memory.percent,
-                    'used': memory.used
-                },
-                'disk': {
-                    'total': disk.total,
-                    'free': disk.free,
-                    'used': disk.used,
-                    'percent': (disk.used / disk.total) * 100
-                }
+                'cpu_percent': metrics['cpu_percent'],
+                'cpu_count': metrics['cpu_count'],
+                'load_average': metrics['load_average'],
+                'memory': metrics['memory'],
+                'disk': metrics['disk'],
+                'process': metrics['process'],
+                'rolling': system_metrics.get_rolling(),
+                'sampled_at': metrics['sampled_at']
             },
             'config': {
                 'meter_count': current_app.config['METER_COUNT'],
                 'debug_mode': current_app.debug,
                 'environment': current_app.config.get('ENV', 'development')
             },
-            'uptime': {
-                'started': datetime.now().isoformat(),  # TODO: 實際記錄啟動時間
-                'current': datetime.now().isoformat()
-            },
+            'uptime': system_metrics.get_uptime(),
             'status': 'running',
             'timestamp': datetime.now().isoformat()
         }
@@ -140,6 +134,7 @@ def update_interval():
 
 
 @api_bp.route('/system/config', methods=['GET'])
+@conditional_get('config')
 def get_system_config():
     """
     獲取系統配置 / Get system configuration
@@ -258,6 +253,7 @@ def update_system_config():
 
 
 @api_bp.route('/system/power-schedule', methods=['GET'])
+@conditional_get('config')
 def get_power_schedule():
     """
     獲取供電時段設定 / Get power schedule settings
@@ -274,7 +270,44 @@ def get_power_schedule():
             'data': schedule_data,
             'timestamp': datetime.now().isoformat()
         })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
+@api_bp.route('/system/power-schedule/state', methods=['GET'])
+def get_power_schedule_state():
+    """
+    獲取各供電時段目前狀態與下一次切換時間 / Get current schedule state and next transition
+    
+    Returns:
+        JSON: 各時段的活躍狀態與切換時間點
+    """
+    try:
+        from ..services.meter_service import meter_service
         
+        compiled = meter_service.get_power_schedule()
+        now = datetime.now()
+        
+        state_data = {}
+        for schedule_type in compiled.windows:
+            active, until = compiled.state(schedule_type, now)
+            state_data[schedule_type] = {
+                'active': active,
+                'next_transition': until.isoformat() if until else None,
+                'seconds_until_transition': round((until - now).total_seconds(), 3) if until else None
+            }
+        
+        return jsonify({
+            'success': True,
+            'data': state_data,
+            'timestamp': now.isoformat()
+        })
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -317,6 +350,16 @@ def update_power_schedule():
                     'timestamp': datetime.now().isoformat()
                 }), 400
         
+        # 預先編譯，確保時間格式有效 / Compile once to validate time formats
+        try:
+            CompiledPowerSchedule(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid time format: {e}',
+                'timestamp': datetime.now().isoformat()
+            }), 400
+        
         # 保存到數據庫
         current_app.logger.info(f'更新供電時段設定: {data}')
         
@@ -327,7 +370,6 @@ def update_power_schedule():
         SystemConfig.set_value('power_schedule', json.dumps(data))
         
         # 記錄更新時間
-        from datetime import datetime
         SystemConfig.set_value('power_schedule_updated_at', datetime.now().isoformat())
         
         return jsonify({
@@ -336,7 +378,79 @@ def update_power_schedule():
             'message': '供電時段設定更新成功',
             'timestamp': datetime.now().isoformat()
         })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
+@api_bp.route('/system/tariff', methods=['GET'])
+def get_tariff():
+    """
+    獲取電價表 / Get tariff
+    
+    Returns:
+        JSON: 分時時段、累進級距與基本單價
+    """
+    try:
+        from ..services.tariff_engine import tariff_engine
+        
+        tariff = tariff_engine.get_tariff()
+        return jsonify({
+            'success': True,
+            'data': {
+                **tariff.to_dict(),
+                'default_price': tariff.default_price
+            },
+            'timestamp': datetime.now().isoformat()
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
+@api_bp.route('/system/tariff', methods=['PUT'])
+def update_tariff():
+    """
+    更新電價表 / Update tariff
+    
+    Returns:
+        JSON: 更新結果
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'No JSON data provided',
+                'timestamp': datetime.now().isoformat()
+            }), 400
+        
+        from ..services.tariff_engine import tariff_engine
         
+        try:
+            tariff = tariff_engine.set_tariff(data)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'timestamp': datetime.now().isoformat()
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'data': tariff.to_dict(),
+            'message': '電價表更新成功',
+            'timestamp': datetime.now().isoformat()
+        })
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -441,38 +555,90 @@ def update_billing_period():
         }), 500
 
 
+@api_bp.route('/system/scheduler', methods=['GET'])
+def get_scheduler_jobs():
+    """
+    獲取背景排程工作狀態 / Get background scheduler jobs
+    
+    Returns:
+        JSON: 排程器狀態與各工作的下次執行時間、最後結果
+    """
+    from ..services.scheduler import job_scheduler
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'running': job_scheduler.running,
+            'jobs': job_scheduler.get_jobs()
+        },
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+@api_bp.route('/system/scheduler/<job_name>/run', methods=['POST'])
+def run_scheduler_job(job_name):
+    """
+    立即執行指定排程工作 / Trigger a scheduled job now
+    
+    Args:
+        job_name: 工作名稱 (daily_reset, history_maintenance)
+    """
+    from ..services.scheduler import job_scheduler
+    
+    if not job_scheduler.run_now(job_name):
+        return jsonify({
+            'success': False,
+            'error': f'Job not found or scheduler not running: {job_name}',
+            'timestamp': datetime.now().isoformat()
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'message': f'已排入立即執行: {job_name}',
+        'timestamp': datetime.now().isoformat()
+    })
+
+
 @api_bp.route('/system/logs', methods=['GET'])
 def get_system_logs():
     """
     獲取系統日誌 / Get system logs
     
+    Query Parameters:
+        limit (int): 最多返回筆數 (預設: 100，上限 1000)
+        level (str): 最低日誌等級 (預設: INFO)
+        since (str): ISO 時間，只返回之後的記錄 (本地時間)
+    
     Returns:
-        JSON: 系統日誌
+        JSON: 由新到舊的系統日誌
     """
     try:
         # 查詢參數 / Query parameters
-        limit = int(request.args.get('limit', 100))
-        level = request.args.get('level', 'INFO').upper()
-        
-        # TODO: 從日誌文件讀取實際日誌
-        # 這裡返回模擬日誌數據
-        logs = []
-        for i in range(min(limit, 50)):
-            logs.append({
-                'timestamp': datetime.now().isoformat(),
-                'level': level,
-                'message': f'System log message {i+1}',
-                'module': 'system',
-                'source': 'web_api'
-            })
+        try:
+            limit = int(request.args.get('limit', 100))
+            level = request.args.get('level', 'INFO').upper()
+            since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+            result = log_reader.query(current_app.config['LOG_FILE'], limit, level, since)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': '查詢參數格式錯誤',
+                'message': str(e),
+                'timestamp': datetime.now().isoformat()
+            }), 400
         
         return jsonify({
             'success': True,
             'data': {
-                'logs': logs,
-                'count': len(logs),
+                'logs': result['logs'],
+                'count': len(result['logs']),
                 'level_filter': level,
-                'limit': limit
+                'limit': limit,
+                'since': since.isoformat() if since else None,
+                'file': result['file'],
+                'available': result['available'],
+                'scanned_blocks': result['scanned_blocks'],
+                'skipped_blocks': result['skipped_blocks']
             },
             'timestamp': datetime.now().isoformat()
         })
@@ -482,4 +648,98 @@ def get_system_logs():
             'success': False,
             'error': str(e),
             'timestamp': datetime.now().isoformat()
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@api_bp.route('/system/profile', methods=['GET'])
+def get_profile():
+    """
+    獲取取樣式效能分析結果 / Get sampling profiler output
+    
+    Query Parameters:
+        format (str): folded (預設，flamegraph.pl / speedscope 可讀取) 或 json (狀態與各標籤統計)
+        label (str): 只輸出以此開頭的標籤，例如 "socket request_meter_data" 或 "GET /api/meters"
+    
+    Returns:
+        text/plain: 每行 "標籤;框架;框架 次數"
+    """
+    try:
+        output_format = request.args.get('format', 'folded')
+        if output_format not in ('folded', 'json'):
+            return jsonify({
+                'success': False,
+                'error': '查詢參數格式錯誤',
+                'message': f'Unsupported format: {output_format}',
+                'timestamp': datetime.now().isoformat()
+            }), 400
+        
+        if output_format == 'json':
+            return jsonify({
+                'success': True,
+                'data': sampling_profiler.get_stats(),
+                'timestamp': datetime.now().isoformat()
+            })
+        return Response(sampling_profiler.folded(request.args.get('label')), mimetype='text/plain')
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
+@api_bp.route('/system/profile', methods=['PUT'])
+def update_profile():
+    """
+    於執行期間啟用 / 停用效能分析 / Toggle the sampling profiler at runtime
+    
+    Request Body:
+        enabled (bool): 是否啟用
+        sample_rate (float): 被分析的請求與事件比例 (0-1)
+        interval (float): 堆疊取樣間隔 (秒，0.001-1)
+        reset (bool): 清除累計結果 (可先以 GET 取得結果再清除)
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            sample_rate = float(data.get('sample_rate', sampling_profiler.sample_rate))
+            interval = float(data.get('interval', sampling_profiler.interval))
+            if not 0 <= sample_rate <= 1:
+                raise ValueError('sample_rate must be between 0 and 1')
+            if not 0.001 <= interval <= 1:
+                raise ValueError('interval must be between 0.001 and 1 seconds')
+            for key in ('enabled', 'reset'):
+                if key in data and not isinstance(data[key], bool):
+                    raise ValueError(f'{key} must be a boolean')
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'success': False,
+                'error': '參數格式錯誤',
+                'message': str(e),
+                'timestamp': datetime.now().isoformat()
+            }), 400
+        
+        sampling_profiler.sample_rate = sample_rate
+        sampling_profiler.interval = interval
+        if data.get('reset'):
+            sampling_profiler.reset()
+        if 'enabled' in data:
+            sampling_profiler.set_enabled(data['enabled'])
+        
+        current_app.logger.info(f'更新效能分析設定: {data}')
+        
+        return jsonify({
+            'success': True,
+            'data': sampling_profiler.get_stats(),
+            'message': '效能分析設定更新成功',
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }), 500
@@ -2,6 +2,10 @@
 Database package for Power Meter Web Edition
 """
 
-from .models import db, Meter, MeterHistory, BillingRecord, SystemConfig, init_database
+from .models import db, Meter, MeterHistory, MeterHistoryHourly, BillingRecord, SystemConfig, init_database
+from .storage import init_storage, read_session
+from .data_version import data_versions
+from .meter_index import meter_index
 
-__all__ = ['db', 'Meter', 'MeterHistory', 'BillingRecord', 'SystemConfig', 'init_database']
\ No newline at end of file
+__all__ = ['db', 'Meter', 'MeterHistory', 'MeterHistoryHourly', 'BillingRecord', 'SystemConfig', 'init_database',
+           'init_storage', 'read_session', 'data_versions', 'meter_index']
\ No newline at end of file
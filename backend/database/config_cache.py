@@ -0,0 +1,106 @@
+"""
+SystemConfig 進程內快取 / In-process cache for SystemConfig lookups
+Versioned so that writes in other worker processes are noticed cheaply
+"""
+
+import time
+import threading
+from typing import Any, Callable, Optional
+
+_MISSING = object()
+
+
+class ConfigCache:
+    """
+    系統配置快取
+    
+    - 讀取: 命中時只是一次字典查詢
+    - 本進程寫入: SystemConfig.set_value 直接使快取失效
+    - 其他進程寫入: 每隔 check_interval 秒比對一次資料庫中的版本號
+    """
+    
+    def __init__(self, check_interval: float = 2.0):
+        self.check_interval = check_interval
+        self.version_loader: Optional[Callable[[], Any]] = None  # 讀取資料庫版本號
+        self.version = 0                 # 本進程快取版本，每次失效遞增
+        self.db_version: Optional[str] = None  # 最後看到的資料庫版本號
+        self.hits = 0
+        self.misses = 0
+        self._values = {}
+        self._derived = {}
+        self._checked_at = 0.0
+        self._db_version_seen = False
+        self._lock = threading.RLock()
+    
+    def get(self, key: str, loader: Callable[[str], Any]) -> Any:
+        """獲取快取值，未命中時以 loader 從資料庫載入 (None 也會被快取)"""
+        self.sync()
+        
+        value = self._values.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        
+        self.misses += 1
+        version = self.version
+        value = loader(key)
+        with self._lock:
+            # 載入期間若已失效，則不寫入過期值
+            if version == self.version:
+                self._values[key] = value
+        return value
+    
+    def get_derived(self, name: str, builder: Callable[[], Any]) -> Any:
+        """獲取由配置衍生的物件 (如解析後的 JSON)，配置變更後才重建"""
+        self.sync()
+        
+        entry = self._derived.get(name)
+        if entry is not None and entry[0] == self.version:
+            return entry[1]
+        
+        version = self.version
+        value = builder()
+        with self._lock:
+            if version == self.version:
+                self._derived[name] = (version, value)
+        return value
+    
+    def sync(self):
+        """定期比對資料庫版本號，其他進程寫入後使本地快取失效"""
+        now = time.monotonic()
+        if self.version_loader is None or now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        
+        db_version = self.version_loader()
+        if not self._db_version_seen:
+            self._db_version_seen = True
+            self.db_version = db_version
+        elif db_version != self.db_version:
+            self.invalidate(db_version)
+    
+    def invalidate(self, db_version: Any = _MISSING):
+        """使所有快取失效並遞增版本號"""
+        with self._lock:
+            self._values.clear()
+            self._derived.clear()
+            self.version += 1
+            if db_version is not _MISSING:
+                self._db_version_seen = True
+                self.db_version = db_version
+    
+    def get_stats(self) -> dict:
+        """獲取快取統計"""
+        total = self.hits + self.misses
+        return {
+            'version': self.version,
+            'db_version': self.db_version,
+            'size': len(self._values),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total * 100) if total > 0 else 0
+        }
+
+
+# 全局快取實例
+config_cache = ConfigCache()
@@ -0,0 +1,44 @@
+"""
+資料版本號 / In-process data version counters
+Bumped whenever meter data is written so read endpoints can derive cheap ETags
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+# 代表範圍內所有鍵的版本鍵
+ALL_KEYS = '*'
+
+
+class DataVersions:
+    """
+    資料版本計數器
+    
+    每個範圍 (例如 'meters') 有一個整體版本，另可依鍵 (電表 ID) 分別計數。
+    版本只存在於本進程，token 在每次啟動時重新產生，避免重啟後版本號重複。
+    """
+    
+    def __init__(self):
+        self.token = os.urandom(4).hex()
+        self._versions: Dict[Tuple[str, Union[int, str, None]], int] = {}
+        self._lock = threading.Lock()
+    
+    def bump(self, scope: str, *keys: int):
+        """遞增範圍版本；指定鍵時只遞增這些鍵，未指定時範圍內所有鍵都視為變更"""
+        with self._lock:
+            self._versions[(scope, None)] = self._versions.get((scope, None), 0) + 1
+            if not keys:
+                self._versions[(scope, ALL_KEYS)] = self._versions.get((scope, ALL_KEYS), 0) + 1
+            for key in keys:
+                self._versions[(scope, key)] = self._versions.get((scope, key), 0) + 1
+    
+    def get(self, scope: str, key: Optional[int] = None) -> str:
+        """獲取目前版本 (指定鍵時包含範圍內全部變更的次數)"""
+        if key is None:
+            return str(self._versions.get((scope, None), 0))
+        return f"{self._versions.get((scope, ALL_KEYS), 0)}.{self._versions.get((scope, key), 0)}"
+
+
+# 全局版本計數器
+data_versions = DataVersions()
@@ -0,0 +1,74 @@
+"""
+電表基本資料索引 / In-memory meter metadata index
+Keeps meter names and parking spaces in a dict so request loops never hit the database
+"""
+
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import select
+
+from .models import Meter
+from .storage import read_session
+
+
+class MeterInfo(NamedTuple):
+    """電表基本資料"""
+    name: str
+    parking: str
+
+
+class MeterIndex:
+    """
+    電表基本資料索引
+    
+    首次使用時以一次查詢載入全部電表，之後的查詢只是字典查找。
+    本進程寫入 (更新電表、控制電表、新建電表) 時呼叫 invalidate；
+    其他進程的寫入在 max_age 秒後自然重新載入。
+    """
+    
+    def __init__(self, max_age: float = 60.0):
+        self.max_age = max_age
+        self.loads = 0
+        self._entries: Optional[Dict[int, MeterInfo]] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+    
+    def _entries_current(self) -> Dict[int, MeterInfo]:
+        """返回目前索引，過期或失效時重新載入"""
+        entries = self._entries
+        if entries is not None and time.monotonic() - self._loaded_at < self.max_age:
+            return entries
+        
+        generation = self._generation
+        with read_session() as session:
+            rows = session.execute(select(Meter.meter_id, Meter.name, Meter.parking)).all()
+        entries = {row.meter_id: MeterInfo(row.name, row.parking) for row in rows}
+        
+        with self._lock:
+            self.loads += 1
+            # 載入期間若已失效，本次結果仍可使用但不寫入
+            if generation == self._generation:
+                self._entries = entries
+                self._loaded_at = time.monotonic()
+        return entries
+    
+    def get(self, meter_id: int) -> Optional[MeterInfo]:
+        """獲取電表基本資料，不存在時返回 None"""
+        return self._entries_current().get(meter_id)
+    
+    def snapshot(self) -> Dict[int, MeterInfo]:
+        """獲取整個索引 (供迴圈內重複查找使用)"""
+        return self._entries_current()
+    
+    def invalidate(self):
+        """使索引失效 (電表資料寫入後呼叫)"""
+        with self._lock:
+            self._generation += 1
+            self._entries = None
+
+
+# 全局電表索引
+meter_index = MeterIndex()
@@ -6,6 +6,8 @@ Database Models for Power Meter Data Persistence
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 
+from .config_cache import config_cache
+
 db = SQLAlchemy()
 
 
@@ -57,6 +59,10 @@ class Meter(db.Model):
 class MeterHistory(db.Model):
     """電表歷史數據表 / Meter Historical Data"""
     __tablename__ = 'meter_history'
+    __table_args__ = (
+        # 單一電表依時間分頁查詢用 (SQLite 索引隱含 rowid，可直接支援 (recorded_at, id) 排序)
+        db.Index('ix_meter_history_meter_recorded', 'meter_id', 'recorded_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     meter_id = db.Column(db.Integer, db.ForeignKey('meters.meter_id'), nullable=False, index=True)
@@ -92,6 +98,48 @@ class MeterHistory(db.Model):
         }
 
 
+class MeterHistoryHourly(db.Model):
+    """電表每小時彙總表 / Meter Hourly Rollup"""
+    __tablename__ = 'meter_history_hourly'
+    __table_args__ = (
+        db.UniqueConstraint('meter_id', 'hour_start', name='uq_meter_history_hourly_meter_hour'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    meter_id = db.Column(db.Integer, db.ForeignKey('meters.meter_id'), nullable=False, index=True)
+    hour_start = db.Column(db.DateTime, nullable=False, index=True)   # 小時起點 (UTC)
+    
+    # 彙總數據 / Aggregated Data
+    sample_count = db.Column(db.Integer, default=0)          # 原始記錄筆數
+    powered_count = db.Column(db.Integer, default=0)         # 供電中的記錄筆數
+    voltage_avg = db.Column(db.Float, default=0.0)           # 平均電壓 V
+    current_avg = db.Column(db.Float, default=0.0)           # 平均電流 A
+    power_avg = db.Column(db.Float, default=0.0)             # 平均功率 W
+    power_max = db.Column(db.Float, default=0.0)             # 最大功率 W
+    energy_start = db.Column(db.Float, default=0.0)          # 小時內首筆累積電能 kWh
+    energy_end = db.Column(db.Float, default=0.0)            # 小時內末筆累積電能 kWh
+    energy_used = db.Column(db.Float, default=0.0)           # 小時用電量 kWh
+    
+    def __repr__(self):
+        return f'<MeterHistoryHourly Meter{self.meter_id} at {self.hour_start}>'
+    
+    def to_dict(self):
+        """轉換為字典格式"""
+        return {
+            'meter_id': self.meter_id,
+            'hour_start': self.hour_start.isoformat(),
+            'sample_count': self.sample_count,
+            'powered_count': self.powered_count,
+            'voltage_avg': round(self.voltage_avg, 1),
+            'current_avg': round(self.current_avg, 1),
+            'power_avg': round(self.power_avg, 1),
+            'power_max': round(self.power_max, 1),
+            'energy_start': round(self.energy_start, 1),
+            'energy_end': round(self.energy_end, 1),
+            'energy_used': round(self.energy_used, 2)
+        }
+
+
 class BillingRecord(db.Model):
     """計費記錄表 / Billing Records"""
     __tablename__ = 'billing_records'
@@ -155,11 +203,43 @@ class SystemConfig(db.Model):
     def __repr__(self):
         return f'<SystemConfig {self.key}: {self.value}>'
     
+    # 跨進程配置版本號 (每次寫入遞增) / Cross-process config version
+    VERSION_KEY = 'config_version'
+    
     @staticmethod
     def get_value(key, default=None):
-        """獲取配置值"""
+        """獲取配置值 (經由進程內快取)"""
+        value = config_cache.get(key, SystemConfig._load_value)
+        return value if value is not None else default
+    
+    @staticmethod
+    def _load_value(key):
+        """從資料庫讀取配置值"""
         config = SystemConfig.query.filter_by(key=key).first()
-        return config.value if config else default
+        return config.value if config else None
+    
+    @staticmethod
+    def _load_version():
+        """讀取資料庫中的配置版本號"""
+        return SystemConfig._load_value(SystemConfig.VERSION_KEY)
+    
+    @staticmethod
+    def _bump_version():
+        """在當前交易中遞增配置版本號 (原子更新，多進程寫入不會互相覆蓋)"""
+        result = db.session.execute(
+            db.update(SystemConfig)
+            .where(SystemConfig.key == SystemConfig.VERSION_KEY)
+            .values(value=db.cast(db.cast(SystemConfig.value, db.Integer) + 1, db.Text))
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            db.session.add(SystemConfig(
+                key=SystemConfig.VERSION_KEY,
+                value='1',
+                description='配置版本號 (快取同步用)'
+            ))
+            db.session.flush()
+        return SystemConfig._load_version()
     
     @staticmethod
     def set_value(key, value, description=None):
@@ -178,8 +258,24 @@ class SystemConfig(db.Model):
             )
             db.session.add(config)
         
+        db_version = SystemConfig._bump_version()
         db.session.commit()
+        
+        # 本進程立即失效，其他進程透過版本號得知變更
+        config_cache.invalidate(db_version)
         return config
+    
+    @staticmethod
+    def set_default(key, value, description=None):
+        """配置不存在時才寫入預設值 (不覆蓋已保存的設定)"""
+        config = SystemConfig.query.filter_by(key=key).first()
+        if config is None:
+            config = SystemConfig.set_value(key, value, description)
+        return config
+
+
+# 快取透過版本號偵測其他進程的寫入
+config_cache.version_loader = SystemConfig._load_version
 
 
 def init_database(app):
@@ -188,9 +284,17 @@ def init_database(app):
         # 創建所有表
         db.create_all()
         
-        # 初始化基本配置
-        SystemConfig.set_value('unit_price', '4.0', '電費單價 (元/度)')
-        SystemConfig.set_value('last_reset_date', datetime.now().date().isoformat(), '最後重置日期')
+        # create_all 不會替既有資料表補建索引 / Add indexes missing from existing tables
+        for index in MeterHistory.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        
+        # 配置快取設定 (切換資料庫時清空)
+        config_cache.check_interval = app.config.get('CONFIG_CACHE_CHECK_INTERVAL', 2.0)
+        config_cache.invalidate()
+        
+        # 初始化基本配置 (只補建缺少的項目；重啟不得覆蓋已保存的電價與重置水位)
+        SystemConfig.set_default('unit_price', '4.0', '電費單價 (元/度)')
+        SystemConfig.set_default('last_reset_date', datetime.now().date().isoformat(), '最後重置日期')
         
         # 初始化電表數據 (如果沒有的話)
         if Meter.query.count() == 0:
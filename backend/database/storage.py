@@ -0,0 +1,109 @@
+"""
+SQLite 儲存設定 / SQLite storage profile
+Applies connection pragmas through engine events and provides a read-only reader engine
+"""
+
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .models import db
+
+logger = logging.getLogger(__name__)
+
+# 讀取引擎存放於 app.extensions 的鍵名
+READER_EXTENSION_KEY = 'sqlite_reader_engine'
+
+
+def is_file_sqlite(engine: Engine) -> bool:
+    """判斷是否為檔案型 SQLite (記憶體資料庫無法共用 WAL 與讀取連線)"""
+    url = engine.url
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def apply_pragmas(dbapi_connection, pragmas: Dict[str, object]):
+    """在新建立的 DBAPI 連線上執行 PRAGMA"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+            # journal_mode 等 PRAGMA 會返回結果列，需讀取完畢
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def register_pragmas(engine: Engine, pragmas: Dict[str, object]):
+    """註冊 connect 事件，使連線池中每條連線都套用相同設定"""
+    if not pragmas:
+        return
+    
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+
+def init_storage(app):
+    """
+    套用 SQLite 儲存設定
+    
+    - 寫入引擎: WAL、synchronous=NORMAL、mmap、快取與 busy_timeout
+    - 讀取引擎: 相同設定加上 query_only，供唯讀端點使用，WAL 下不會阻擋寫入
+    """
+    with app.app_context():
+        engine = db.engine
+        if not is_file_sqlite(engine):
+            logger.info("非檔案型 SQLite，略過儲存設定")
+            return
+        
+        pragmas = dict(app.config.get('SQLITE_PRAGMAS') or {})
+        register_pragmas(engine, pragmas)
+        # 關閉已建立的連線，確保後續連線都經過 connect 事件
+        engine.dispose()
+        
+        if app.config.get('SQLITE_READER_ENABLED', True):
+            reader = create_engine(
+                engine.url,
+                pool_size=app.config.get('SQLITE_READER_POOL_SIZE', 5),
+                max_overflow=app.config.get('SQLITE_READER_MAX_OVERFLOW', 10),
+                pool_pre_ping=True,
+                connect_args={'check_same_thread': False}
+            )
+            reader_pragmas = {key: value for key, value in pragmas.items() if key != 'journal_mode'}
+            reader_pragmas['query_only'] = 'ON'
+            register_pragmas(reader, reader_pragmas)
+            app.extensions[READER_EXTENSION_KEY] = reader
+        
+        logger.info(f"SQLite 儲存設定已套用: {pragmas}")
+
+
+def get_reader_engine() -> Optional[Engine]:
+    """獲取讀取引擎 (未啟用或無應用上下文時為 None)"""
+    try:
+        from flask import current_app
+        return current_app.extensions.get(READER_EXTENSION_KEY)
+    except RuntimeError:
+        return None
+
+
+@contextmanager
+def read_session() -> Iterator[Session]:
+    """
+    唯讀查詢用的 Session
+    
+    有讀取引擎時使用獨立連線，否則回退到 db.session (記憶體資料庫 / 非 SQLite)
+    """
+    reader = get_reader_engine()
+    if reader is None:
+        yield db.session
+        return
+    
+    session = Session(bind=reader)
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,96 @@
+"""
+JSON 序列化 / Fast JSON serialization for Flask responses and Socket.IO packets
+Uses orjson when it is installed and falls back to the standard library;
+datetime/date values are written as ISO 8601 in both cases
+"""
+
+import json
+import uuid
+import dataclasses
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    HAS_ORJSON = True
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+    ORJSON_OPTIONS = 0
+
+
+def _default(obj: Any) -> Any:
+    """標準庫與 orjson 無法直接序列化的型別"""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, (Decimal, uuid.UUID)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, 'tolist'):
+        # numpy 陣列與純量
+        return obj.tolist()
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+    """序列化為 UTF-8 bytes (orjson 不支援的值改用標準庫，例如超過 64 位元的整數)"""
+    if HAS_ORJSON:
+        try:
+            return orjson.dumps(obj, default=_default,
+                                option=ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+        except TypeError:
+            pass
+    return json.dumps(obj, default=_default, ensure_ascii=False,
+                      indent=2 if indent else None, separators=None if indent else (',', ':')).encode('utf-8')
+
+
+def dumps(obj: Any, **kwargs) -> str:
+    """序列化為字串 (與 json.dumps 相容，格式參數除 indent 外忽略)"""
+    return dumps_bytes(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+
+
+def loads(s, **kwargs) -> Any:
+    """反序列化 (帶有 object_hook 等參數時使用標準庫)"""
+    if HAS_ORJSON and not kwargs:
+        return orjson.loads(s)
+    return json.loads(s, **kwargs)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider - jsonify 與 request.get_json 使用 dumps_bytes / loads"""
+    
+    # 保留建立字典時的欄位順序，省去排序成本
+    sort_keys = False
+    
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return dumps(obj, **kwargs)
+    
+    def loads(self, s, **kwargs) -> Any:
+        return loads(s, **kwargs)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(dumps_bytes(obj, indent=indent) + b'\n', mimetype=self.mimetype)
+
+
+class SocketIOJSON:
+    """python-socketio 的 json 模組介面 (需提供 dumps / loads)"""
+    
+    dumps = staticmethod(dumps)
+    loads = staticmethod(loads)
+
+
+def init_json(app):
+    """註冊 Flask JSON provider"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
@@ -4,5 +4,6 @@ MODBUS 通訊模組
 """
 
 from .rtu_client import ModbusRTUClient
+from .trace import ModbusTrace, modbus_trace
 
-__all__ = ['ModbusRTUClient']
\ No newline at end of file
+__all__ = ['ModbusRTUClient', 'ModbusTrace', 'modbus_trace']
\ No newline at end of file
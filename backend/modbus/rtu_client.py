@@ -20,6 +20,10 @@ except ImportError:
     ModbusSerialClient = None
     ModbusException = Exception
 
+from ..services.metrics import (MODBUS_POLL_SECONDS, MODBUS_BUS_BUSY_SECONDS, MODBUS_TRANSACTIONS, MODBUS_ERRORS,
+                                MODBUS_CACHE_REQUESTS, classify_modbus_error)
+from .trace import modbus_trace
+
 # TCP 客戶端支援
 try:
     from pymodbus.client import ModbusTcpClient
@@ -131,6 +135,7 @@ class ModbusRTUClient:
         self.request_count = 0
         self.success_count = 0
         self.error_count = 0
+        self.last_read_simulated = False  # 最近一次讀取是否為模擬值
         
         # 線程鎖
         self.lock = threading.Lock()
@@ -210,6 +215,7 @@ class ModbusRTUClient:
         """讀取浮點數寄存器 (佔用2個寄存器)"""
         with self.lock:
             self.request_count += 1
+            self.last_read_simulated = False
             
             # 檢查快取
             cache_key = f"{meter_id}_{register_addr}"
@@ -218,11 +224,14 @@ class ModbusRTUClient:
             if cache_key in self.meter_cache:
                 cached_data = self.meter_cache[cache_key]
                 if current_time - cached_data['timestamp'] < self.cache_expiry:
+                    MODBUS_CACHE_REQUESTS.labels('hit').inc()
                     return cached_data['value']
+            MODBUS_CACHE_REQUESTS.labels('miss').inc()
             
             # 如果沒有連線，嘗試重連
             if not self.connected:
                 if not self.connect():
+                    MODBUS_ERRORS.labels(meter_id, 'not_connected').inc()
                     return self._get_simulated_value(register_addr, meter_id)
             
             try:
@@ -232,14 +241,19 @@ class ModbusRTUClient:
                     return self._get_simulated_value(register_addr, meter_id)
                 
                 # 讀取2個連續寄存器 (IEEE 754 浮點數) - 使用 holding registers
-                result = self.client.read_holding_registers(
-                    address=register_addr,
-                    count=2,
-                    device_id=meter_id
-                )
+                MODBUS_TRANSACTIONS.labels(meter_id).inc()
+                with modbus_trace.span(meter_id, 0x03, register_addr, 2, MODBUS_BUS_BUSY_SECONDS.inc) as span:
+                    result = self.client.read_holding_registers(
+                        address=register_addr,
+                        count=2,
+                        device_id=meter_id
+                    )
+                    if result.isError():
+                        span.error_response()
                 
                 if result.isError():
                     self.error_count += 1
+                    MODBUS_ERRORS.labels(meter_id, classify_modbus_error(result)).inc()
                     self.logger.warning(f"讀取電表 {meter_id} 寄存器 0x{register_addr:04X} 失敗: {result}")
                     return self._get_simulated_value(register_addr, meter_id)
                 
@@ -260,6 +274,7 @@ class ModbusRTUClient:
                 
             except Exception as e:
                 self.error_count += 1
+                MODBUS_ERRORS.labels(meter_id, classify_modbus_error(e)).inc()
                 self.logger.error(f"讀取寄存器時發生異常: {e}")
                 self.connected = False
                 return self._get_simulated_value(register_addr, meter_id)
@@ -268,6 +283,7 @@ class ModbusRTUClient:
         """獲取模擬數據 (當無法連接到實際設備時使用)"""
         import random
         
+        self.last_read_simulated = True
         current_time = time.time()
         
         if register_addr == 0x0046:  # 總電能 - 持續增長
@@ -293,6 +309,10 @@ class ModbusRTUClient:
     
     def read_meter_data(self, meter_id: int) -> Dict[str, Any]:
         """讀取電表的完整數據"""
+        with MODBUS_POLL_SECONDS.labels(meter_id).time():
+            return self._read_meter_data(meter_id)
+    
+    def _read_meter_data(self, meter_id: int) -> Dict[str, Any]:
         meter_data = {
             'id': meter_id,
             'timestamp': datetime.now().isoformat(),
@@ -311,6 +331,8 @@ class ModbusRTUClient:
             meter_data['current_l3'] = self.read_register(meter_id, 'current_l3') or 0.0
             
             meter_data['total_energy'] = self.read_register(meter_id, 'total_energy') or 0.0
+            # 連線失敗時的模擬電能不可用於累積計算
+            meter_data['simulated'] = self.last_read_simulated
             meter_data['frequency'] = self.read_register(meter_id, 'frequency') or 0.0
             meter_data['power_factor'] = self.read_register(meter_id, 'power_factor') or 0.0
             
@@ -503,13 +525,21 @@ class ModbusRTUClient:
             coil_address = meter_id - 1
             
             # 執行 Write Single Coil (功能碼 0x05)
-            result = self.client.write_coil(
-                address=coil_address,
-                value=relay_on,
-                device_id=meter_id
-            )
+            try:
+                with modbus_trace.span(meter_id, 0x05, coil_address, 1, MODBUS_BUS_BUSY_SECONDS.inc) as span:
+                    result = self.client.write_coil(
+                        address=coil_address,
+                        value=relay_on,
+                        device_id=meter_id
+                    )
+                    if result.isError():
+                        span.error_response()
+            except Exception as e:
+                MODBUS_ERRORS.labels(meter_id, classify_modbus_error(e)).inc()
+                raise
             
             if result.isError():
+                MODBUS_ERRORS.labels(meter_id, classify_modbus_error(result)).inc()
                 self.logger.warning(f"電表 {meter_id} MODBUS RELAY控制失敗，但允許繼續: {result}")
                 # 在開發環境中，即使MODBUS失敗也允許狀態變更
                 return True
@@ -561,51 +591,13 @@ class ModbusRTUClient:
             }
     
     def get_system_billing_summary(self) -> dict:
-        """獲取系統計費摘要"""
+        """獲取系統計費摘要 (取自讀數寫入時維護的全系統累計，不產生匯流排流量)"""
         try:
-            # 透過 TCP 客戶端向 RTU 模擬器請求計費摘要
-            if self.use_tcp and self.connected:
-                current_time = datetime.now()
-                
-                # 暫時返回基於當前電表數據的計費摘要
-                total_usage = 0.0
-                total_cost = 0.0
-                active_meters = 0
-                
-                # 讀取前10個電表的數據來估算總用電量
-                for meter_id in range(1, 11):
-                    try:
-                        meter_data = self.read_meter_data(meter_id)
-                        if meter_data.get('online', False):
-                            daily_energy = meter_data.get('daily_energy_usage', 0)
-                            total_usage += daily_energy
-                            total_cost += daily_energy * 3.5  # 3.5元/kWh
-                            active_meters += 1
-                    except:
-                        continue
-                
-                # 按比例估算所有電表
-                estimated_total_usage = total_usage * (50 / max(active_meters, 1))
-                estimated_total_cost = total_cost * (50 / max(active_meters, 1))
-                
-                return {
-                    'success': True,
-                    'period': f"{current_time.year}-{current_time.month:02d}",
-                    'total_meters': 50,
-                    'active_meters': active_meters,
-                    'estimated_total_usage_kwh': round(estimated_total_usage, 1),
-                    'estimated_total_cost_yuan': round(estimated_total_cost, 2),
-                    'rate_per_kwh': 3.5,
-                    'timestamp': current_time.isoformat(),
-                    'note': '基於部分電表數據的估算值'
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': 'RTU 連接未建立',
-                    'message': '請先建立 RTU 連接'
-                }
-                
+            from ..services.fleet_totals import fleet_totals
+            from ..services.tariff_engine import tariff_engine
+            
+            return {'success': True, **fleet_totals.get_summary(tariff_engine.get_base_price())}
+        
         except Exception as e:
             self.logger.error(f"獲取計費摘要失敗: {e}")
             return {
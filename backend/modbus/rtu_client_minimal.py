@@ -279,12 +279,9 @@ class MinimalModbusRTUClient:
         """獲取模擬數據 (當無法連接到實際設備時使用)"""
         import random
         
-        # 使用供電時段邏輯
-        try:
-            from ..services.meter_service import meter_service
-            is_power_schedule_active = meter_service.is_power_schedule_active('open_power')
-        except:
-            is_power_schedule_active = True  # 預設為供電狀態
+        # 使用供電時段邏輯 (已編譯時段，失敗時內部回退預設時段)
+        from ..services.meter_service import meter_service
+        is_power_schedule_active = meter_service.is_power_schedule_active('open_power')
         
         # 基礎值
         base_voltage = 220.0 + (meter_id % 10)
@@ -0,0 +1,464 @@
+"""
+MODBUS 電表模擬器 / Local Modbus meter simulator
+Serves the ADTEK REGISTER_MAP layout and relay coils for N unit IDs over
+Modbus TCP (asyncio) and Modbus RTU (pseudo-terminal or serial port), with
+injectable latency, jitter, packet loss, dead slaves and baud-rate emulation
+"""
+
+import os
+import math
+import time
+import errno
+import select
+import random
+import socket
+import struct
+import asyncio
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from .rtu_client import ModbusRTUClient, IEEE754Handler
+
+# 功能碼 / Function codes
+READ_COILS = 0x01
+READ_HOLDING_REGISTERS = 0x03
+READ_INPUT_REGISTERS = 0x04
+WRITE_SINGLE_COIL = 0x05
+
+# 例外碼 / Exception codes
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_DATA_ADDRESS = 0x02
+ILLEGAL_DATA_VALUE = 0x03
+
+MAX_READ_REGISTERS = 125
+MAX_READ_COILS = 2000
+
+
+def crc16(data: bytes) -> int:
+    """MODBUS RTU CRC-16"""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return crc
+
+
+def rtu_frame(unit: int, pdu: bytes) -> bytes:
+    """組合 RTU 訊框 (位址 + PDU + CRC，低位元組在前)"""
+    body = bytes([unit]) + pdu
+    return body + struct.pack('<H', crc16(body))
+
+
+class FaultProfile:
+    """
+    故障注入設定
+    
+    Args:
+        latency_ms: 從站固定處理延遲
+        jitter_ms: 延遲的隨機變動幅度 (±)
+        loss_rate: 回應遺失機率 (0-1)，請求仍會被執行
+        dead_units: 完全不回應的單元 ID
+        baudrate: 模擬串列傳輸時間的波特率，0 表示不模擬
+        bits_per_char: 每個字元的位元數 (8N1 為 10)
+    """
+    
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, loss_rate: float = 0.0,
+                 dead_units: Iterable[int] = (), baudrate: int = 0, bits_per_char: int = 10):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.loss_rate = loss_rate
+        self.dead_units = set(dead_units)
+        self.baudrate = baudrate
+        self.bits_per_char = bits_per_char
+    
+    def transfer_time(self, request_bytes: int, response_bytes: int) -> float:
+        """請求與回應在串列匯流排上的傳輸時間 (含兩個 3.5 字元訊框間隔)"""
+        if not self.baudrate:
+            return 0.0
+        return (request_bytes + response_bytes + 7) * self.bits_per_char / self.baudrate
+    
+    def processing_delay(self, rng: random.Random) -> float:
+        """從站處理延遲 (秒)"""
+        delay = self.latency_ms
+        if self.jitter_ms:
+            delay += rng.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, delay) / 1000
+    
+    def to_dict(self) -> Dict:
+        return {
+            'latency_ms': self.latency_ms,
+            'jitter_ms': self.jitter_ms,
+            'loss_rate': self.loss_rate,
+            'dead_units': sorted(self.dead_units),
+            'baudrate': self.baudrate
+        }
+
+
+class SimulatedMeter:
+    """單一電表 - 三相負載、累積電能與繼電器"""
+    
+    def __init__(self, unit: int, rng: random.Random, time_scale: float = 1.0):
+        self.unit = unit
+        self.rng = rng
+        self.time_scale = time_scale
+        self.relay_on = True
+        self.base_current = [rng.uniform(2.0, 15.0) for _ in range(3)]
+        self.power_factor = rng.uniform(0.90, 0.99)
+        self.total_energy = 1000.0 + unit * 100
+        self.daily_energy = 0.0
+        self._phase = rng.uniform(0, 2 * math.pi)
+        self._last_update = time.monotonic()
+        self._registers: Dict[int, int] = {}
+        self._registers_at = 0.0
+    
+    def _advance(self, now: float) -> Dict[str, float]:
+        """依經過時間累積電能並返回目前讀數"""
+        elapsed_hours = (now - self._last_update) * self.time_scale / 3600
+        self._last_update = now
+        
+        wave = math.sin(now / 60 + self._phase)
+        voltages = [220.0 + 2.0 * wave + self.rng.gauss(0, 0.3) + offset for offset in (0.0, 0.8, -0.8)]
+        if self.relay_on:
+            currents = [max(0.0, base * (1 + 0.1 * wave) + self.rng.gauss(0, 0.05)) for base in self.base_current]
+        else:
+            currents = [0.0, 0.0, 0.0]
+        instant_power = sum(v * i for v, i in zip(voltages, currents)) * self.power_factor / 1000
+        
+        self.total_energy += instant_power * elapsed_hours
+        self.daily_energy += instant_power * elapsed_hours
+        return {
+            'voltage_l1': voltages[0], 'voltage_l2': voltages[1], 'voltage_l3': voltages[2],
+            'current_l1': currents[0], 'current_l2': currents[1], 'current_l3': currents[2],
+            'total_energy': self.total_energy,
+            'frequency': 60.0 + self.rng.gauss(0, 0.02),
+            'power_factor': self.power_factor if self.relay_on else 0.0,
+            'daily_energy_usage': self.daily_energy,
+            'power_status': 1.0 if self.relay_on else 0.0,
+            'instant_power': instant_power,
+            'meter_id': float(self.unit)
+        }
+    
+    def registers(self) -> Dict[int, int]:
+        """寄存器表 (每 0.5 秒更新一次)"""
+        now = time.monotonic()
+        if now - self._registers_at >= 0.5:
+            table = {}
+            for name, value in self._advance(now).items():
+                address = ModbusRTUClient.REGISTER_MAP[name]
+                table[address], table[address + 1] = IEEE754Handler.float_to_registers(value)
+            self._registers = table
+            self._registers_at = now
+        return self._registers
+    
+    def set_relay(self, on: bool):
+        self.relay_on = on
+        self._registers_at = 0.0
+    
+    def is_relay_coil(self, address: int) -> bool:
+        """繼電器線圈: 地址 0 (minimalmodbus 控制器) 或 單元 ID - 1 (RTU 客戶端)"""
+        return address == 0 or address == self.unit - 1
+
+
+class ModbusSimulator:
+    """
+    MODBUS 電表模擬器
+    
+    每個端點的請求經過一條模擬匯流排依序處理，因此波特率與延遲設定會像
+    實際 RS-485 匯流排一樣限制總吞吐量。TCP 端點模擬 TCP/RTU 閘道 (未回應
+    的從站不回傳任何資料，由客戶端逾時)。
+    """
+    
+    def __init__(self, units: Iterable[int] = range(1, 51), faults: Optional[FaultProfile] = None,
+                 time_scale: float = 1.0, seed: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.rng = random.Random(seed)
+        self.faults = faults or FaultProfile()
+        self.meters = {unit: SimulatedMeter(unit, self.rng, time_scale) for unit in units}
+        self.stats = {'requests': 0, 'responses': 0, 'exceptions': 0, 'no_response': 0, 'dropped': 0,
+                      'crc_errors': 0}
+        self._stats_lock = threading.Lock()
+        # 每個端點各自是一條匯流排
+        self._tcp_bus: Optional[asyncio.Lock] = None
+        self._rtu_bus = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._tcp_servers = []
+        self._rtu_endpoints = []
+    
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+    
+    # ------------------------------------------------------------------
+    # 請求處理 / Request handling
+    # ------------------------------------------------------------------
+    def _execute(self, meter: SimulatedMeter, pdu: bytes) -> bytes:
+        """執行 PDU 並返回回應 PDU (含例外回應)"""
+        function = pdu[0]
+        
+        def exception(code: int) -> bytes:
+            self._count('exceptions')
+            return bytes([function | 0x80, code])
+        
+        if len(pdu) < 5:
+            return exception(ILLEGAL_DATA_VALUE)
+        address, value = struct.unpack('>HH', pdu[1:5])
+        
+        if function in (READ_HOLDING_REGISTERS, READ_INPUT_REGISTERS):
+            if not 1 <= value <= MAX_READ_REGISTERS:
+                return exception(ILLEGAL_DATA_VALUE)
+            table = meter.registers()
+            registers = [table.get(address + offset, 0) for offset in range(value)]
+            return struct.pack(f'>BB{value}H', function, value * 2, *registers)
+        
+        if function == READ_COILS:
+            if not 1 <= value <= MAX_READ_COILS:
+                return exception(ILLEGAL_DATA_VALUE)
+            bits = bytearray((value + 7) // 8)
+            for offset in range(value):
+                if meter.relay_on and meter.is_relay_coil(address + offset):
+                    bits[offset // 8] |= 1 << (offset % 8)
+            return bytes([function, len(bits)]) + bytes(bits)
+        
+        if function == WRITE_SINGLE_COIL:
+            if value not in (0xFF00, 0x0000):
+                return exception(ILLEGAL_DATA_VALUE)
+            if not meter.is_relay_coil(address):
+                return exception(ILLEGAL_DATA_ADDRESS)
+            meter.set_relay(value == 0xFF00)
+            return pdu[:5]
+        
+        return exception(ILLEGAL_FUNCTION)
+    
+    def handle(self, unit: int, pdu: bytes) -> Tuple[Optional[bytes], float]:
+        """
+        處理一個請求
+        
+        Returns:
+            (回應 PDU 或 None 表示不回應, 回應前應等待的秒數)
+        """
+        self._count('requests')
+        meter = self.meters.get(unit)
+        if not pdu or meter is None or unit in self.faults.dead_units:
+            self._count('no_response')
+            return None, self.faults.transfer_time(len(pdu) + 3, 0)
+        
+        response = self._execute(meter, pdu)
+        delay = self.faults.processing_delay(self.rng) + self.faults.transfer_time(len(pdu) + 3, len(response) + 3)
+        if self.faults.loss_rate and self.rng.random() < self.faults.loss_rate:
+            self._count('dropped')
+            return None, delay
+        self._count('responses')
+        return response, delay
+    
+    # ------------------------------------------------------------------
+    # MODBUS TCP / Modbus TCP (asyncio)
+    # ------------------------------------------------------------------
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                header = await reader.readexactly(7)
+                transaction_id, protocol_id, length, unit = struct.unpack('>HHHB', header)
+                pdu = await reader.readexactly(length - 1) if length > 1 else b''
+                
+                # 閘道後方的匯流排同一時間只處理一個請求
+                async with self._tcp_bus:
+                    response, delay = self.handle(unit, pdu)
+                    if delay:
+                        await asyncio.sleep(delay)
+                
+                if response is not None:
+                    writer.write(struct.pack('>HHHB', transaction_id, protocol_id, len(response) + 1, unit) + response)
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _start_tcp_server(self, host: str, port: int):
+        if self._tcp_bus is None:
+            self._tcp_bus = asyncio.Lock()
+        return await asyncio.start_server(self._handle_tcp, host, port)
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._loop.run_forever, name='modbus-simulator',
+                                                 daemon=True)
+            self._loop_thread.start()
+        return self._loop
+    
+    def start_tcp(self, host: str = '127.0.0.1', port: int = 5502) -> int:
+        """啟動 MODBUS TCP 端點，返回實際監聽的埠號 (port=0 時自動選擇)"""
+        loop = self._ensure_loop()
+        server = asyncio.run_coroutine_threadsafe(self._start_tcp_server(host, port), loop).result()
+        self._tcp_servers.append(server)
+        bound_port = server.sockets[0].getsockname()[1]
+        self.logger.info(f"MODBUS TCP 模擬器監聽 {host}:{bound_port} ({len(self.meters)} 個單元)")
+        return bound_port
+    
+    # ------------------------------------------------------------------
+    # MODBUS RTU / Modbus RTU (pseudo-terminal or serial port)
+    # ------------------------------------------------------------------
+    def start_rtu(self, port: Optional[str] = None, baudrate: int = 9600) -> str:
+        """
+        啟動 MODBUS RTU 端點
+        
+        Args:
+            port: 串口名稱 (例如 COM5 或 /dev/ttyUSB1)；None 時建立虛擬終端 (僅 POSIX)
+        
+        Returns:
+            str: 客戶端應開啟的串口路徑
+        """
+        if port is None:
+            endpoint = _PtyEndpoint()
+        else:
+            endpoint = _SerialEndpoint(port, baudrate)
+        self._rtu_endpoints.append(endpoint)
+        threading.Thread(target=self._serve_rtu, args=(endpoint,), name='modbus-simulator-rtu',
+                         daemon=True).start()
+        self.logger.info(f"MODBUS RTU 模擬器使用串口 {endpoint.client_path} ({len(self.meters)} 個單元)")
+        return endpoint.client_path
+    
+    def _read_rtu_request(self, endpoint) -> Optional[bytes]:
+        """讀取一個 RTU 請求訊框 (依功能碼判斷長度)"""
+        head = endpoint.read(2, timeout=0.5)
+        if len(head) < 2:
+            return None
+        function = head[1] & 0x7F
+        if function in (0x0F, 0x10):
+            rest = endpoint.read(5, timeout=0.1)
+            if len(rest) < 5:
+                return None
+            rest += endpoint.read(rest[4] + 2, timeout=0.1)
+        else:
+            rest = endpoint.read(6, timeout=0.1)
+        return head + rest
+    
+    def _serve_rtu(self, endpoint):
+        while not endpoint.closed:
+            try:
+                frame = self._read_rtu_request(endpoint)
+            except OSError:
+                break
+            if frame is None:
+                continue
+            if len(frame) < 4 or crc16(frame[:-2]) != struct.unpack('<H', frame[-2:])[0]:
+                # 訊框錯誤: 捨棄緩衝區等待下一個訊框間隔
+                self._count('crc_errors')
+                endpoint.flush_input()
+                continue
+            
+            unit, pdu = frame[0], frame[1:-2]
+            with self._rtu_bus:
+                response, delay = self.handle(unit, pdu)
+                if delay:
+                    time.sleep(delay)
+            if response is not None and unit != 0:
+                try:
+                    endpoint.write(rtu_frame(unit, response))
+                except OSError:
+                    break
+    
+    # ------------------------------------------------------------------
+    # 生命週期與統計 / Lifecycle and statistics
+    # ------------------------------------------------------------------
+    def stop(self):
+        """停止所有端點"""
+        for endpoint in self._rtu_endpoints:
+            endpoint.close()
+        self._rtu_endpoints = []
+        if self._loop is not None:
+            for server in self._tcp_servers:
+                server.close()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=5)
+            self._loop = None
+        self._tcp_servers = []
+        self._tcp_bus = None
+    
+    def get_stats(self) -> Dict:
+        """獲取請求統計"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['units'] = len(self.meters)
+        stats['faults'] = self.faults.to_dict()
+        return stats
+
+
+class _PtyEndpoint:
+    """虛擬終端 - 模擬器使用主端，客戶端開啟從端路徑"""
+    
+    def __init__(self):
+        import tty
+        
+        self.master_fd, self.slave_fd = os.openpty()
+        # 從端保持開啟並設為 raw，避免客戶端連線前的回顯與 EIO
+        tty.setraw(self.slave_fd)
+        self.client_path = os.ttyname(self.slave_fd)
+        self.closed = False
+    
+    def read(self, size: int, timeout: float) -> bytes:
+        data = b''
+        deadline = time.monotonic() + timeout
+        while len(data) < size and not self.closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.master_fd], [], [], remaining)[0]:
+                break
+            try:
+                data += os.read(self.master_fd, size - len(data))
+            except OSError as e:
+                if e.errno == errno.EIO:
+                    # 客戶端尚未開啟或已關閉從端
+                    time.sleep(0.05)
+                    continue
+                raise
+        return data
+    
+    def write(self, data: bytes):
+        os.write(self.master_fd, data)
+    
+    def flush_input(self):
+        while self.read(256, timeout=0.01):
+            pass
+    
+    def close(self):
+        self.closed = True
+        for fd in (self.master_fd, self.slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class _SerialEndpoint:
+    """實體或虛擬串口 (例如 com0com、socat)"""
+    
+    def __init__(self, port: str, baudrate: int):
+        import serial
+        
+        self.serial = serial.Serial(port, baudrate=baudrate, bytesize=8, parity='N', stopbits=1, timeout=0.5)
+        self.client_path = port
+        self.closed = False
+    
+    def read(self, size: int, timeout: float) -> bytes:
+        self.serial.timeout = timeout
+        return self.serial.read(size)
+    
+    def write(self, data: bytes):
+        self.serial.write(data)
+    
+    def flush_input(self):
+        self.serial.reset_input_buffer()
+    
+    def close(self):
+        self.closed = True
+        self.serial.close()
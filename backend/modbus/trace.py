@@ -0,0 +1,223 @@
+"""
+MODBUS 交易追蹤 / Modbus transaction trace
+Fixed-size ring buffer of recent bus transactions (unit, function code,
+address, count, start time, duration, outcome) backed by preallocated arrays
+"""
+
+import time
+import threading
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from ..services.metrics import classify_modbus_error
+
+# 交易結果代碼 / Outcome codes
+OUTCOME_OK = 0
+OUTCOME_ERROR_RESPONSE = 1
+OUTCOME_TIMEOUT = 2
+OUTCOME_EXCEPTION = 3
+
+OUTCOME_NAMES = ('ok', 'error_response', 'timeout', 'exception')
+OUTCOME_CODES = {name: code for code, name in enumerate(OUTCOME_NAMES)}
+
+DEFAULT_CAPACITY = 4096
+
+
+def outcome_for_exception(error: BaseException) -> int:
+    """依例外判斷結果代碼 (與 MODBUS 錯誤指標使用同一分類)"""
+    return OUTCOME_CODES[classify_modbus_error(error)]
+
+
+class _Span:
+    """with 區塊記錄一次交易，離開時寫入環形緩衝區"""
+    
+    __slots__ = ('trace', 'unit', 'function', 'address', 'count', 'observe', 'started', 'duration', 'outcome')
+    
+    def __init__(self, trace, unit, function, address, count, observe):
+        self.trace = trace
+        self.unit = unit
+        self.function = function
+        self.address = address
+        self.count = count
+        self.observe = observe
+        self.started = 0.0
+        self.duration = 0.0
+        self.outcome = OUTCOME_OK
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.started
+        if exc is not None:
+            self.outcome = outcome_for_exception(exc)
+        self.trace.record(self.unit, self.function, self.address, self.count,
+                          self.started, self.duration, self.outcome)
+        if self.observe is not None:
+            self.observe(self.duration)
+        return False
+    
+    def error_response(self):
+        """標記設備回傳錯誤回應 (未拋出例外)"""
+        self.outcome = OUTCOME_ERROR_RESPONSE
+
+
+class ModbusTrace:
+    """
+    MODBUS 交易環形緩衝區
+    
+    每個欄位各自是一個預先配置的 array，寫入只更新同一索引位置，
+    不產生新物件；緩衝區滿後覆蓋最舊的紀錄。開始時間以 perf_counter
+    記錄，查詢時換算為牆上時間。
+    """
+    
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self._lock = threading.Lock()
+        self._allocate(capacity)
+        # perf_counter 與 time.time 的差值，用於換算開始時間
+        self._clock_offset = time.time() - time.perf_counter()
+    
+    def _allocate(self, capacity: int):
+        if capacity < 1:
+            raise ValueError('Trace capacity must be positive')
+        self.capacity = capacity
+        self._unit = array('H', bytes(2 * capacity))
+        self._function = array('B', bytes(capacity))
+        self._address = array('H', bytes(2 * capacity))
+        self._count = array('H', bytes(2 * capacity))
+        self._started = array('d', bytes(8 * capacity))
+        self._duration = array('d', bytes(8 * capacity))
+        self._outcome = array('b', bytes(capacity))
+        self._written = 0
+    
+    def resize(self, capacity: int):
+        """調整容量 (清除現有紀錄)"""
+        with self._lock:
+            if capacity != self.capacity:
+                self._allocate(capacity)
+    
+    def clear(self):
+        """清除所有紀錄"""
+        with self._lock:
+            self._written = 0
+    
+    # ------------------------------------------------------------------
+    # 記錄 / Recording
+    # ------------------------------------------------------------------
+    def span(self, unit: int, function: int, address: int, count: int, observe=None) -> _Span:
+        """
+        建立交易記錄區塊
+        
+        Args:
+            observe: 離開時以耗時 (秒) 呼叫的函數，例如匯流排忙碌計數器
+        """
+        return _Span(self, unit, function, address, count, observe)
+    
+    def record(self, unit: int, function: int, address: int, count: int,
+               started: float, duration: float, outcome: int = OUTCOME_OK):
+        """寫入一筆交易 (started 為 perf_counter 時間)"""
+        with self._lock:
+            index = self._written % self.capacity
+            self._unit[index] = unit & 0xFFFF
+            self._function[index] = function & 0xFF
+            self._address[index] = address & 0xFFFF
+            self._count[index] = count & 0xFFFF
+            self._started[index] = started
+            self._duration[index] = duration
+            self._outcome[index] = outcome
+            self._written += 1
+    
+    # ------------------------------------------------------------------
+    # 查詢 / Query
+    # ------------------------------------------------------------------
+    def query(self, meter_id: Optional[int] = None, since: Optional[float] = None,
+              until: Optional[float] = None, outcome: Optional[int] = None,
+              limit: int = 500) -> Dict:
+        """
+        查詢交易紀錄 (最新的在前)
+        
+        Args:
+            meter_id: 只返回指定單元 ID
+            since / until: 開始時間範圍 (epoch 秒)
+            outcome: 只返回指定結果代碼
+            limit: 最多返回筆數
+        
+        Returns:
+            Dict: 紀錄列表與依單元彙總 (彙總涵蓋所有符合條件的紀錄)
+        """
+        with self._lock:
+            written = self._written
+            capacity = self.capacity
+            columns = (array('H', self._unit), array('B', self._function), array('H', self._address),
+                       array('H', self._count), array('d', self._started), array('d', self._duration),
+                       array('b', self._outcome))
+        
+        units, functions, addresses, counts, starts, durations, outcomes = columns
+        offset = self._clock_offset
+        stored = min(written, capacity)
+        records: List[Dict] = []
+        summary: Dict[int, Dict] = {}
+        
+        for position in range(written - 1, written - stored - 1, -1):
+            index = position % capacity
+            unit = units[index]
+            if meter_id is not None and unit != meter_id:
+                continue
+            started_at = starts[index] + offset
+            if (since is not None and started_at < since) or (until is not None and started_at > until):
+                continue
+            code = outcomes[index]
+            if outcome is not None and code != outcome:
+                continue
+            
+            duration_ms = durations[index] * 1000
+            unit_summary = summary.get(unit)
+            if unit_summary is None:
+                unit_summary = summary[unit] = {'unit': unit, 'transactions': 0, 'errors': 0,
+                                                'total_ms': 0.0, 'max_ms': 0.0}
+            unit_summary['transactions'] += 1
+            unit_summary['total_ms'] += duration_ms
+            if duration_ms > unit_summary['max_ms']:
+                unit_summary['max_ms'] = duration_ms
+            if code != OUTCOME_OK:
+                unit_summary['errors'] += 1
+            
+            if len(records) < limit:
+                records.append({
+                    'sequence': position,
+                    'unit': unit,
+                    'function': functions[index],
+                    'address': addresses[index],
+                    'count': counts[index],
+                    'started_at': datetime.fromtimestamp(started_at).isoformat(timespec='milliseconds'),
+                    'duration_ms': round(duration_ms, 3),
+                    'outcome': OUTCOME_NAMES[code]
+                })
+        
+        for unit_summary in summary.values():
+            unit_summary['avg_ms'] = round(unit_summary['total_ms'] / unit_summary['transactions'], 3)
+            unit_summary['total_ms'] = round(unit_summary['total_ms'], 3)
+            unit_summary['max_ms'] = round(unit_summary['max_ms'], 3)
+        
+        return {
+            'records': records,
+            'matched': sum(item['transactions'] for item in summary.values()),
+            'by_unit': sorted(summary.values(), key=lambda item: item['total_ms'], reverse=True)
+        }
+    
+    def get_stats(self) -> Dict:
+        """獲取緩衝區統計"""
+        with self._lock:
+            written = self._written
+        return {
+            'capacity': self.capacity,
+            'recorded': written,
+            'stored': min(written, self.capacity),
+            'overwritten': max(0, written - self.capacity)
+        }
+
+
+# 全局交易追蹤實例
+modbus_trace = ModbusTrace()
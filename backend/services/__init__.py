@@ -3,5 +3,24 @@ Services package for Power Meter Web Edition
 """
 
 from .meter_service import MeterDataService, meter_service
+from .retention_service import HistoryRetentionService, retention_service
+from .power_schedule import CompiledPowerSchedule
+from .export_service import HistoryExportService, export_service
+from .billing_engine import BillingEngine, billing_engine
+from .tariff_engine import TariffEngine, tariff_engine
+from .counter_normalizer import CounterNormalizer, counter_normalizer
+from .fleet_totals import FleetTotals, fleet_totals
+from .dashboard_aggregator import DashboardAggregator, dashboard_aggregator
+from .system_metrics import SystemMetricsSampler, system_metrics
+from .log_reader import LogReader, log_reader
+from .request_coalescer import RequestCoalescer
+from .profiler import SamplingProfiler, sampling_profiler
+from .scheduler import JobScheduler, job_scheduler, init_scheduler, start_scheduler
 
-__all__ = ['MeterDataService', 'meter_service']
\ No newline at end of file
+__all__ = ['MeterDataService', 'meter_service', 'HistoryRetentionService', 'retention_service',
+           'CompiledPowerSchedule', 'HistoryExportService', 'export_service',
+           'BillingEngine', 'billing_engine', 'TariffEngine', 'tariff_engine',
+           'CounterNormalizer', 'counter_normalizer', 'FleetTotals', 'fleet_totals',
+           'DashboardAggregator', 'dashboard_aggregator', 'SystemMetricsSampler', 'system_metrics',
+           'LogReader', 'log_reader', 'RequestCoalescer', 'SamplingProfiler', 'sampling_profiler',
+           'JobScheduler', 'job_scheduler', 'init_scheduler', 'start_scheduler']
\ No newline at end of file
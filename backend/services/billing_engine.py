@@ -0,0 +1,341 @@
+"""
+Billing Engine - 供電時段感知的增量計費引擎
+Segments each meter's energy counter at schedule transitions and day boundaries,
+finalising BillingRecord rows from counter deltas as readings arrive
+"""
+
+import logging
+import threading
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import func, select, update
+
+from ..database import db, BillingRecord, read_session
+
+
+def utc_to_local(value: datetime) -> datetime:
+    """UTC (naive) 轉換為系統本地時間 (naive)"""
+    return value.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+
+def local_to_utc(value: datetime) -> datetime:
+    """系統本地時間 (naive) 轉換為 UTC (naive)"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class _OpenSegment:
+    """進行中的計費區段 (對應一筆 end_time 為空的 BillingRecord)"""
+    
+    __slots__ = ('record_id', 'billing_date', 'schedule_type', 'start_time', 'start_energy',
+                 'last_time', 'last_energy', 'energy_used', 'cost', 'until')
+    
+    def __init__(self, record_id, billing_date, schedule_type, start_time, start_energy,
+                 last_time, last_energy, energy_used, cost, until):
+        self.record_id = record_id
+        self.billing_date = billing_date
+        self.schedule_type = schedule_type
+        self.start_time = start_time          # UTC
+        self.start_energy = start_energy
+        self.last_time = last_time            # UTC
+        self.last_energy = last_energy
+        self.energy_used = energy_used
+        self.cost = cost                      # 分時電價計算的電費 (不含累進加價)
+        self.until = until                    # UTC，區段結束的時間點
+
+
+class BillingEngine:
+    """
+    增量計費引擎
+    
+    - 每支電表同時只有一個進行中的區段 (計費日 + 供電時段類型)
+    - 讀數在區段內只累加差值；跨越時段切換或午夜時按時間內插切分
+    - 區段結束即寫入 end_time，月結只需加總既有記錄
+    - 每筆用電量以讀數時間的分時單價計價 (與 tariff_engine 每小時計價相同)；
+      累進加價依整個計費期間的總用電量計算，不計入區段
+    - 重啟後從 end_time 為空的記錄恢復進行中的區段
+    """
+    
+    # 讀數間隔超過此值時不再逐段內插，直接以前一筆讀數結束舊區段
+    MAX_INTERPOLATE_GAP = timedelta(days=2)
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._segments: Dict[int, _OpenSegment] = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+    
+    def reset(self):
+        """清除記憶體狀態 (交易回滾後呼叫，下次從資料庫重新載入)"""
+        with self._lock:
+            self._segments.clear()
+            self._loaded = False
+    
+    # ------------------------------------------------------------------
+    # 區段邊界 / Segment boundaries
+    # ------------------------------------------------------------------
+    def _segment_at(self, at_utc: datetime):
+        """計算指定時間所屬的區段: (計費日, 時段類型, 區段結束時間 UTC)"""
+        from .meter_service import meter_service
+        
+        compiled = meter_service.get_power_schedule()
+        local = utc_to_local(at_utc)
+        active, transition = compiled.state('open_power', local)
+        
+        next_midnight = datetime.combine(local.date() + timedelta(days=1), datetime.min.time())
+        until = min(transition, next_midnight) if transition else next_midnight
+        return local.date(), 'open_power' if active else 'close_power', local_to_utc(until)
+    
+    def price_at(self, at_utc: datetime) -> float:
+        """讀數時間的分時單價 (電價表依本地星期與小時查表)"""
+        from .tariff_engine import tariff_engine
+        return tariff_engine.get_tariff().price_at(utc_to_local(at_utc))
+    
+    # ------------------------------------------------------------------
+    # 載入與恢復 / Loading and recovery
+    # ------------------------------------------------------------------
+    def _ensure_loaded(self):
+        """一次載入所有進行中的區段"""
+        if self._loaded:
+            return
+        
+        rows = db.session.execute(
+            select(BillingRecord.id, BillingRecord.meter_id, BillingRecord.billing_date,
+                   BillingRecord.power_schedule_type, BillingRecord.start_time, BillingRecord.start_energy,
+                   BillingRecord.end_energy, BillingRecord.energy_used, BillingRecord.total_cost,
+                   BillingRecord.updated_at)
+            .where(BillingRecord.end_time.is_(None))
+            .order_by(BillingRecord.id)
+        ).all()
+        
+        for row in rows:
+            if row.meter_id in self._segments:
+                # 同一電表有多筆未結束記錄 (異常)，保留最新一筆，舊的以最後讀數結束
+                stale = self._segments[row.meter_id]
+                self._close_record(stale, stale.last_time, stale.last_energy)
+            
+            _, _, until = self._segment_at(row.start_time)
+            self._segments[row.meter_id] = _OpenSegment(
+                row.id, row.billing_date, row.power_schedule_type, row.start_time,
+                row.start_energy or 0.0, row.updated_at or row.start_time,
+                row.end_energy or row.start_energy or 0.0, row.energy_used or 0.0, row.total_cost or 0.0, until
+            )
+        
+        if rows:
+            self.logger.info(f"恢復進行中的計費區段: {len(self._segments)} 支電表")
+        self._loaded = True
+    
+    # ------------------------------------------------------------------
+    # 寫入 / Persistence (不提交，由呼叫者提交交易)
+    # ------------------------------------------------------------------
+    def _open_record(self, meter_id: int, start_time: datetime, energy: float) -> _OpenSegment:
+        """建立新的區段與對應記錄"""
+        billing_date, schedule_type, until = self._segment_at(start_time)
+        unit_price = self.price_at(start_time)
+        
+        record = BillingRecord(
+            meter_id=meter_id,
+            billing_date=billing_date,
+            start_time=start_time,
+            start_energy=energy,
+            end_energy=energy,
+            energy_used=0.0,
+            unit_price=unit_price,
+            total_cost=0.0,
+            power_schedule_type=schedule_type
+        )
+        db.session.add(record)
+        db.session.flush()
+        
+        return _OpenSegment(record.id, billing_date, schedule_type, start_time, energy,
+                            start_time, energy, 0.0, 0.0, until)
+    
+    def _write_progress(self, segment: _OpenSegment, end_time: Optional[datetime] = None):
+        """更新區段記錄 (end_time 有值代表結束區段，unit_price 為區段平均單價)"""
+        unit_price = (segment.cost / segment.energy_used if segment.energy_used > 0
+                      else self.price_at(segment.start_time))
+        values = {
+            'end_energy': segment.last_energy,
+            'energy_used': segment.energy_used,
+            'unit_price': unit_price,
+            'total_cost': segment.cost,
+            'updated_at': segment.last_time
+        }
+        if end_time is not None:
+            values['end_time'] = end_time
+        
+        db.session.execute(
+            update(BillingRecord)
+            .where(BillingRecord.id == segment.record_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+    
+    def _add_energy(self, segment: _OpenSegment, used: float, price: float):
+        """累加區段用電量與電費"""
+        segment.energy_used += used
+        segment.cost += used * price
+    
+    def _close_record(self, segment: _OpenSegment, end_time: datetime, end_energy: float,
+                      price: float = 0.0):
+        """以指定時間與讀數結束區段 (price 為新增用電量的單價)"""
+        if end_energy > segment.last_energy:
+            self._add_energy(segment, end_energy - segment.last_energy, price)
+        segment.last_energy = end_energy
+        segment.last_time = end_time
+        self._write_progress(segment, end_time=end_time)
+    
+    # ------------------------------------------------------------------
+    # 讀數處理 / Reading ingestion
+    # ------------------------------------------------------------------
+    def record_reading(self, meter_id: int, energy: float, at: Optional[datetime] = None,
+                       delta: Optional[float] = None) -> Optional[int]:
+        """
+        處理一筆累積電能讀數 (加入目前交易，不提交)
+        
+        Args:
+            meter_id: 電表 ID
+            energy: 累積電能 kWh
+            at: 讀數時間 (UTC)，預設為現在
+            delta: 已正規化的用電量 (計數器重置或回捲時由 counter_normalizer 判定)，
+                   None 表示以讀數差值計算
+        
+        Returns:
+            int: 目前區段對應的 BillingRecord ID
+        """
+        at = at or datetime.utcnow()
+        energy = float(energy)
+        
+        with self._lock:
+            self._ensure_loaded()
+            segment = self._segments.get(meter_id)
+            
+            if segment is None:
+                segment = self._open_record(meter_id, at, energy)
+                self._segments[meter_id] = segment
+                return segment.record_id
+            
+            if at < segment.last_time:
+                # 亂序讀數: 不影響計費
+                return segment.record_id
+            
+            # 以正規化用電量推算的讀數 (區段內比較與內插用)，最後仍以實際讀數作為基準
+            target = energy if delta is None else segment.last_energy + max(delta, 0.0)
+            # 與 tariff_engine 相同: 整筆用電量以讀數所在小時的單價計價
+            price = self.price_at(at)
+            
+            # 跨越區段邊界: 依時間內插切分用電量
+            if at >= segment.until:
+                if at - segment.last_time > self.MAX_INTERPOLATE_GAP:
+                    self._close_record(segment, segment.last_time, segment.last_energy)
+                    segment = self._open_record(meter_id, at, energy)
+                    self._segments[meter_id] = segment
+                    return segment.record_id
+                
+                while at >= segment.until:
+                    boundary = segment.until
+                    span = (at - segment.last_time).total_seconds()
+                    ratio = (boundary - segment.last_time).total_seconds() / span if span > 0 else 1.0
+                    used = max(target - segment.last_energy, 0.0)
+                    boundary_energy = segment.last_energy + used * ratio
+                    
+                    self._close_record(segment, boundary, boundary_energy, price)
+                    segment = self._open_record(meter_id, boundary, boundary_energy)
+                    self._segments[meter_id] = segment
+            
+            # 區段內累加差值；計數器倒退視為重置，只更新基準
+            if target > segment.last_energy:
+                self._add_energy(segment, target - segment.last_energy, price)
+            segment.last_energy = energy
+            segment.last_time = at
+            self._write_progress(segment)
+            return segment.record_id
+    
+    def close_all(self, at: Optional[datetime] = None) -> int:
+        """結束所有進行中的區段 (關機或手動結算時使用，不提交)"""
+        at = at or datetime.utcnow()
+        with self._lock:
+            self._ensure_loaded()
+            count = 0
+            for segment in self._segments.values():
+                self._close_record(segment, max(at, segment.last_time), segment.last_energy)
+                count += 1
+            self._segments.clear()
+            return count
+    
+    # ------------------------------------------------------------------
+    # 查詢 / Lookups
+    # ------------------------------------------------------------------
+    def get_open_segments(self) -> List[Dict]:
+        """獲取進行中的區段"""
+        with self._lock:
+            return [{
+                'meter_id': meter_id,
+                'record_id': segment.record_id,
+                'billing_date': segment.billing_date.isoformat(),
+                'power_schedule_type': segment.schedule_type,
+                'start_time': segment.start_time.isoformat(),
+                'start_energy': round(segment.start_energy, 3),
+                'last_energy': round(segment.last_energy, 3),
+                'energy_used': round(segment.energy_used, 3),
+                'segment_ends_at': segment.until.isoformat()
+            } for meter_id, segment in sorted(self._segments.items())]
+    
+    def get_period_summary(self, start_date: date, end_date: date, meter_id: Optional[int] = None) -> Dict:
+        """
+        加總期間內的計費記錄 (含進行中區段的目前累計)
+        
+        Args:
+            start_date: 起始計費日 (含)
+            end_date: 結束計費日 (不含)
+            meter_id: 指定電表，None 表示全部
+        """
+        query = (
+            select(BillingRecord.meter_id, BillingRecord.power_schedule_type,
+                   func.sum(BillingRecord.energy_used), func.sum(BillingRecord.total_cost),
+                   func.count(BillingRecord.id))
+            .where(BillingRecord.billing_date >= start_date, BillingRecord.billing_date < end_date)
+            .group_by(BillingRecord.meter_id, BillingRecord.power_schedule_type)
+        )
+        if meter_id is not None:
+            query = query.where(BillingRecord.meter_id == meter_id)
+        
+        with read_session() as session:
+            rows = session.execute(query).all()
+        
+        meters: Dict[int, Dict] = {}
+        for row_meter_id, schedule_type, energy_used, total_cost, segments in rows:
+            entry = meters.setdefault(row_meter_id, {
+                'meter_id': row_meter_id, 'energy_used': 0.0, 'total_cost': 0.0, 'by_schedule': {}
+            })
+            entry['energy_used'] += energy_used or 0.0
+            entry['total_cost'] += total_cost or 0.0
+            entry['by_schedule'][schedule_type] = {
+                'energy_used': round(energy_used or 0.0, 3),
+                'total_cost': round(total_cost or 0.0, 2),
+                'segments': segments
+            }
+        
+        for entry in meters.values():
+            entry['energy_used'] = round(entry['energy_used'], 3)
+            entry['total_cost'] = round(entry['total_cost'], 2)
+        
+        return {
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'meters': [meters[key] for key in sorted(meters)],
+            'total_energy_used': round(sum(entry['energy_used'] for entry in meters.values()), 3),
+            'total_cost': round(sum(entry['total_cost'] for entry in meters.values()), 2)
+        }
+    
+    def get_monthly_summary(self, year: int, month: int, meter_id: Optional[int] = None) -> Dict:
+        """月結摘要 - 直接加總當月計費記錄"""
+        start_date = date(year, month, 1)
+        end_date = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        summary = self.get_period_summary(start_date, end_date, meter_id)
+        summary['month'] = f'{year:04d}-{month:02d}'
+        return summary
+
+
+# 全局服務實例
+billing_engine = BillingEngine()
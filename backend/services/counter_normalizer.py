@@ -0,0 +1,311 @@
+"""
+Counter Normalizer - 累積電能計數器正規化
+Turns raw cumulative energy readings into trustworthy deltas: detects counter
+resets and rollovers, rejects implausible jumps and splits deltas across the
+local day boundary when a polling gap spans midnight
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+# 讀數判定結果 / Reading classifications
+FLAG_OK = 'ok'                    # 正常增量
+FLAG_BASELINE = 'baseline'        # 首筆讀數，只建立基準
+FLAG_RESET = 'reset'              # 計數器歸零 (換表或清除)
+FLAG_ROLLOVER = 'rollover'        # 計數器達上限後回捲
+FLAG_IMPLAUSIBLE = 'implausible'  # 超過額定功率可能產生的用電量
+FLAG_SIMULATED = 'simulated'      # 模擬值，不計入用電
+FLAG_INVALID = 'invalid'          # 非數值或負值
+FLAG_REBASE = 'rebase'            # 跳動經下一筆讀數確認，改以跳動後的讀數為基準
+
+FLAG_CODES = [FLAG_OK, FLAG_BASELINE, FLAG_RESET, FLAG_ROLLOVER, FLAG_IMPLAUSIBLE, FLAG_SIMULATED, FLAG_INVALID,
+              FLAG_REBASE]
+
+
+def utc_epoch(value: Optional[datetime]) -> float:
+    """UTC naive 時間轉 epoch 秒 (None 為 NaN)"""
+    if value is None:
+        return float('nan')
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class CounterNormalizer:
+    """
+    累積電能計數器正規化
+    
+    一次處理整批讀數 (NumPy 向量化，未安裝時逐筆計算)，不需要額外查詢。
+    
+    異常跳動的讀數只標記並暫存，基準維持前次讀數；下一筆讀數與暫存值一致
+    (由暫存值起算在容許範圍內) 時才確認跳動，改以暫存值為基準。前次讀數
+    時間未知時無法估計容許量，不做跳動判定。
+    """
+    
+    # 計數器回捲判定: 前次讀數需接近上限
+    ROLLOVER_ZONE = 0.9
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._counts = {flag: 0 for flag in FLAG_CODES}
+        self._interpolated = 0
+        self._anomalies = deque(maxlen=200)
+        self._last_reading_at: Dict[int, float] = {}  # 各電表計數器基準的讀數時間 (epoch 秒)
+        self._held: Dict[int, Tuple[float, float]] = {}  # 待確認的跳動讀數 (讀數, epoch 秒)
+    
+    def _config(self, key: str, default):
+        """讀取應用程式配置 (無應用上下文時使用預設值)"""
+        try:
+            from flask import current_app
+            return current_app.config.get(key, default)
+        except RuntimeError:
+            return default
+    
+    def _limits(self):
+        """額定功率 (kW)、容許倍數、固定容許量 (kWh)、計數器上限"""
+        return (
+            float(self._config('COUNTER_RATED_POWER_KW', 22.0)),
+            float(self._config('COUNTER_JUMP_TOLERANCE', 1.5)),
+            float(self._config('COUNTER_JUMP_SLACK_KWH', 0.5)),
+            float(self._config('ENERGY_COUNTER_MAX', 999999.9))
+        )
+    
+    def normalize(self, meter_ids: Sequence[int], previous: Sequence[float], current: Sequence[float],
+                  simulated: Sequence[bool], now: Optional[float] = None,
+                  previous_at: Optional[Sequence[Optional[float]]] = None) -> Dict:
+        """
+        正規化一批讀數
+        
+        Args:
+            meter_ids: 電表 ID
+            previous: 前次累積電能 (NaN 或 <= 0 表示尚無基準)
+            current: 本次累積電能
+            simulated: 是否為模擬值
+            now: 本次讀數時間 (epoch 秒)
+            previous_at: 前次讀數時間 (epoch 秒)，本進程尚未見過該電表時使用 (例如重新啟動後)
+        
+        Returns:
+            Dict: delta (計入用電量)、today (屬於本地今日的部分)、baseline (新的計數器基準)、flags
+        """
+        now = time.time() if now is None else now
+        local_now = datetime.fromtimestamp(now)
+        midnight = datetime.combine(local_now.date(), datetime.min.time()).timestamp()
+        
+        fallback = previous_at or [None] * len(meter_ids)
+        unknown = (float('nan'), float('nan'))
+        with self._lock:
+            previous_at = [self._last_reading_at.get(meter_id, at) for meter_id, at in zip(meter_ids, fallback)]
+            held = [self._held.get(meter_id, unknown) for meter_id in meter_ids]
+        
+        if HAS_NUMPY:
+            delta, today, baseline, codes = self._normalize_numpy(previous, previous_at, current, simulated,
+                                                                  held, now, midnight)
+        else:
+            delta, today, baseline, codes = self._normalize_python(previous, previous_at, current, simulated,
+                                                                   held, now, midnight)
+        
+        flags = [FLAG_CODES[code] for code in codes]
+        self._record(meter_ids, previous, current, flags, delta, today, now)
+        return {'delta': list(delta), 'today': list(today), 'baseline': list(baseline), 'flags': flags}
+    
+    def _normalize_numpy(self, previous, previous_at, current, simulated, held, now, midnight):
+        """NumPy 向量化判定"""
+        rated_kw, tolerance, slack, counter_max = self._limits()
+        
+        prev = np.asarray(previous, dtype=np.float64)
+        prev_at = np.asarray(previous_at, dtype=np.float64)
+        cur = np.asarray(current, dtype=np.float64)
+        sim = np.asarray(simulated, dtype=bool)
+        held_value, held_at = np.asarray(held, dtype=np.float64).reshape(-1, 2).T
+        
+        # 前次讀數時間未知: 不限制增量
+        elapsed = np.where(np.isnan(prev_at), 0.0, np.maximum(now - prev_at, 0.0))
+        allowance = np.where(np.isnan(prev_at), np.inf, rated_kw * elapsed / 3600.0 * tolerance + slack)
+        held_allowance = rated_kw * np.maximum(now - held_at, 0.0) / 3600.0 * tolerance + slack
+        diff = cur - prev
+        held_diff = cur - held_value
+        rollover_delta = counter_max - prev + cur
+        
+        invalid = ~np.isfinite(cur) | (cur < 0)
+        no_base = ~invalid & ~sim & (np.isnan(prev) | (prev <= 0))
+        valid = ~invalid & ~sim & ~no_base
+        rising = valid & (diff >= 0)
+        falling = valid & (diff < 0)
+        rollover = falling & (prev >= counter_max * self.ROLLOVER_ZONE) & (rollover_delta <= allowance)
+        reset = falling & ~rollover
+        jump = rising & (diff > allowance)
+        # 與暫存的跳動讀數一致 (NaN 比較為 False): 確認跳動，只計入暫存值之後的用電
+        rebase = jump & (held_diff >= 0) & (held_diff <= held_allowance)
+        implausible = jump & ~rebase
+        
+        codes = np.select(
+            [invalid, sim, no_base, rebase, implausible, rollover, reset],
+            [FLAG_CODES.index(flag) for flag in
+             (FLAG_INVALID, FLAG_SIMULATED, FLAG_BASELINE, FLAG_REBASE, FLAG_IMPLAUSIBLE, FLAG_ROLLOVER, FLAG_RESET)],
+            default=FLAG_CODES.index(FLAG_OK)
+        )
+        
+        # 歸零後的讀數即為歸零以來的用電量 (仍需在容許範圍內)
+        delta = np.select(
+            [rising & ~jump, rebase, rollover, reset & (cur <= allowance)],
+            [diff, held_diff, rollover_delta, cur],
+            default=0.0
+        )
+        # 模擬、無效與未確認的跳動讀數保留原基準，其餘採用本次讀數
+        baseline = np.where(invalid | sim | implausible, prev, cur)
+        
+        # 輪詢間隔跨越本地午夜: 依時間比例內插，只有午夜之後的部分屬於今日
+        spans_midnight = (prev_at < midnight) & (elapsed > 0)
+        ratio = np.where(spans_midnight, (now - midnight) / np.where(elapsed > 0, elapsed, 1.0), 1.0)
+        today = delta * np.clip(ratio, 0.0, 1.0)
+        
+        return delta.tolist(), today.tolist(), baseline.tolist(), codes.tolist()
+    
+    def _normalize_python(self, previous, previous_at, current, simulated, held, now, midnight):
+        """純 Python 判定 (未安裝 NumPy 時使用)"""
+        rated_kw, tolerance, slack, counter_max = self._limits()
+        deltas, todays, baselines, codes = [], [], [], []
+        
+        for prev, prev_at, cur, sim, (held_value, held_at) in zip(previous, previous_at, current, simulated, held):
+            prev = float('nan') if prev is None else float(prev)
+            prev_at = float('nan') if prev_at is None else float(prev_at)
+            cur = float('nan') if cur is None else float(cur)
+            if prev_at != prev_at:
+                # 前次讀數時間未知: 不限制增量
+                elapsed, allowance = 0.0, float('inf')
+            else:
+                elapsed = max(now - prev_at, 0.0)
+                allowance = rated_kw * elapsed / 3600.0 * tolerance + slack
+            delta, baseline = 0.0, cur
+            
+            if cur != cur or cur < 0:
+                flag, baseline = FLAG_INVALID, prev
+            elif sim:
+                flag, baseline = FLAG_SIMULATED, prev
+            elif prev != prev or prev <= 0:
+                flag = FLAG_BASELINE
+            elif cur >= prev:
+                if cur - prev <= allowance:
+                    flag, delta = FLAG_OK, cur - prev
+                elif 0 <= cur - held_value <= rated_kw * max(now - held_at, 0.0) / 3600.0 * tolerance + slack:
+                    flag, delta = FLAG_REBASE, cur - held_value
+                else:
+                    flag, baseline = FLAG_IMPLAUSIBLE, prev
+            elif prev >= counter_max * self.ROLLOVER_ZONE and counter_max - prev + cur <= allowance:
+                flag, delta = FLAG_ROLLOVER, counter_max - prev + cur
+            else:
+                flag, delta = FLAG_RESET, (cur if cur <= allowance else 0.0)
+            
+            ratio = 1.0
+            if prev_at < midnight and elapsed > 0:
+                ratio = min(max((now - midnight) / elapsed, 0.0), 1.0)
+            
+            deltas.append(delta)
+            todays.append(delta * ratio)
+            baselines.append(baseline)
+            codes.append(FLAG_CODES.index(flag))
+        
+        return deltas, todays, baselines, codes
+    
+    def series_deltas(self, energies: Sequence[float], times: Sequence[float],
+                      baseline: Optional[float] = None, baseline_at: Optional[float] = None) -> List[float]:
+        """
+        依相同規則計算一段已保存讀數的逐筆用電量 (歷史彙總與電價計算共用)
+        
+        每筆讀數計入與前一個基準之間的增量，不修改即時判定的統計與暫存狀態。
+        
+        Args:
+            energies: 同一電表依時間排序的累積電能讀數
+            times: 讀數時間 (epoch 秒)
+            baseline / baseline_at: 此段之前最後一筆讀數與時間 (None 表示首筆只建立基準)
+        
+        Returns:
+            List[float]: 每筆讀數計入的用電量 kWh
+        """
+        rated_kw, tolerance, slack, counter_max = self._limits()
+        
+        def allowance_since(at, since):
+            if since is None or since != since:
+                return float('inf')
+            return rated_kw * max(at - since, 0.0) / 3600.0 * tolerance + slack
+        
+        deltas = []
+        held = None
+        for energy, at in zip(energies, times):
+            if energy is None or energy != energy or energy < 0:
+                deltas.append(0.0)
+                continue
+            if baseline is None or baseline != baseline or baseline <= 0:
+                baseline, baseline_at = energy, at
+                deltas.append(0.0)
+                continue
+            
+            allowance = allowance_since(at, baseline_at)
+            diff = energy - baseline
+            if 0 <= diff <= allowance:
+                delta = diff
+            elif diff > allowance:
+                if held is not None and 0 <= energy - held[0] <= allowance_since(at, held[1]):
+                    delta = energy - held[0]
+                else:
+                    # 未確認的跳動: 保留基準
+                    held = (energy, at)
+                    deltas.append(0.0)
+                    continue
+            elif baseline >= counter_max * self.ROLLOVER_ZONE and counter_max - baseline + energy <= allowance:
+                delta = counter_max - baseline + energy
+            else:
+                delta = energy if energy <= allowance else 0.0
+            
+            baseline, baseline_at, held = energy, at, None
+            deltas.append(delta)
+        
+        return deltas
+    
+    def _record(self, meter_ids, previous, current, flags, delta, today, now):
+        """累計統計並記錄異常讀數"""
+        with self._lock:
+            for meter_id, prev, cur, flag, used, used_today in zip(meter_ids, previous, current, flags,
+                                                                   delta, today):
+                self._counts[flag] += 1
+                if flag == FLAG_IMPLAUSIBLE:
+                    # 基準與其讀數時間不變，暫存讀數等待下一筆確認
+                    self._held[meter_id] = (cur, now)
+                elif flag not in (FLAG_SIMULATED, FLAG_INVALID):
+                    self._last_reading_at[meter_id] = now
+                    self._held.pop(meter_id, None)
+                if used_today < used:
+                    self._interpolated += 1
+                if flag in (FLAG_RESET, FLAG_ROLLOVER, FLAG_IMPLAUSIBLE, FLAG_INVALID, FLAG_REBASE):
+                    self._anomalies.append({
+                        'meter_id': meter_id,
+                        'flag': flag,
+                        'previous_energy': prev if prev == prev else None,
+                        'current_energy': cur if cur is not None and cur == cur else None,
+                        'counted_kwh': round(used, 3),
+                        'timestamp': datetime.fromtimestamp(now).isoformat()
+                    })
+                    self.logger.warning(f"電表 {meter_id} 計數器異常 ({flag}): {prev} -> {cur}, 計入 {used:.3f} kWh")
+    
+    def get_stats(self) -> Dict:
+        """獲取判定統計與最近的異常讀數"""
+        with self._lock:
+            return {
+                'counts': dict(self._counts),
+                'interpolated_midnight': self._interpolated,
+                'recent_anomalies': list(reversed(self._anomalies))
+            }
+
+
+# 全局服務實例
+counter_normalizer = CounterNormalizer()
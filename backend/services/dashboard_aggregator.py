@@ -0,0 +1,271 @@
+"""
+Dashboard Aggregator - 儀表板即時彙總
+Keeps online/power counts, fleet power, energy and cost sums, a top-N
+consumer heap and today's hourly energy buckets up to date as readings arrive
+"""
+
+import heapq
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+
+from ..database import Meter, read_session
+
+
+class _MeterState:
+    """單一電表的最新狀態"""
+    
+    __slots__ = ('name', 'online', 'power_on', 'power', 'total_energy', 'daily_energy', 'cost_today', 'version')
+    
+    def __init__(self, name: str, total_energy: float = 0.0, daily_energy: float = 0.0, power_on: bool = False,
+                 cost_today: float = 0.0):
+        self.name = name
+        self.online = False
+        self.power_on = power_on
+        self.power = 0.0
+        self.total_energy = total_energy
+        self.daily_energy = daily_energy
+        self.cost_today = cost_today
+        self.version = 0
+
+
+class DashboardAggregator:
+    """
+    儀表板彙總
+    
+    每筆讀數以差值更新計數與總和 (O(1))，排行以延遲刪除的堆維護 (O(log n))，
+    端點只需序列化目前狀態。
+    """
+    
+    # 堆中過期項目超過有效項目的倍數時重建
+    HEAP_COMPACT_FACTOR = 4
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._today: Optional[date] = None
+        self._meters: Dict[int, _MeterState] = {}
+        self._heap: List[tuple] = []
+        self._hourly = [0.0] * 24
+        self._hourly_cost = [0.0] * 24
+        self._online = 0
+        self._powered = 0
+        self._total_power = 0.0
+        self._total_energy = 0.0
+        self._daily_energy = 0.0
+        self._cost_today = 0.0
+        self._last_update: Optional[datetime] = None
+    
+    # ------------------------------------------------------------------
+    # 載入 / Loading
+    # ------------------------------------------------------------------
+    def _load(self, now: datetime):
+        """從資料庫建立初始狀態 (電表一次查詢，今日每小時用電取自彙總與原始記錄)"""
+        from .tariff_engine import tariff_engine
+        from .billing_engine import local_to_utc
+        
+        with read_session() as session:
+            rows = session.execute(
+                select(Meter.meter_id, Meter.name, Meter.total_energy, Meter.daily_energy, Meter.power_on,
+                       Meter.cost_today)
+            ).all()
+        
+        self._meters = {
+            row.meter_id: _MeterState(row.name, row.total_energy or 0.0, row.daily_energy or 0.0, bool(row.power_on),
+                                      row.cost_today or 0.0)
+            for row in rows
+        }
+        self._online = 0
+        self._powered = sum(1 for state in self._meters.values() if state.power_on)
+        self._total_power = 0.0
+        self._total_energy = sum(state.total_energy for state in self._meters.values())
+        self._daily_energy = sum(state.daily_energy for state in self._meters.values())
+        self._cost_today = sum(state.cost_today for state in self._meters.values())
+        self._rebuild_heap()
+        
+        # 今日每小時用電與分時電費 (本地時間)
+        self._today = now.date()
+        self._hourly = [0.0] * 24
+        self._hourly_cost = [0.0] * 24
+        tariff = tariff_engine.get_tariff()
+        midnight = datetime.combine(self._today, datetime.min.time())
+        _, hours, energy = tariff_engine.load_hourly_energy(
+            local_to_utc(midnight), local_to_utc(midnight + timedelta(days=1))
+        )
+        for epoch_hour, kwh in zip(hours, energy):
+            local = datetime.fromtimestamp(int(epoch_hour) * 3600)
+            if local.date() == self._today:
+                self._hourly[local.hour] += kwh or 0.0
+                self._hourly_cost[local.hour] += (kwh or 0.0) * tariff.price_at(local)
+        
+        self._loaded = True
+    
+    def _ensure_current(self, now: datetime):
+        """首次使用時載入，跨日時清除今日統計"""
+        if not self._loaded:
+            self._load(now)
+        elif now.date() != self._today:
+            self._today = now.date()
+            self._hourly = [0.0] * 24
+            self._hourly_cost = [0.0] * 24
+            for state in self._meters.values():
+                state.daily_energy = 0.0
+                state.cost_today = 0.0
+            self._daily_energy = 0.0
+            self._cost_today = 0.0
+            self._heap = []
+    
+    def invalidate(self):
+        """清除狀態 (下次使用時重新載入)"""
+        with self._lock:
+            self._loaded = False
+    
+    # ------------------------------------------------------------------
+    # 排行堆 / Top-N heap
+    # ------------------------------------------------------------------
+    def _push(self, meter_id: int, state: _MeterState):
+        """推入最新排行項目 (舊項目以 version 判定過期)"""
+        state.version += 1
+        if state.daily_energy > 0:
+            heapq.heappush(self._heap, (-state.daily_energy, meter_id, state.version))
+        if len(self._heap) > self.HEAP_COMPACT_FACTOR * max(len(self._meters), 16):
+            self._rebuild_heap()
+    
+    def _rebuild_heap(self):
+        """以目前狀態重建堆"""
+        self._heap = [(-state.daily_energy, meter_id, state.version)
+                      for meter_id, state in self._meters.items() if state.daily_energy > 0]
+        heapq.heapify(self._heap)
+    
+    def _top(self, limit: int) -> List[tuple]:
+        """取出前 N 名 (移除過期項目，有效項目放回)"""
+        valid = []
+        while self._heap and len(valid) < limit:
+            entry = heapq.heappop(self._heap)
+            state = self._meters.get(entry[1])
+            if state is not None and state.version == entry[2]:
+                valid.append(entry)
+        for entry in valid:
+            heapq.heappush(self._heap, entry)
+        return [(meter_id, self._meters[meter_id]) for _, meter_id, _ in valid]
+    
+    # ------------------------------------------------------------------
+    # 更新 / Updates
+    # ------------------------------------------------------------------
+    def record_readings(self, readings: Iterable[Dict], now: Optional[datetime] = None):
+        """
+        套用一批已提交的讀數
+        
+        Args:
+            readings: meter_id, name, power_on, power, total_energy,
+                today_delta, today_cost (本批計入今日的度數與分時電費，以增量累加)
+        """
+        now = now or datetime.now()
+        with self._lock:
+            if not self._loaded:
+                # 首次查詢載入的資料已包含本批
+                return
+            self._ensure_current(now)
+            
+            for reading in readings:
+                meter_id = reading['meter_id']
+                state = self._meters.get(meter_id)
+                if state is None:
+                    state = self._meters[meter_id] = _MeterState(reading.get('name') or f'RTU電表{meter_id:02d}')
+                
+                if not state.online:
+                    self._online += 1
+                    state.online = True
+                power_on = bool(reading.get('power_on'))
+                if power_on != state.power_on:
+                    self._powered += 1 if power_on else -1
+                    state.power_on = power_on
+                
+                power = float(reading.get('power') or 0.0)
+                self._total_power += power - state.power
+                state.power = power
+                
+                total_energy = float(reading.get('total_energy') or 0.0)
+                self._total_energy += total_energy - state.total_energy
+                state.total_energy = total_energy
+                
+                today_delta = float(reading.get('today_delta') or 0.0)
+                today_cost = float(reading.get('today_cost') or 0.0)
+                if today_delta:
+                    state.daily_energy += today_delta
+                    state.cost_today += today_cost
+                    self._daily_energy += today_delta
+                    self._cost_today += today_cost
+                    self._hourly[now.hour] += today_delta
+                    self._hourly_cost[now.hour] += today_cost
+                    self._push(meter_id, state)
+            
+            self._last_update = now
+    
+    def update_names(self, names: Dict[int, str]):
+        """套用電表名稱變更 (排行顯示用)"""
+        with self._lock:
+            for meter_id, name in names.items():
+                state = self._meters.get(meter_id)
+                if state is not None:
+                    state.name = name
+    
+    def mark_offline(self, meter_id: int):
+        """標記電表離線 (輪詢讀取失敗)"""
+        with self._lock:
+            state = self._meters.get(meter_id)
+            if state is None or not state.online:
+                return
+            state.online = False
+            self._online -= 1
+            self._total_power -= state.power
+            state.power = 0.0
+    
+    # ------------------------------------------------------------------
+    # 查詢 / Lookups
+    # ------------------------------------------------------------------
+    def get_dashboard(self, meter_count: int, top_n: int = 10) -> Dict:
+        """序列化目前的儀表板狀態 (電費為各讀數依分時電價累計，與 Meter.cost_today 相同)"""
+        now = datetime.now()
+        with self._lock:
+            self._ensure_current(now)
+            total_meters = max(meter_count, len(self._meters))
+            
+            return {
+                'summary': {
+                    'total_meters': total_meters,
+                    'online_meters': self._online,
+                    'total_power': round(self._total_power, 2),
+                    'total_energy': round(self._total_energy, 2),
+                    'today_energy': round(self._daily_energy, 2),
+                    'total_cost': round(self._cost_today, 2),
+                    'average_power': round(self._total_power / max(self._online, 1), 2),
+                    'currency': '元'
+                },
+                'status_distribution': {
+                    'online': self._online,
+                    'offline': total_meters - self._online,
+                    'power_on': self._powered,
+                    'power_off': total_meters - self._powered
+                },
+                'top_consumers': [{
+                    'meter_id': meter_id,
+                    'name': state.name,
+                    'energy': round(state.daily_energy, 2),
+                    'cost': round(state.cost_today, 2)
+                } for meter_id, state in self._top(top_n)],
+                'hourly_consumption': [{
+                    'hour': f'{hour:02d}:00',
+                    'energy': round(energy, 2),
+                    'cost': round(self._hourly_cost[hour], 2)
+                } for hour, energy in enumerate(self._hourly)],
+                'last_update': (self._last_update or now).isoformat()
+            }
+
+
+# 全局服務實例
+dashboard_aggregator = DashboardAggregator()
@@ -0,0 +1,224 @@
+"""
+History Export Service - 歷史數據串流導出服務
+Streams raw or hourly history rows straight to the response (CSV / NDJSON / Parquet)
+"""
+
+import io
+import csv
+import json
+import zlib
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import select
+
+from ..database import MeterHistory, MeterHistoryHourly, read_session
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+# 導出欄位 / Export columns
+EXPORT_COLUMNS = {
+    'raw': ['meter_id', 'recorded_at', 'voltage', 'current', 'power', 'energy', 'power_on', 'power_status'],
+    'hourly': ['meter_id', 'hour_start', 'sample_count', 'powered_count', 'voltage_avg', 'current_avg',
+               'power_avg', 'power_max', 'energy_start', 'energy_end', 'energy_used']
+}
+
+EXPORT_MODELS = {
+    'raw': (MeterHistory, 'recorded_at'),
+    'hourly': (MeterHistoryHourly, 'hour_start')
+}
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """收集 ParquetWriter 輸出的位元組，供串流逐批取出"""
+    
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def drain(self) -> bytes:
+        """取出目前累積的位元組"""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class HistoryExportService:
+    """歷史數據導出服務 - 以伺服器端游標分批讀取，記憶體用量與資料量無關"""
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+    
+    def _config(self, key: str, default):
+        """讀取應用程式配置 (無應用上下文時使用預設值)"""
+        try:
+            from flask import current_app
+            return current_app.config.get(key, default)
+        except RuntimeError:
+            return default
+    
+    def is_format_available(self, export_format: str) -> bool:
+        """檢查導出格式是否可用"""
+        if export_format == 'parquet':
+            return HAS_PYARROW
+        return export_format in EXPORT_FORMATS
+    
+    def get_filename(self, source: str, export_format: str, compress: bool = False) -> str:
+        """產生導出檔名"""
+        extension = EXPORT_FORMATS[export_format][1]
+        filename = f'meter_history_{source}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+        return filename + '.gz' if compress else filename
+    
+    def get_mimetype(self, export_format: str, compress: bool = False) -> str:
+        """獲取回應的 MIME 類型"""
+        return 'application/gzip' if compress else EXPORT_FORMATS[export_format][0]
+    
+    def iter_rows(self, source: str = 'raw', meter_ids: Optional[List[int]] = None,
+                  start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[List[tuple]]:
+        """
+        以 yield_per 分批讀取歷史數據
+        
+        Yields:
+            List[tuple]: 每批資料列 (欄位順序同 EXPORT_COLUMNS)
+        """
+        model, time_column = EXPORT_MODELS[source]
+        columns = [getattr(model, name) for name in EXPORT_COLUMNS[source]]
+        time_attr = getattr(model, time_column)
+        batch_size = self._config('HISTORY_EXPORT_BATCH_SIZE', 5000)
+        
+        query = select(*columns)
+        if meter_ids:
+            query = query.where(model.meter_id.in_(meter_ids))
+        if start:
+            query = query.where(time_attr >= start)
+        if end:
+            query = query.where(time_attr < end)
+        query = query.order_by(time_attr, model.id).execution_options(yield_per=batch_size)
+        
+        # 使用唯讀連線，長時間導出不會阻擋輪詢寫入
+        with read_session() as session:
+            result = session.execute(query)
+            try:
+                for partition in result.partitions():
+                    yield partition
+            finally:
+                result.close()
+    
+    def _iter_csv(self, source: str, batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+        """CSV 編碼"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS[source])
+        
+        for batch in batches:
+            writer.writerows(
+                [value.isoformat() if isinstance(value, datetime) else value for value in row]
+                for row in batch
+            )
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        
+        # 空結果仍輸出表頭
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+    
+    def _iter_ndjson(self, source: str, batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+        """NDJSON 編碼 (每行一筆 JSON)"""
+        names = EXPORT_COLUMNS[source]
+        for batch in batches:
+            lines = [
+                json.dumps(dict(zip(names, row)), ensure_ascii=False, default=datetime.isoformat)
+                for row in batch
+            ]
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+    
+    def _parquet_schema(self, source: str):
+        """Parquet 欄位型別 (固定型別，避免批次間推斷結果不一致)"""
+        types = {
+            'meter_id': pa.int64(), 'recorded_at': pa.timestamp('us'), 'hour_start': pa.timestamp('us'),
+            'sample_count': pa.int64(), 'powered_count': pa.int64(),
+            'power_on': pa.bool_(), 'power_status': pa.string()
+        }
+        return pa.schema([(name, types.get(name, pa.float64())) for name in EXPORT_COLUMNS[source]])
+    
+    def _iter_parquet(self, source: str, batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+        """Parquet 編碼 - 每批寫成一個 row group"""
+        schema = self._parquet_schema(source)
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+        
+        try:
+            for batch in batches:
+                columns = [[row[i] for row in batch] for i in range(len(schema))]
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+    
+    def _gzip(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """串流 gzip 壓縮"""
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    
+    def stream_export(self, source: str = 'raw', export_format: str = 'csv', compress: bool = False,
+                      meter_ids: Optional[List[int]] = None, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> Iterator[bytes]:
+        """產生導出內容的位元組串流"""
+        if source not in EXPORT_MODELS:
+            raise ValueError(f'Unsupported source: {source}')
+        if not self.is_format_available(export_format):
+            raise ValueError(f'Unsupported format: {export_format}')
+        
+        batches = self.iter_rows(source, meter_ids, start, end)
+        encoders = {'csv': self._iter_csv, 'ndjson': self._iter_ndjson, 'parquet': self._iter_parquet}
+        chunks = (chunk for chunk in encoders[export_format](source, batches) if chunk)
+        
+        self.logger.info(f"開始導出歷史數據: source={source}, format={export_format}, gzip={compress}")
+        return self._gzip(chunks) if compress else chunks
+    
+    def get_capabilities(self) -> Dict:
+        """獲取支援的導出選項"""
+        return {
+            'sources': list(EXPORT_MODELS),
+            'formats': [name for name in EXPORT_FORMATS if self.is_format_available(name)],
+            'compression': ['gzip']
+        }
+
+
+# 全局服務實例
+export_service = HistoryExportService()
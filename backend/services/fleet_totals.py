@@ -0,0 +1,171 @@
+"""
+Fleet Totals - 全系統用電累計
+Maintains per-day and per-month fleet usage/cost running totals that are
+updated as readings are saved, so the billing summary is exact and O(1)
+"""
+
+import logging
+import threading
+from datetime import date, datetime
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy import func, select
+
+from ..database import Meter, BillingRecord, read_session
+
+
+class _PeriodTotals:
+    """單一期間的累計值"""
+    
+    __slots__ = ('energy', 'cost', 'meters')
+    
+    def __init__(self, energy: float = 0.0, cost: float = 0.0, meters=None):
+        self.energy = energy
+        self.cost = cost
+        self.meters = set(meters or ())
+    
+    def add(self, meter_id: int, energy: float, unit_price: float):
+        self.energy += energy
+        self.cost += energy * unit_price
+        self.meters.add(meter_id)
+
+
+class FleetTotals:
+    """
+    全系統用電累計
+    
+    首次使用時以一次彙總查詢建立基準 (本月計費記錄、今日電表用電)，
+    之後由 meter_service 在每批讀數提交後累加正規化用電量。
+    """
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._today: Optional[date] = None
+        self._day = _PeriodTotals()
+        self._month = _PeriodTotals()
+        self._total_meters = 0
+        self._synced_at: Optional[datetime] = None
+    
+    # ------------------------------------------------------------------
+    # 載入 / Loading
+    # ------------------------------------------------------------------
+    def _load(self, today: date):
+        """從資料庫重建累計值"""
+        month_start = today.replace(day=1)
+        with read_session() as session:
+            month_energy, month_cost = session.execute(
+                select(func.coalesce(func.sum(BillingRecord.energy_used), 0.0),
+                       func.coalesce(func.sum(BillingRecord.total_cost), 0.0))
+                .where(BillingRecord.billing_date >= month_start, BillingRecord.billing_date <= today)
+            ).one()
+            month_meters = session.execute(
+                select(BillingRecord.meter_id).distinct()
+                .where(BillingRecord.billing_date >= month_start, BillingRecord.billing_date <= today,
+                       BillingRecord.energy_used > 0)
+            ).scalars().all()
+            day_energy, day_cost, total_meters = session.execute(
+                select(func.coalesce(func.sum(Meter.daily_energy), 0.0),
+                       func.coalesce(func.sum(Meter.cost_today), 0.0),
+                       func.count(Meter.id))
+            ).one()
+            day_meters = session.execute(
+                select(Meter.meter_id).where(Meter.daily_energy > 0)
+            ).scalars().all()
+        
+        self._today = today
+        self._month = _PeriodTotals(float(month_energy), float(month_cost), month_meters)
+        self._day = _PeriodTotals(float(day_energy), float(day_cost), day_meters)
+        self._total_meters = int(total_meters)
+        self._synced_at = datetime.now()
+        self._loaded = True
+    
+    def _ensure_current(self, today: date):
+        """首次使用或跨日時更新期間 (跨月時重新從資料庫載入)"""
+        if not self._loaded:
+            self._load(today)
+        elif today != self._today:
+            if (today.year, today.month) != (self._today.year, self._today.month):
+                self._load(today)
+            else:
+                self._today = today
+                self._day = _PeriodTotals()
+    
+    def resync(self) -> Dict:
+        """從資料庫重建累計值 (排程工作，修正多進程寫入造成的偏差)"""
+        with self._lock:
+            before = round(self._month.energy, 3) if self._loaded else None
+            self._load(datetime.now().date())
+            after = round(self._month.energy, 3)
+        if before is not None and abs(after - before) > 0.01:
+            self.logger.info(f"全系統累計已重新同步: 本月 {before} -> {after} kWh")
+        return {'month_energy_kwh': after, 'drift_kwh': round(after - before, 3) if before is not None else None}
+    
+    def invalidate(self):
+        """清除累計值 (下次讀取時重新載入)"""
+        with self._lock:
+            self._loaded = False
+    
+    # ------------------------------------------------------------------
+    # 累加 / Updates
+    # ------------------------------------------------------------------
+    def record_batch(self, meter_ids: Sequence[int], deltas: Sequence[float], today_deltas: Sequence[float],
+                     unit_price: float, new_meters: int = 0, now: Optional[datetime] = None):
+        """
+        累加一批已提交的用電量
+        
+        Args:
+            deltas: 正規化後的用電量
+            today_deltas: 其中屬於本地今日的部分 (跨午夜時較少)
+            new_meters: 本批新建立的電表數
+        """
+        today = (now or datetime.now()).date()
+        with self._lock:
+            if not self._loaded:
+                # 尚未建立基準時不累加，首次查詢載入的資料已包含本批
+                return
+            self._ensure_current(today)
+            self._total_meters += new_meters
+            same_month_yesterday = today.day != 1
+            
+            for meter_id, delta, today_delta in zip(meter_ids, deltas, today_deltas):
+                if delta <= 0:
+                    continue
+                self._day.add(meter_id, today_delta, unit_price)
+                self._month.add(meter_id, delta if same_month_yesterday else today_delta, unit_price)
+    
+    # ------------------------------------------------------------------
+    # 查詢 / Lookups
+    # ------------------------------------------------------------------
+    def get_summary(self, unit_price: float) -> Dict:
+        """獲取本月與今日的全系統累計"""
+        now = datetime.now()
+        with self._lock:
+            self._ensure_current(now.date())
+            days_elapsed = now.day
+            month_energy = round(self._month.energy, 3)
+            month_cost = round(self._month.cost, 2)
+            
+            return {
+                'period': f"{now.year}-{now.month:02d}",
+                'total_meters': self._total_meters,
+                'active_meters': len(self._month.meters),
+                'total_usage_kwh': month_energy,
+                'total_cost_yuan': month_cost,
+                'today_usage_kwh': round(self._day.energy, 3),
+                'today_cost_yuan': round(self._day.cost, 2),
+                'today_active_meters': len(self._day.meters),
+                'average_daily_usage_kwh': round(month_energy / days_elapsed, 3),
+                # 保留舊欄位名稱供前端使用，數值已為精確累計
+                'estimated_total_usage_kwh': month_energy,
+                'estimated_total_cost_yuan': month_cost,
+                'rate_per_kwh': unit_price,
+                'synced_at': self._synced_at.isoformat() if self._synced_at else None,
+                'timestamp': now.isoformat(),
+                'note': '依讀數即時累計的本月精確值'
+            }
+
+
+# 全局服務實例
+fleet_totals = FleetTotals()
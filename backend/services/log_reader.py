@@ -0,0 +1,241 @@
+"""
+Log Reader - 日誌查詢服務
+Reads the application log backwards from the end and keeps a sidecar block
+index (offsets, timestamp range and per-level counts) so level/since queries
+skip the parts of a large log that cannot match
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# setup_logging 的格式: '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
+HEADER_RE = re.compile(rb'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) ([A-Z]+): ')
+SOURCE_RE = re.compile(r' \[in (.+):(\d+)\]$')
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
+
+# 索引區塊欄位
+_START, _END, _FIRST_TS, _LAST_TS, _COUNTS = range(5)
+
+
+class LogReader:
+    """
+    日誌查詢服務
+    
+    - 查詢: 從檔案尾端以區塊倒序讀取，只解析需要的記錄，達到 limit 或早於 since 即停止
+    - 索引: 旁路檔 (<log>.idx) 依記錄邊界把日誌切成約 BLOCK_SIZE 的區塊，記錄每塊的
+      位移、時間範圍與各等級筆數；等級過濾時跳過沒有符合記錄的區塊
+    - 增量: 索引只處理上次之後新增的部分；查詢時只補小量增量，大量增量交給排程工作
+    """
+    
+    BLOCK_SIZE = 256 * 1024          # 索引區塊大小 (bytes)
+    CHUNK_SIZE = 64 * 1024           # 倒序讀取的每次讀取量
+    HEAD_SIZE = 256                  # 用於辨識檔案輪替的開頭位元組數
+    QUERY_INDEX_LIMIT = 4 * 1024 * 1024  # 查詢時同步補建索引的最大增量
+    MAX_LIMIT = 1000
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._indexes: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+    
+    # ------------------------------------------------------------------
+    # 索引 / Index
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _index_path(path: Path) -> Path:
+        return path.with_name(path.name + '.idx')
+    
+    @staticmethod
+    def _read_head(path: Path, length: int) -> str:
+        with open(path, 'rb') as f:
+            return f.read(length).hex()
+    
+    def _empty_index(self) -> Dict:
+        return {'version': 1, 'block_size': self.BLOCK_SIZE, 'head': '', 'indexed_to': 0, 'blocks': []}
+    
+    def _load_index(self, path: Path) -> Dict:
+        """讀取記憶體或旁路檔中的索引，檔案被輪替或截斷時重新開始"""
+        index = self._indexes.get(str(path))
+        if index is None:
+            try:
+                with open(self._index_path(path), 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                if index.get('version') != 1 or index.get('block_size') != self.BLOCK_SIZE:
+                    index = None
+            except (OSError, ValueError):
+                index = None
+        index = index or self._empty_index()
+        
+        size = path.stat().st_size
+        head = index['head']
+        if size < index['indexed_to'] or (head and self._read_head(path, len(head) // 2) != head):
+            index = self._empty_index()
+        self._indexes[str(path)] = index
+        return index
+    
+    def _save_index(self, path: Path, index: Dict):
+        """寫入旁路檔 (先寫暫存檔再取代)"""
+        target = self._index_path(path)
+        temp = target.with_name(target.name + '.tmp')
+        try:
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump(index, f, separators=(',', ':'))
+            os.replace(temp, target)
+        except OSError as e:
+            self.logger.warning(f"無法寫入日誌索引 {target}: {e}")
+    
+    def _extend_index(self, path: Path, index: Dict, until: int) -> int:
+        """索引 indexed_to 到 until 之間的完整記錄，返回處理的位元組數"""
+        offset = start = index['indexed_to']
+        blocks = index['blocks']
+        block = blocks[-1] if blocks and blocks[-1][_END] == offset else None
+        
+        with open(path, 'rb') as f:
+            if not index['head']:
+                index['head'] = f.read(self.HEAD_SIZE).hex()
+            f.seek(offset)
+            for line in f:
+                if offset + len(line) > until or not line.endswith(b'\n'):
+                    break
+                match = HEADER_RE.match(line)
+                if match:
+                    if block is None or block[_END] - block[_START] >= self.BLOCK_SIZE:
+                        block = [offset, offset, None, None, {}]
+                        blocks.append(block)
+                    timestamp = match.group(1).decode()
+                    level = match.group(2).decode()
+                    block[_FIRST_TS] = block[_FIRST_TS] or timestamp
+                    block[_LAST_TS] = timestamp
+                    block[_COUNTS][level] = block[_COUNTS].get(level, 0) + 1
+                elif block is None:
+                    # 檔案開頭的非記錄行
+                    block = [offset, offset, None, None, {}]
+                    blocks.append(block)
+                offset += len(line)
+                block[_END] = offset
+        
+        index['indexed_to'] = offset
+        return offset - start
+    
+    def build_index(self, path) -> Optional[Dict]:
+        """補建索引到目前檔案尾端 (排程工作)"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        with self._lock:
+            index = self._load_index(path)
+            indexed = self._extend_index(path, index, path.stat().st_size)
+            if indexed:
+                self._save_index(path, index)
+            return {'indexed_bytes': indexed, 'indexed_to': index['indexed_to'], 'blocks': len(index['blocks'])}
+    
+    # ------------------------------------------------------------------
+    # 倒序讀取 / Reverse reading
+    # ------------------------------------------------------------------
+    def _reverse_records(self, f, start: int, end: int) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """倒序產生 start~end 範圍內的記錄 (標頭行, 後續行)"""
+        continuation: List[bytes] = []
+        carry = b''
+        position = end
+        while position > start:
+            size = min(self.CHUNK_SIZE, position - start)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + carry).split(b'\n')
+            # 第一段可能是被切斷的行，留待下一次讀取補齊
+            carry = lines.pop(0) if position > start else b''
+            for line in reversed(lines):
+                if not line:
+                    continue
+                if HEADER_RE.match(line):
+                    yield line, continuation[::-1]
+                    continuation = []
+                else:
+                    continuation.append(line)
+    
+    @staticmethod
+    def _parse_record(header: bytes, continuation: List[bytes]) -> Dict:
+        """解析一筆記錄"""
+        match = HEADER_RE.match(header)
+        # Windows 上以文字模式寫入，行尾為 \r\n
+        lines = [header[match.end():]] + continuation
+        text = '\n'.join(line.rstrip(b'\r').decode('utf-8', errors='replace') for line in lines)
+        
+        record = {
+            'timestamp': datetime.strptime(match.group(1).decode(), '%Y-%m-%d %H:%M:%S,%f').isoformat(),
+            'level': match.group(2).decode(),
+            'message': text,
+            'module': None,
+            'source': None
+        }
+        source = SOURCE_RE.search(text)
+        if source:
+            record['message'] = text[:source.start()]
+            record['module'] = Path(source.group(1)).stem
+            record['source'] = f"{source.group(1)}:{source.group(2)}"
+        return record
+    
+    # ------------------------------------------------------------------
+    # 查詢 / Query
+    # ------------------------------------------------------------------
+    def query(self, path, limit: int = 100, level: str = 'INFO', since: Optional[datetime] = None) -> Dict:
+        """
+        由新到舊查詢日誌
+        
+        Args:
+            limit: 最多返回筆數
+            level: 最低等級 (DEBUG/INFO/WARNING/ERROR/CRITICAL)
+            since: 只返回此時間 (本地時間) 之後的記錄
+        """
+        path = Path(path)
+        level = level.upper()
+        if level not in LEVELS:
+            raise ValueError(f'Invalid level: {level}')
+        limit = max(1, min(int(limit), self.MAX_LIMIT))
+        
+        result = {'logs': [], 'file': str(path), 'available': path.exists(), 'scanned_blocks': 0, 'skipped_blocks': 0}
+        if not result['available']:
+            return result
+        
+        wanted = {name for name, rank in LEVELS.items() if rank >= LEVELS[level]}
+        since_key = since.strftime('%Y-%m-%d %H:%M:%S,%f')[:23] if since else None
+        
+        with self._lock:
+            index = self._load_index(path)
+            size = path.stat().st_size
+            if size - index['indexed_to'] <= self.QUERY_INDEX_LIMIT and self._extend_index(path, index, size):
+                self._save_index(path, index)
+            # 尚未索引的尾端視為一個未知區塊，其餘區塊由新到舊
+            ranges = [[index['indexed_to'], size, None, None, None]] + index['blocks'][::-1]
+        
+        logs = result['logs']
+        with open(path, 'rb') as f:
+            for block in ranges:
+                if since_key and block[_LAST_TS] and block[_LAST_TS] < since_key:
+                    break
+                if block[_COUNTS] is not None and not any(block[_COUNTS].get(name) for name in wanted):
+                    result['skipped_blocks'] += 1
+                    continue
+                
+                result['scanned_blocks'] += 1
+                for header, continuation in self._reverse_records(f, block[_START], block[_END]):
+                    match = HEADER_RE.match(header)
+                    if since_key and match.group(1).decode() < since_key:
+                        return result
+                    if match.group(2).decode() not in wanted:
+                        continue
+                    logs.append(self._parse_record(header, continuation))
+                    if len(logs) >= limit:
+                        return result
+        return result
+
+
+# 全局服務實例
+log_reader = LogReader()
@@ -3,12 +3,38 @@ Power Meter Service - 數據持久化服務
 Handles meter data persistence and energy calculation
 """
 
+import json
+import base64
 import logging
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select
 from sqlalchemy.exc import SQLAlchemyError
 
-from ..database import db, Meter, MeterHistory, BillingRecord, SystemConfig
+from ..database import db, Meter, MeterHistory, MeterHistoryHourly, BillingRecord, SystemConfig, read_session
+from ..database.config_cache import config_cache
+from ..database.data_version import data_versions
+from ..database.meter_index import meter_index
+from .power_schedule import CompiledPowerSchedule, PowerScheduleState, DEFAULT_COMPILED_SCHEDULE
+from .billing_engine import billing_engine
+from .counter_normalizer import counter_normalizer, utc_epoch
+from .fleet_totals import fleet_totals
+from .dashboard_aggregator import dashboard_aggregator
+from .metrics import DB_FLUSH_SECONDS, DB_FLUSH_ROWS
+
+# 歷史查詢來源與可投影欄位 / History sources and projectable fields
+HISTORY_SOURCES = {
+    'raw': (MeterHistory, 'recorded_at'),
+    'hourly': (MeterHistoryHourly, 'hour_start')
+}
+
+HISTORY_FIELDS = {
+    'raw': ['voltage', 'current', 'power', 'energy', 'power_on', 'power_status'],
+    'hourly': ['sample_count', 'powered_count', 'voltage_avg', 'current_avg', 'power_avg',
+               'power_max', 'energy_start', 'energy_end', 'energy_used']
+}
+
+HISTORY_ROUNDING = {'energy_used': 2}
 
 
 class MeterDataService:
@@ -17,11 +43,22 @@ class MeterDataService:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.unit_price = 4.0  # 默認單價，稍後從配置獲取
+        self._schedule_state = PowerScheduleState()  # 供電狀態快取 (至下次切換)
+    
+    def _config(self, key: str, default):
+        """讀取應用程式配置 (無應用上下文時使用預設值)"""
+        try:
+            from flask import current_app
+            return current_app.config.get(key, default)
+        except RuntimeError:
+            return default
     
     def _get_unit_price(self):
-        """獲取當前電費單價"""
+        """獲取當前電費單價 (配置變更前只解析一次)"""
         try:
-            return float(SystemConfig.get_value('unit_price', 4.0))
+            return config_cache.get_derived(
+                'unit_price', lambda: float(SystemConfig.get_value('unit_price', self.unit_price))
+            )
         except:
             return self.unit_price
     
@@ -43,6 +80,7 @@ class MeterDataService:
                 )
                 db.session.add(meter)
                 db.session.commit()
+                meter_index.invalidate()
                 self.logger.info(f"創建新電表記錄: {meter_id}")
             
             return meter
@@ -54,75 +92,145 @@ class MeterDataService:
     
     def save_meter_data(self, meter_data: Dict) -> bool:
         """保存電表數據並更新累積計算"""
+        return self._save_batch([meter_data]) == 1
+    
+    def batch_save_meters(self, meters_data: List[Dict]) -> int:
+        """批量保存電表數據 (一次查詢、一次正規化、一次提交)"""
+        success_count = self._save_batch(meters_data)
+        self.logger.info(f"批量保存電表數據完成: {success_count}/{len(meters_data)}")
+        return success_count
+    
+    def _is_simulated(self, meter_data: Dict) -> bool:
+        """判斷讀數是否為模擬值"""
+        return bool(meter_data.get('simulated')) or meter_data.get('status') == 'simulated'
+    
+    def _save_batch(self, meters_data: List[Dict]) -> int:
+        """
+        保存一批讀數
+        
+        計數器增量由 counter_normalizer 一次判定 (重置、回捲、異常跳動、模擬值)，
+        所有電表、歷史與計費更新在同一交易中提交。
+        """
+        readings = [data for data in meters_data if data.get('meter_id')]
+        if not readings:
+            return 0
+        
         try:
-            meter_id = meter_data.get('meter_id')
-            if not meter_id:
-                return False
-            
-            # 獲取電表記錄
-            meter = self.get_or_create_meter(
-                meter_id=meter_id,
-                name=meter_data.get('name'),
-                parking=meter_data.get('parking')
-            )
-            
-            # 更新供電狀態
-            new_power_status = meter_data.get('power_on', False)
-            power_status_changed = meter.power_on != new_power_status
-            
-            if power_status_changed:
-                meter.last_power_change = datetime.utcnow()
-                self.logger.info(f"電表 {meter_id} 供電狀態變更: {meter.power_on} -> {new_power_status}")
-            
-            # 計算用電量累積
-            current_energy = float(meter_data.get('energy', 0))
-            if new_power_status and current_energy > meter.total_energy:
-                # 只有在供電且有用電時才累積
-                energy_diff = current_energy - meter.total_energy
-                meter.daily_energy += energy_diff
-                self.logger.debug(f"電表 {meter_id} 累積用電: +{energy_diff:.1f} kWh")
-            
-            # 更新電表數據
-            meter.total_energy = current_energy
-            meter.power_on = new_power_status
-            meter.cost_today = meter.daily_energy * self._get_unit_price()
-            meter.last_updated = datetime.utcnow()
-            
-            # 保存歷史記錄
-            history = MeterHistory(
-                meter_id=meter_id,
-                voltage=float(meter_data.get('voltage', 0)),
-                current=float(meter_data.get('current', 0)),
-                power=float(meter_data.get('power', 0)),
-                energy=current_energy,
-                power_on=new_power_status,
-                power_status=meter_data.get('power_status', 'unpowered'),
-                recorded_at=datetime.utcnow()
+            now = datetime.utcnow()
+            meter_ids = [int(data['meter_id']) for data in readings]
+            meters = {meter.meter_id: meter for meter in Meter.query.filter(Meter.meter_id.in_(meter_ids))}
+            
+            # 建立尚未存在的電表記錄
+            created = 0
+            for data, meter_id in zip(readings, meter_ids):
+                if meter_id not in meters:
+                    meter = Meter(
+                        meter_id=meter_id,
+                        name=data.get('name') or f'RTU電表{meter_id:02d}',
+                        parking=data.get('parking') or f'RTU-{meter_id:04d}',
+                        total_energy=0.0,
+                        daily_energy=0.0,
+                        cost_today=0.0,
+                        power_on=False
+                    )
+                    db.session.add(meter)
+                    meters[meter_id] = meter
+                    created += 1
+                    self.logger.info(f"創建新電表記錄: {meter_id}")
+            
+            batch = [meters[meter_id] for meter_id in meter_ids]
+            simulated = [self._is_simulated(data) for data in readings]
+            normalized = counter_normalizer.normalize(
+                meter_ids,
+                previous=[meter.total_energy for meter in batch],
+                current=[float(data.get('energy', 0) or 0) for data in readings],
+                simulated=simulated,
+                now=utc_epoch(now),
+                previous_at=[utc_epoch(meter.last_updated) for meter in batch]
             )
+            # 本批讀數時間的分時單價 (與 billing_engine、tariff_engine 相同的計價方式)
+            unit_price = billing_engine.price_at(now)
             
-            db.session.add(history)
-            db.session.commit()
-            
-            return True
-            
+            for index, (data, meter) in enumerate(zip(readings, batch)):
+                meter_id = meter.meter_id
+                
+                # 更新供電狀態
+                new_power_status = data.get('power_on', False)
+                if meter.power_on != new_power_status:
+                    meter.last_power_change = now
+                    self.logger.info(f"電表 {meter_id} 供電狀態變更: {meter.power_on} -> {new_power_status}")
+                meter.power_on = new_power_status
+                meter.last_updated = now
+                
+                if simulated[index]:
+                    # 模擬值不影響計數器基準、用電量與歷史記錄
+                    continue
+                
+                current_energy = float(data.get('energy', 0) or 0)
+                delta = normalized['delta'][index]
+                if delta > 0:
+                    today = normalized['today'][index]
+                    if meter in db.session.new:
+                        meter.daily_energy += today
+                        meter.cost_today = (meter.cost_today or 0.0) + today * unit_price
+                    else:
+                        # 相對更新 (SET x = x + 增量)：與並行的每日重置交錯時不會寫回重置前的數值
+                        meter.daily_energy = Meter.daily_energy + today
+                        meter.cost_today = func.coalesce(Meter.cost_today, 0.0) + today * unit_price
+                    self.logger.debug(f"電表 {meter_id} 累積用電: +{delta:.1f} kWh")
+                
+                # 增量計費 (與歷史記錄同一交易提交)
+                billing_engine.record_reading(meter_id, current_energy, now, delta=delta)
+                
+                meter.total_energy = normalized['baseline'][index]
+                
+                # 保存歷史記錄
+                db.session.add(MeterHistory(
+                    meter_id=meter_id,
+                    voltage=float(data.get('voltage', 0)),
+                    current=float(data.get('current', 0)),
+                    power=float(data.get('power', 0)),
+                    energy=current_energy,
+                    power_on=new_power_status,
+                    power_status=data.get('power_status', 'unpowered'),
+                    recorded_at=now
+                ))
+            
+            # 儀表板讀數於提交前以本地值建立 (提交後存取 ORM 屬性會逐筆重新查詢)
+            dashboard_readings = [{
+                'meter_id': meter.meter_id,
+                'name': meter.name,
+                'power_on': meter.power_on,
+                'power': float(data.get('power', 0) or 0),
+                'total_energy': meter.total_energy,
+                'today_delta': normalized['today'][index],
+                'today_cost': normalized['today'][index] * unit_price
+            } for index, (data, meter) in enumerate(zip(readings, batch))]
+            
+            with DB_FLUSH_SECONDS.time():
+                db.session.commit()
+            DB_FLUSH_ROWS.inc(len(batch))
+            data_versions.bump('meters', *meter_ids)
+            if created:
+                meter_index.invalidate()
+            
+            # 提交成功後更新全系統累計 (模擬值的 delta 為 0)
+            fleet_totals.record_batch(meter_ids, normalized['delta'], normalized['today'], unit_price,
+                                      new_meters=created)
+            dashboard_aggregator.record_readings(dashboard_readings)
+            return len(readings)
+        
         except SQLAlchemyError as e:
-            self.logger.error(f"保存電表數據失敗 - meter_id={meter_id}: {e}")
+            self.logger.error(f"保存電表數據失敗 - {len(readings)} 筆: {e}")
             db.session.rollback()
-            return False
+            # 交易已回滾，計費狀態需從資料庫重新載入
+            billing_engine.reset()
+            return 0
         except Exception as e:
-            self.logger.error(f"保存電表數據時發生未知錯誤 - meter_id={meter_id}: {e}")
-            return False
-    
-    def batch_save_meters(self, meters_data: List[Dict]) -> int:
-        """批量保存電表數據"""
-        success_count = 0
-        
-        for meter_data in meters_data:
-            if self.save_meter_data(meter_data):
-                success_count += 1
-        
-        self.logger.info(f"批量保存電表數據完成: {success_count}/{len(meters_data)}")
-        return success_count
+            self.logger.error(f"保存電表數據時發生未知錯誤: {e}")
+            db.session.rollback()
+            billing_engine.reset()
+            return 0
     
     def get_meter_current_data(self, meter_id: int) -> Optional[Dict]:
         """獲取電表當前數據 - 根據供電時段實時判斷狀態"""
@@ -201,6 +309,8 @@ class MeterDataService:
                 })
             
             db.session.commit()
+            data_versions.bump('meters', *([meter_id] if meter_id else []))
+            dashboard_aggregator.invalidate()
             
             # 更新重置日期
             SystemConfig.set_value('last_reset_date', datetime.now().date().isoformat())
@@ -213,28 +323,51 @@ class MeterDataService:
             db.session.rollback()
             return False
     
-    def check_and_auto_reset_daily(self) -> bool:
-        """檢查並自動重置每日用電量 (如果是新的一天)"""
+    def run_daily_reset(self, today=None) -> bool:
+        """
+        執行每日用電量重置 (每個本地日期只會執行一次)
+        
+        以條件更新 last_reset_date 取得當日的重置權，與歸零在同一交易中提交，
+        多個進程或重複觸發時只有一方會真正重置。
+        
+        Returns:
+            bool: 本次是否執行了重置
+        """
+        today = (today or datetime.now().date()).isoformat()
         try:
-            last_reset_date_str = SystemConfig.get_value('last_reset_date')
-            today = datetime.now().date()
-            
-            if last_reset_date_str:
-                last_reset_date = datetime.fromisoformat(last_reset_date_str).date()
-                if last_reset_date < today:
-                    self.reset_daily_energy()
-                    self.logger.info(f"自動重置每日用電量: {last_reset_date} -> {today}")
-                    return True
-            else:
-                # 第一次運行，設置重置日期
-                SystemConfig.set_value('last_reset_date', today.isoformat())
+            claimed = db.session.execute(
+                db.update(SystemConfig)
+                .where(SystemConfig.key == 'last_reset_date', SystemConfig.value < today)
+                .values(value=today, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            
+            if not claimed:
+                db.session.rollback()
+                if SystemConfig.get_value('last_reset_date') is None:
+                    # 第一次運行，設置重置日期
+                    SystemConfig.set_value('last_reset_date', today, '最後重置日期')
+                return False
             
-            return False
+            Meter.query.update({'daily_energy': 0.0, 'cost_today': 0.0})
+            db_version = SystemConfig._bump_version()
+            db.session.commit()
+            config_cache.invalidate(db_version)
+            data_versions.bump('meters')
+            dashboard_aggregator.invalidate()
             
-        except Exception as e:
-            self.logger.error(f"檢查每日重置失敗: {e}")
+            self.logger.info(f"自動重置每日用電量: -> {today}")
+            return True
+        
+        except SQLAlchemyError as e:
+            self.logger.error(f"每日重置失敗: {e}")
+            db.session.rollback()
             return False
     
+    def check_and_auto_reset_daily(self) -> bool:
+        """檢查並自動重置每日用電量 (如果是新的一天)"""
+        return self.run_daily_reset()
+    
     def create_billing_record(self, meter_id: int, energy_used: float, 
                             power_schedule_type: str = 'open_power') -> Optional[BillingRecord]:
         """創建計費記錄"""
@@ -261,80 +394,182 @@ class MeterDataService:
             return None
     
     def get_meter_history(self, meter_id: int, hours: int = 24) -> List[Dict]:
-        """獲取電表歷史數據"""
+        """獲取電表歷史數據 (只選取所需欄位，不建立 ORM 物件)"""
         try:
             since = datetime.utcnow() - timedelta(hours=hours)
+            columns = [getattr(MeterHistory, name) for name in HISTORY_FIELDS['raw']]
             
-            history_records = MeterHistory.query.filter(
-                MeterHistory.meter_id == meter_id,
-                MeterHistory.recorded_at >= since
-            ).order_by(MeterHistory.recorded_at.asc()).all()
-            
-            return [record.to_dict() for record in history_records]
-            
+            with read_session() as session:
+                rows = session.execute(
+                    select(MeterHistory.id, MeterHistory.meter_id, MeterHistory.recorded_at, *columns)
+                    .where(MeterHistory.meter_id == meter_id, MeterHistory.recorded_at >= since)
+                    .order_by(MeterHistory.recorded_at.asc(), MeterHistory.id.asc())
+                )
+                
+                return [
+                    self._history_row_to_dict(row, 'recorded_at', HISTORY_FIELDS['raw'], include_id=True)
+                    for row in rows
+                ]
+        
         except SQLAlchemyError as e:
             self.logger.error(f"獲取電表歷史失敗 - meter_id={meter_id}: {e}")
             return []
     
-    def is_power_schedule_active(self, schedule_type: str = 'open_power') -> bool:
-        """檢查供電時段是否活躍 - 優先從資料庫讀取用戶設定"""
+    def _history_row_to_dict(self, row, time_field: str, fields: List[str], include_id: bool = False) -> Dict:
+        """將查詢結果列轉換為字典 (數值四捨五入方式同 to_dict)"""
+        record = {'id': row.id} if include_id else {}
+        record['meter_id'] = row.meter_id
+        for name in fields:
+            value = getattr(row, name)
+            record[name] = round(value, HISTORY_ROUNDING.get(name, 1)) if isinstance(value, float) else value
+        record[time_field] = getattr(row, time_field).isoformat()
+        return record
+    
+    @staticmethod
+    def encode_history_cursor(source: str, order: str, recorded_at: datetime, record_id: int) -> str:
+        """編碼分頁游標 (最後一筆的時間與 ID)"""
+        payload = json.dumps([source, order, recorded_at.isoformat(), record_id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def decode_history_cursor(cursor: str) -> Tuple[str, str, datetime, int]:
+        """解碼分頁游標，格式錯誤時拋出 ValueError"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            source, order, recorded_at, record_id = json.loads(base64.urlsafe_b64decode(padded))
+            return source, order, datetime.fromisoformat(recorded_at), int(record_id)
+        except Exception as e:
+            raise ValueError(f'Invalid cursor: {cursor}') from e
+    
+    def get_meter_history_page(self, meter_id: int, start: Optional[datetime] = None,
+                               end: Optional[datetime] = None, cursor: Optional[str] = None,
+                               limit: Optional[int] = None, fields: Optional[List[str]] = None,
+                               order: str = 'asc', source: str = 'raw') -> Dict:
+        """
+        以鍵集分頁 (keyset pagination) 讀取電表歷史
+        
+        透過 (meter_id, 時間, id) 索引直接定位到游標之後的資料，
+        不論翻到第幾頁都只讀取 limit + 1 筆。
+        
+        Args:
+            meter_id: 電表 ID
+            start, end: 時間範圍 (UTC，含 start 不含 end)
+            cursor: 上一頁返回的 next_cursor
+            limit: 每頁筆數 (上限 HISTORY_PAGE_MAX_LIMIT)
+            fields: 欄位投影，None 表示全部欄位
+            order: asc / desc
+            source: raw (原始記錄) / hourly (每小時彙總)
+        
+        Returns:
+            Dict: records, next_cursor, has_more, limit
+        """
+        if source not in HISTORY_SOURCES:
+            raise ValueError(f'Unsupported source: {source}')
+        if order not in ('asc', 'desc'):
+            raise ValueError(f'Unsupported order: {order}')
+        
+        allowed = HISTORY_FIELDS[source]
+        fields = list(allowed) if not fields else fields
+        unknown = [name for name in fields if name not in allowed]
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+        
+        default_limit = self._config('HISTORY_PAGE_DEFAULT_LIMIT', 500)
+        max_limit = self._config('HISTORY_PAGE_MAX_LIMIT', 5000)
+        limit = max(1, min(int(limit or default_limit), max_limit))
+        
+        model, time_field = HISTORY_SOURCES[source]
+        time_column = getattr(model, time_field)
+        key = db.tuple_(time_column, model.id)
+        
+        query = select(model.id, model.meter_id, time_column, *[getattr(model, name) for name in fields])
+        query = query.where(model.meter_id == meter_id)
+        if start:
+            query = query.where(time_column >= start)
+        if end:
+            query = query.where(time_column < end)
+        
+        if cursor:
+            cursor_source, cursor_order, last_time, last_id = self.decode_history_cursor(cursor)
+            if cursor_source != source or cursor_order != order:
+                raise ValueError('Cursor does not match source/order')
+            query = query.where(key > (last_time, last_id) if order == 'asc' else key < (last_time, last_id))
+        
+        if order == 'asc':
+            query = query.order_by(time_column.asc(), model.id.asc())
+        else:
+            query = query.order_by(time_column.desc(), model.id.desc())
+        
+        with read_session() as session:
+            rows = session.execute(query.limit(limit + 1)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = self.encode_history_cursor(source, order, getattr(last, time_field), last.id)
+        
+        return {
+            'records': [self._history_row_to_dict(row, time_field, fields) for row in rows],
+            'count': len(rows),
+            'limit': limit,
+            'has_more': has_more,
+            'next_cursor': next_cursor
+        }
+    
+    def _load_power_schedule_json(self) -> Optional[Dict]:
+        """讀取並解析資料庫中的供電時段"""
+        schedule_json = SystemConfig.get_value('power_schedule')
+        return json.loads(schedule_json) if schedule_json else None
+    
+    def _default_power_schedule(self) -> CompiledPowerSchedule:
+        """獲取預設供電時段 (應用配置優先)"""
         try:
             from flask import current_app
-            from ..database.models import SystemConfig
-            import json
-            
-            # 優先從資料庫讀取用戶設定的時段
-            try:
-                schedule_json = SystemConfig.get_value('power_schedule')
-                
-                if schedule_json:
-                    schedule = json.loads(schedule_json)
-                    power_config = schedule.get(schedule_type, {})
-                    self.logger.debug(f"從資料庫讀取供電時段設定: {schedule_type} = {power_config}")
-                else:
-                    # 如果資料庫沒有配置，使用預設配置
-                    schedule = current_app.config.get('DEFAULT_POWER_SCHEDULE', {
-                        'open_power': {'start': '06:00:00', 'end': '22:00:00'},
-                        'close_power': {'start': '22:00:00', 'end': '06:00:00'}
-                    })
-                    power_config = schedule.get(schedule_type, {})
-                    self.logger.debug(f"使用預設供電時段設定: {schedule_type} = {power_config}")
-                
-            except Exception as db_error:
-                self.logger.warning(f"無法從資料庫讀取供電時段，使用預設配置: {db_error}")
-                # 如果資料庫讀取失敗，回退到預設配置
-                schedule = current_app.config.get('DEFAULT_POWER_SCHEDULE', {
-                    'open_power': {'start': '06:00:00', 'end': '22:00:00'},
-                    'close_power': {'start': '22:00:00', 'end': '06:00:00'}
-                })
-                power_config = schedule.get(schedule_type, {})
-            
-            if not power_config:
-                self.logger.warning(f"找不到供電時段配置: {schedule_type}")
-                return False
-            
-            start_time_str = power_config.get('start', '06:00:00')
-            end_time_str = power_config.get('end', '22:00:00')
-            
-            start_time = time.fromisoformat(start_time_str)
-            end_time = time.fromisoformat(end_time_str)
-            current_time = datetime.now().time()
-            
-            self.logger.debug(f"供電時段檢查: {schedule_type} = {start_time_str}-{end_time_str}, 當前時間: {current_time}")
-            
-            if start_time <= end_time:
-                # 同日內的時段
-                is_active = start_time <= current_time <= end_time
-            else:
-                # 跨日的時段
-                is_active = current_time >= start_time or current_time <= end_time
-            
-            self.logger.debug(f"供電時段 {schedule_type} 活躍狀態: {is_active}")
-            return is_active
-            
+            schedule = current_app.config.get('DEFAULT_POWER_SCHEDULE')
+        except RuntimeError:
+            schedule = None
+        
+        if not schedule:
+            return DEFAULT_COMPILED_SCHEDULE
+        return CompiledPowerSchedule(schedule)
+    
+    def _compile_power_schedule(self) -> CompiledPowerSchedule:
+        """編譯供電時段 - 優先使用資料庫中的用戶設定"""
+        schedule = self._load_power_schedule_json()
+        if schedule:
+            self.logger.debug(f"編譯資料庫供電時段設定: {schedule}")
+            return CompiledPowerSchedule(schedule)
+        
+        self.logger.debug("資料庫沒有供電時段設定，使用預設配置")
+        return self._default_power_schedule()
+    
+    def get_power_schedule(self) -> CompiledPowerSchedule:
+        """獲取已編譯的供電時段 (配置變更後才重新編譯)"""
+        try:
+            return config_cache.get_derived('power_schedule', self._compile_power_schedule)
+        except Exception as e:
+            # 讀取或解析失敗時不快取，下次呼叫重試
+            self.logger.warning(f"無法從資料庫讀取供電時段，使用預設配置: {e}")
+            return self._default_power_schedule()
+    
+    def get_power_schedule_state(self, schedule_type: str = 'open_power') -> Tuple[bool, Optional[datetime]]:
+        """
+        獲取供電時段狀態與下一次切換時間
+        
+        Returns:
+            Tuple[bool, Optional[datetime]]: (是否活躍, 狀態持續到的時間點)
+        """
+        try:
+            return self._schedule_state.get(self.get_power_schedule(), schedule_type)
         except Exception as e:
             self.logger.error(f"檢查供電時段失敗: {e}")
-            return False
+            return False, None
+    
+    def is_power_schedule_active(self, schedule_type: str = 'open_power') -> bool:
+        """檢查供電時段是否活躍 - 切換時間點之前直接使用快取狀態"""
+        return self.get_power_schedule_state(schedule_type)[0]
 
 
 # 全局服務實例
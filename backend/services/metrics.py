@@ -0,0 +1,305 @@
+"""
+Metrics - 執行期指標
+Process-wide counters, gauges and histograms rendered in the Prometheus text
+exposition format for the /metrics endpoint
+"""
+
+import abc
+import time
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..database.config_cache import config_cache
+
+# 延遲類指標的預設區間 (秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Timer:
+    """with 區塊計時，結束時記錄到直方圖"""
+    
+    __slots__ = ('child', 'started')
+    
+    def __init__(self, child):
+        self.child = child
+        self.started = 0.0
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _Metric(abc.ABC):
+    """指標基底 - 依標籤值保存子項目"""
+    
+    type_name = ''
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+    
+    def labels(self, *values):
+        """獲取指定標籤值的子項目 (首次使用時建立)"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}')
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+    
+    def _default_child(self):
+        return self.labels()
+    
+    @abc.abstractmethod
+    def _new_child(self):
+        """建立一組標籤值的子項目"""
+    
+    @abc.abstractmethod
+    def samples(self) -> Iterable[str]:
+        """輸出此指標的所有樣本行"""
+    
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        lines.extend(self.samples())
+        return lines
+
+
+class _ValueChild:
+    __slots__ = ('value', 'lock', 'function')
+    
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+        self.function: Optional[Callable[[], float]] = None
+    
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+    
+    def dec(self, amount: float = 1.0):
+        with self.lock:
+            self.value -= amount
+    
+    def set(self, value: float):
+        self.value = value
+    
+    def set_function(self, function: Callable[[], float]):
+        """輸出時呼叫 function 取得數值 (例如其他模組自行維護的計數)"""
+        self.function = function
+    
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Counter(_Metric):
+    """只增不減的計數器"""
+    
+    type_name = 'counter'
+    
+    def _new_child(self):
+        return _ValueChild()
+    
+    def inc(self, amount: float = 1.0):
+        self._default_child().inc(amount)
+    
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}'
+
+
+class Gauge(Counter):
+    """可增減的量測值，也可由函數在輸出時計算"""
+    
+    type_name = 'gauge'
+    
+    def set(self, value: float):
+        self._default_child().set(value)
+    
+    def dec(self, amount: float = 1.0):
+        self._default_child().dec(amount)
+    
+    def set_function(self, function: Callable[[], float]):
+        """輸出時呼叫 function 取得數值 (無標籤；有標籤時使用 labels(...).set_function)"""
+        self._default_child().set_function(function)
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', 'lock')
+    
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+    
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+    
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    """直方圖 - 累積區間計數、總和與筆數"""
+    
+    type_name = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+    
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+    
+    def observe(self, value: float):
+        self._default_child().observe(value)
+    
+    def time(self) -> _Timer:
+        return _Timer(self._default_child())
+    
+    def samples(self):
+        for key, child in list(self._children.items()):
+            with child.lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class MetricsRegistry:
+    """指標註冊表"""
+    
+    def __init__(self, prefix: str = ''):
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        if not metric.labelnames:
+            # 無標籤的指標在尚未更新前也輸出 0
+            metric.labels()
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self.prefix + name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self.prefix + name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self.prefix + name, documentation, labelnames, buckets))
+    
+    def render(self) -> str:
+        """輸出 Prometheus 文字格式"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# 全局指標註冊表
+registry = MetricsRegistry(prefix='powermeter_')
+
+# MODBUS 匯流排 / Modbus bus
+MODBUS_POLL_SECONDS = registry.histogram(
+    'modbus_poll_seconds', 'Time to read one meter (all registers)', ['slave'])
+MODBUS_BUS_BUSY_SECONDS = registry.counter(
+    'modbus_bus_busy_seconds_total', 'Time spent in bus transactions; rate() gives bus utilisation')
+MODBUS_TRANSACTIONS = registry.counter(
+    'modbus_transactions_total', 'Register read transactions on the bus', ['slave'])
+MODBUS_ERRORS = registry.counter(
+    'modbus_errors_total', 'Failed register reads by kind (timeout, exception, error_response, not_connected)', ['slave', 'kind'])
+MODBUS_CACHE_REQUESTS = registry.counter(
+    'modbus_cache_requests_total', 'Register reads answered from the client cache or the bus', ['result'])
+
+# 輪詢 / Polling
+METER_SWEEP_SECONDS = registry.histogram(
+    'meter_sweep_seconds', 'Duration of a full all-meter sweep',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+METER_SWEEP_REQUESTS = registry.counter(
+    'meter_sweep_requests_total', 'All-meter requests by outcome (computed, shared)', ['result'])
+
+# 數據庫 / Database
+DB_FLUSH_SECONDS = registry.histogram(
+    'db_flush_seconds', 'Latency of committing a batch of readings')
+DB_FLUSH_ROWS = registry.counter(
+    'db_flush_rows_total', 'Readings committed by batch flushes')
+
+# Socket.IO
+SOCKETIO_FANOUT_SECONDS = registry.histogram(
+    'socketio_fanout_seconds', 'Time spent emitting an event to clients', ['event'])
+SOCKETIO_CLIENTS = registry.gauge(
+    'socketio_connected_clients', 'Currently connected Socket.IO clients')
+
+# 系統配置快取 (計數由 config_cache 維護，輸出時讀取) / SystemConfig cache
+CONFIG_CACHE_REQUESTS = registry.counter(
+    'config_cache_requests_total', 'SystemConfig cache lookups by result', ['result'])
+CONFIG_CACHE_REQUESTS.labels('hit').set_function(lambda: config_cache.hits)
+CONFIG_CACHE_REQUESTS.labels('miss').set_function(lambda: config_cache.misses)
+
+
+def classify_modbus_error(error) -> str:
+    """
+    依例外或錯誤回應判斷錯誤類型 (錯誤指標與 MODBUS 交易追蹤共用)
+    
+    Returns:
+        str: timeout / exception / error_response
+    """
+    text = str(error).lower()
+    if (isinstance(error, TimeoutError) or 'timeout' in text or 'timed out' in text or 'no response' in text
+            or 'no answer' in text):
+        # pymodbus: "No Response received"；minimalmodbus: "No communication with the instrument (no answer)"
+        return 'timeout'
+    if isinstance(error, BaseException):
+        return 'exception'
+    return 'error_response'
+
+
+def render_metrics() -> str:
+    """輸出所有指標"""
+    return registry.render()
@@ -14,6 +14,9 @@ import logging
 from datetime import datetime
 from typing import Optional, Dict, Any, Tuple
 
+from ..modbus.trace import modbus_trace
+from .metrics import MODBUS_POLL_SECONDS, MODBUS_BUS_BUSY_SECONDS, MODBUS_TRANSACTIONS, MODBUS_ERRORS, classify_modbus_error
+
 # 配置模擬模式 (可通過環境變量覆蓋)
 FORCE_SIMULATION = os.environ.get('FORCE_SIMULATION', 'False').lower() == 'true'
 
@@ -33,19 +36,12 @@ if not MINIMALMODBUS_AVAILABLE:
     import random
     
     def _get_power_schedule_status():
-        """獲取當前供電時段狀態"""
-        try:
-            # 延遲導入避免循環依賴
-            from .meter_service import meter_service
-            is_power_on = meter_service.is_power_schedule_active('open_power')
-            logging.debug(f"MockMinimalModbus: 供電時段狀態 = {is_power_on}")
-            return is_power_on
-        except Exception as e:
-            logging.warning(f"MockMinimalModbus: 無法獲取供電時段狀態，使用預設值: {e}")
-            # 如果無法獲取供電時段，預設為開啟（06:00-22:00）
-            from datetime import datetime
-            current_hour = datetime.now().hour
-            return 6 <= current_hour < 22
+        """獲取當前供電時段狀態 (切換時間點前直接使用快取狀態)"""
+        # 延遲導入避免循環依賴
+        from .meter_service import meter_service
+        is_power_on = meter_service.is_power_schedule_active('open_power')
+        logging.debug(f"MockMinimalModbus: 供電時段狀態 = {is_power_on}")
+        return is_power_on
     
     class MockSerial:
         def __init__(self):
@@ -158,7 +154,9 @@ class WebPowerMeterController:
         """
         try:
             # 讀取兩個連續暫存器
-            registers = self.instrument.read_registers(start_address, 2, functioncode=3)
+            MODBUS_TRANSACTIONS.labels(self.slave_address).inc()
+            with modbus_trace.span(self.slave_address, 0x03, start_address, 2, MODBUS_BUS_BUSY_SECONDS.inc):
+                registers = self.instrument.read_registers(start_address, 2, functioncode=3)
             
             if registers:
                 # 使用 ABCD (Big-Endian) 組合 - 與原版一致
@@ -171,6 +169,7 @@ class WebPowerMeterController:
             return None, None
             
         except Exception as e:
+            MODBUS_ERRORS.labels(self.slave_address, classify_modbus_error(e)).inc()
             logging.error(f"✗ 讀取{name}錯誤 (地址: 0x{start_address:04X}): {e}")
             return None, None
     
@@ -184,7 +183,9 @@ class WebPowerMeterController:
         """
         try:
             # 讀取地址 0x000C 和 0x000D (總有效電能)
-            registers = self.instrument.read_registers(0x000C, 2, functioncode=3)
+            MODBUS_TRANSACTIONS.labels(self.slave_address).inc()
+            with modbus_trace.span(self.slave_address, 0x03, 0x000C, 2, MODBUS_BUS_BUSY_SECONDS.inc):
+                registers = self.instrument.read_registers(0x000C, 2, functioncode=3)
             
             if registers:
                 # 使用 ABCD (Big-Endian) 組合
@@ -197,6 +198,7 @@ class WebPowerMeterController:
             return None, None
             
         except Exception as e:
+            MODBUS_ERRORS.labels(self.slave_address, classify_modbus_error(e)).inc()
             logging.error(f"✗ 讀取電能錯誤: {e}")
             return None, None
     
@@ -239,9 +241,11 @@ class WebPowerMeterController:
         """
         try:
             # 讀取地址 0x0000 (功能碼 01h)
-            status = self.instrument.read_bit(0x0000, functioncode=1)
+            with modbus_trace.span(self.slave_address, 0x01, 0x0000, 1, MODBUS_BUS_BUSY_SECONDS.inc):
+                status = self.instrument.read_bit(0x0000, functioncode=1)
             return "ON" if status else "OFF"
         except Exception as e:
+            MODBUS_ERRORS.labels(self.slave_address, classify_modbus_error(e)).inc()
             logging.error(f"✗ 讀取繼電器狀態錯誤: {e}")
             return "未知"
     
@@ -260,7 +264,12 @@ class WebPowerMeterController:
             # 地址 0x0000, 功能碼 05h
             # ON: 寫入 0xFF00 (True), OFF: 寫入 0x0000 (False)
             value = True if action.upper() == "ON" else False
-            self.instrument.write_bit(0x0000, value, functioncode=5)
+            try:
+                with modbus_trace.span(self.slave_address, 0x05, 0x0000, 1, MODBUS_BUS_BUSY_SECONDS.inc):
+                    self.instrument.write_bit(0x0000, value, functioncode=5)
+            except Exception as e:
+                MODBUS_ERRORS.labels(self.slave_address, classify_modbus_error(e)).inc()
+                raise
             
             # 等待一下讓繼電器動作
             time.sleep(0.5)
@@ -288,8 +297,9 @@ class WebPowerMeterController:
             Dict: 格式化的監控數據
         """
         try:
-            params = self.read_all_parameters()
-            relay_status = self.read_relay_status()
+            with MODBUS_POLL_SECONDS.labels(self.slave_address).time():
+                params = self.read_all_parameters()
+                relay_status = self.read_relay_status()
             
             if params:
                 # 提取各個值並格式化
@@ -13,6 +13,9 @@ import logging
 from datetime import datetime
 from typing import Optional, Dict, Any, Tuple, List
 
+from .metrics import MODBUS_POLL_SECONDS, MODBUS_BUS_BUSY_SECONDS, MODBUS_TRANSACTIONS, MODBUS_ERRORS, classify_modbus_error
+from ..modbus.trace import modbus_trace
+
 # 配置模擬模式 (可通過環境變量覆蓋)
 FORCE_SIMULATION = os.environ.get('FORCE_SIMULATION', 'False').lower() == 'true'
 
@@ -74,7 +77,9 @@ class PowerMeterControllerMinimal:
                 self.request_count += 1
                 
                 # 讀取兩個連續暫存器 - 與 MODBUS_TEST20.PY 相同
-                registers = self.instrument.read_registers(start_address, 2, functioncode=3)
+                MODBUS_TRANSACTIONS.labels(self.slave_address).inc()
+                with modbus_trace.span(self.slave_address, 0x03, start_address, 2, MODBUS_BUS_BUSY_SECONDS.inc):
+                    registers = self.instrument.read_registers(start_address, 2, functioncode=3)
                 
                 if registers:
                     # 使用 ABCD (Big-Endian) 組合 - 與 MODBUS_TEST20.PY 完全相同
@@ -89,6 +94,7 @@ class PowerMeterControllerMinimal:
                 
         except Exception as e:
             self.error_count += 1
+            MODBUS_ERRORS.labels(self.slave_address, classify_modbus_error(e)).inc()
             self.logger.error(f"讀取{name}錯誤 (地址: 0x{start_address:04X}): {e}")
             return self._get_simulated_float32_value(start_address, name)
     
@@ -96,14 +102,9 @@ class PowerMeterControllerMinimal:
         """模擬 FLOAT32 值"""
         import random
         
-        # 使用供電時段邏輯
-        try:
-            from .meter_service import meter_service
-            is_power_on = meter_service.is_power_schedule_active('open_power')
-        except:
-            # 如果無法獲取供電時段，使用時間判斷
-            current_hour = datetime.now().hour
-            is_power_on = 6 <= current_hour < 22
+        # 使用供電時段邏輯 (已編譯時段，失敗時內部回退預設時段)
+        from .meter_service import meter_service
+        is_power_on = meter_service.is_power_schedule_active('open_power')
         
         if address == 0x0000:  # 平均相電壓
             value = 220.0 + random.uniform(-5, 5) if is_power_on else 0.0
@@ -163,22 +164,19 @@ class PowerMeterControllerMinimal:
         
         try:
             # 讀取地址 0x0000 (功能碼 01h) - 與 MODBUS_TEST20.PY 相同
-            status = self.instrument.read_bit(0x0000, functioncode=1)
+            with modbus_trace.span(self.slave_address, 0x01, 0x0000, 1, MODBUS_BUS_BUSY_SECONDS.inc):
+                status = self.instrument.read_bit(0x0000, functioncode=1)
             return "ON" if status else "OFF"
         except Exception as e:
+            MODBUS_ERRORS.labels(self.slave_address, classify_modbus_error(e)).inc()
             self.logger.error(f"讀取繼電器狀態錯誤: {e}")
             return self._get_simulated_relay_status()
     
     def _get_simulated_relay_status(self) -> str:
         """模擬繼電器狀態"""
-        try:
-            from .meter_service import meter_service
-            is_power_on = meter_service.is_power_schedule_active('open_power')
-            return "ON" if is_power_on else "OFF"
-        except:
-            current_hour = datetime.now().hour
-            is_power_on = 6 <= current_hour < 22
-            return "ON" if is_power_on else "OFF"
+        from .meter_service import meter_service
+        is_power_on = meter_service.is_power_schedule_active('open_power')
+        return "ON" if is_power_on else "OFF"
     
     def control_relay(self, action: str) -> bool:
         """控制繼電器 ON/OFF - 與 MODBUS_TEST20.PY 相同"""
@@ -189,7 +187,12 @@ class PowerMeterControllerMinimal:
         try:
             # 地址 0x0000, 功能碼 05h - 與 MODBUS_TEST20.PY 相同
             value = True if action.upper() == "ON" else False
-            self.instrument.write_bit(0x0000, value, functioncode=5)
+            try:
+                with modbus_trace.span(self.slave_address, 0x05, 0x0000, 1, MODBUS_BUS_BUSY_SECONDS.inc):
+                    self.instrument.write_bit(0x0000, value, functioncode=5)
+            except Exception as e:
+                MODBUS_ERRORS.labels(self.slave_address, classify_modbus_error(e)).inc()
+                raise
             
             # 等待一下讓繼電器動作
             time.sleep(0.5)
@@ -216,8 +219,9 @@ class PowerMeterControllerMinimal:
         
         try:
             # 讀取所有電力參數
-            params = self.read_all_parameters()
-            relay_status = self.read_relay_status()
+            with MODBUS_POLL_SECONDS.labels(meter_id).time():
+                params = self.read_all_parameters()
+                relay_status = self.read_relay_status()
             
             # 提取基本參數
             voltage = params.get('平均相電壓', {}).get('value', 0.0)
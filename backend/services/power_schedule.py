@@ -0,0 +1,135 @@
+"""
+供電時段編譯器 / Compiled power schedule evaluator
+Parses the schedule once and answers activity / next-transition queries in O(1)
+"""
+
+import threading
+from datetime import datetime, time, timedelta
+from typing import Dict, Optional, Tuple
+
+# 內建預設供電時段 (無應用上下文或配置缺失時使用)
+DEFAULT_POWER_SCHEDULE = {
+    'open_power': {'start': '06:00:00', 'end': '22:00:00'},
+    'close_power': {'start': '22:00:00', 'end': '06:00:00'}
+}
+
+_DAY_US = 24 * 3600 * 1000000
+
+
+def _time_to_us(value: time) -> int:
+    """時間轉換為當日微秒數"""
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
+
+
+class CompiledPowerSchedule:
+    """
+    已編譯的供電時段
+    
+    - 時段起訖皆為閉區間 (與原本 start <= t <= end 的判斷一致)
+    - end < start 視為跨日時段
+    - 解析只在建立時進行一次，查詢只做整數比較
+    """
+    
+    def __init__(self, schedule: Optional[Dict] = None):
+        self.source = schedule or {}
+        self.windows: Dict[str, Tuple[int, int]] = {}
+        
+        for schedule_type, window in self.source.items():
+            if not isinstance(window, dict):
+                continue
+            start = time.fromisoformat(window.get('start', '06:00:00'))
+            end = time.fromisoformat(window.get('end', '22:00:00'))
+            self.windows[schedule_type] = (_time_to_us(start), _time_to_us(end))
+    
+    def _contains(self, schedule_type: str, us: int) -> bool:
+        """判斷當日微秒數是否落在時段內"""
+        window = self.windows.get(schedule_type)
+        if window is None:
+            return False
+        start, end = window
+        if start <= end:
+            return start <= us <= end
+        return us >= start or us <= end
+    
+    def is_active(self, schedule_type: str = 'open_power', at: Optional[datetime] = None) -> bool:
+        """檢查時段在指定時間是否活躍 (預設為現在)"""
+        at = at or datetime.now()
+        return self._contains(schedule_type, _time_to_us(at.time()))
+    
+    def next_transition(self, schedule_type: str = 'open_power',
+                        at: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        獲取下一次狀態切換的時間點
+        
+        Returns:
+            datetime: 第一個與目前狀態不同的時間點；時段全天有效或不存在時為 None
+        """
+        window = self.windows.get(schedule_type)
+        if window is None:
+            return None
+        start, end = window
+        
+        # 閉區間涵蓋整天 (如 00:00:00 - 23:59:59.999999 或跨日首尾相接)
+        if (start <= end and start == 0 and end == _DAY_US - 1) or (start > end and start - end <= 1):
+            return None
+        
+        at = at or datetime.now()
+        us = _time_to_us(at.time())
+        midnight = at.replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        if self._contains(schedule_type, us):
+            # 活躍中 -> 結束時間的下一微秒
+            boundary = end + 1
+        else:
+            # 未活躍 -> 下一個開始時間
+            boundary = start
+        
+        if boundary <= us:
+            boundary += _DAY_US
+        return midnight + timedelta(microseconds=boundary)
+    
+    def state(self, schedule_type: str = 'open_power',
+              at: Optional[datetime] = None) -> Tuple[bool, Optional[datetime]]:
+        """同時返回活躍狀態與該狀態持續到的時間點"""
+        at = at or datetime.now()
+        return self.is_active(schedule_type, at), self.next_transition(schedule_type, at)
+    
+    def to_dict(self) -> Dict:
+        """轉換為字典格式"""
+        return dict(self.source)
+
+
+class PowerScheduleState:
+    """
+    供電狀態快取 - 在下一次切換前直接返回快取結果
+    
+    編譯物件被替換 (配置變更) 時自動重新計算
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[CompiledPowerSchedule, bool, Optional[datetime]]] = {}
+    
+    def get(self, compiled: CompiledPowerSchedule, schedule_type: str = 'open_power',
+            at: Optional[datetime] = None) -> Tuple[bool, Optional[datetime]]:
+        """返回 (是否活躍, 狀態持續到)"""
+        at = at or datetime.now()
+        entry = self._entries.get(schedule_type)
+        if entry is not None:
+            cached_compiled, active, until = entry
+            if cached_compiled is compiled and (until is None or at < until):
+                return active, until
+        
+        active, until = compiled.state(schedule_type, at)
+        with self._lock:
+            self._entries[schedule_type] = (compiled, active, until)
+        return active, until
+    
+    def clear(self):
+        """清除快取"""
+        with self._lock:
+            self._entries.clear()
+
+
+# 預設時段的編譯結果
+DEFAULT_COMPILED_SCHEDULE = CompiledPowerSchedule(DEFAULT_POWER_SCHEDULE)
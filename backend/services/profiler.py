@@ -0,0 +1,237 @@
+"""
+Sampling Profiler - 取樣式效能分析
+Opt-in stack sampling for a configurable fraction of HTTP requests and
+Socket.IO events; stacks are aggregated over time and dumped in the folded
+format read by flamegraph.pl / speedscope
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import g, request
+
+
+class SamplingProfiler:
+    """
+    取樣式效能分析器
+    
+    被選中的請求 / 事件在開始時登記所在執行緒，背景執行緒每 interval 秒
+    以 sys._current_frames() 讀取這些執行緒的呼叫堆疊並累計次數。未選中
+    的請求只多一次屬性檢查與亂數，停用時背景執行緒結束。
+    """
+    
+    def __init__(self, sample_rate: float = 0.1, interval: float = 0.005,
+                 max_depth: int = 64, max_stacks: int = 20000):
+        self.logger = logging.getLogger(__name__)
+        self.enabled = False
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self._lock = threading.Lock()
+        self._active: Dict[int, str] = {}           # 執行緒 ID -> 標籤
+        self._stacks: Dict[str, int] = defaultdict(int)
+        self._labels: Dict[str, Dict] = {}
+        self._frame_names: Dict[object, str] = {}   # code 物件 -> 堆疊名稱
+        self._thread: Optional[threading.Thread] = None
+        self._started_at: Optional[float] = None
+        self._samples = 0
+        self._dropped = 0
+        self._sampler_seconds = 0.0
+    
+    def configure(self, app):
+        """套用應用配置"""
+        self.sample_rate = app.config.get('PROFILER_SAMPLE_RATE', self.sample_rate)
+        self.interval = app.config.get('PROFILER_INTERVAL', self.interval)
+        self.max_stacks = app.config.get('PROFILER_MAX_STACKS', self.max_stacks)
+        self.set_enabled(app.config.get('PROFILER_ENABLED', False))
+    
+    def init_app(self, app, socketio):
+        """註冊 HTTP 請求掛鉤並包裝已註冊的 Socket.IO 事件處理器"""
+        self.configure(app)
+        
+        @app.before_request
+        def _profile_before_request():
+            if self.enabled and request.endpoint != 'static':
+                rule = request.url_rule.rule if request.url_rule else request.path
+                g._profile_token = self.begin(f'{request.method} {rule}')
+        
+        @app.teardown_request
+        def _profile_teardown_request(error=None):
+            token = g.pop('_profile_token', None)
+            if token is not None:
+                self.end(token)
+        
+        for namespace, handlers in socketio.server.handlers.items():
+            for event, handler in list(handlers.items()):
+                handlers[event] = self._wrap_event(event, handler)
+    
+    def _wrap_event(self, event: str, handler):
+        label = f'socket {event}'
+        
+        def _profiled_handler(*args):
+            token = self.begin(label) if self.enabled else None
+            try:
+                return handler(*args)
+            finally:
+                if token is not None:
+                    self.end(token)
+        
+        return _profiled_handler
+    
+    # ------------------------------------------------------------------
+    # 控制 / Control
+    # ------------------------------------------------------------------
+    def set_enabled(self, enabled: bool):
+        """啟用或停用取樣 (累計的堆疊保留)"""
+        with self._lock:
+            self.enabled = bool(enabled)
+            if self.enabled and (self._thread is None or not self._thread.is_alive()):
+                if self._started_at is None:
+                    self._started_at = time.time()
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+        self.logger.info(f'Sampling profiler {"enabled" if self.enabled else "disabled"} '
+                         f'(rate={self.sample_rate}, interval={self.interval}s)')
+    
+    def reset(self):
+        """清除累計的堆疊與統計"""
+        with self._lock:
+            self._stacks = defaultdict(int)
+            self._labels = {}
+            self._samples = 0
+            self._dropped = 0
+            self._sampler_seconds = 0.0
+            self._started_at = time.time() if self.enabled else None
+    
+    # ------------------------------------------------------------------
+    # 請求掛鉤 / Request hooks
+    # ------------------------------------------------------------------
+    def begin(self, label: str) -> Optional[tuple]:
+        """
+        依取樣率決定是否分析目前執行緒
+        
+        Returns:
+            tuple: 交給 end() 的識別值；未選中時為 None
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        thread_id = threading.get_ident()
+        if thread_id in self._active:
+            return None
+        self._active[thread_id] = label
+        return thread_id, label, time.perf_counter()
+    
+    def end(self, token: tuple):
+        """結束分析並累計標籤統計"""
+        thread_id, label, started = token
+        elapsed = time.perf_counter() - started
+        self._active.pop(thread_id, None)
+        with self._lock:
+            stats = self._label_stats(label)
+            stats['profiled'] += 1
+            stats['total_seconds'] += elapsed
+            if elapsed > stats['max_seconds']:
+                stats['max_seconds'] = elapsed
+    
+    # ------------------------------------------------------------------
+    # 取樣 / Sampling
+    # ------------------------------------------------------------------
+    def _label_stats(self, label: str) -> Dict:
+        stats = self._labels.get(label)
+        if stats is None:
+            stats = self._labels[label] = {'label': label, 'profiled': 0, 'total_seconds': 0.0,
+                                           'max_seconds': 0.0, 'samples': 0}
+        return stats
+    
+    def _frame_name(self, code) -> str:
+        name = self._frame_names.get(code)
+        if name is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            name = f'{module}:{getattr(code, "co_qualname", code.co_name)}'.replace(';', ',')
+            self._frame_names[code] = name
+        return name
+    
+    def _run(self):
+        while self.enabled:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            
+            started = time.perf_counter()
+            active = list(self._active.items())
+            frames = sys._current_frames()
+            folded: List[tuple] = []
+            for thread_id, label in active:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    names.append(self._frame_name(frame.f_code))
+                    frame = frame.f_back
+                names.append(label)
+                folded.append((label, ';'.join(reversed(names))))
+            del frames
+            
+            with self._lock:
+                for label, stack in folded:
+                    if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                        self._stacks[stack] += 1
+                    else:
+                        self._dropped += 1
+                    self._label_stats(label)['samples'] += 1
+                self._samples += len(folded)
+                self._sampler_seconds += time.perf_counter() - started
+    
+    # ------------------------------------------------------------------
+    # 輸出 / Output
+    # ------------------------------------------------------------------
+    def folded(self, label: Optional[str] = None) -> str:
+        """
+        以 folded 格式輸出累計堆疊 (每行 "標籤;框架;框架 次數")
+        
+        Args:
+            label: 只輸出以此字串開頭的標籤
+        """
+        with self._lock:
+            stacks = list(self._stacks.items())
+        lines = [f'{stack} {count}' for stack, count in sorted(stacks)
+                 if label is None or stack.startswith(label)]
+        return '\n'.join(lines) + ('\n' if lines else '')
+    
+    def get_stats(self) -> Dict:
+        """獲取分析器狀態與各標籤統計"""
+        with self._lock:
+            labels = []
+            for stats in self._labels.values():
+                labels.append({
+                    'label': stats['label'],
+                    'profiled': stats['profiled'],
+                    'samples': stats['samples'],
+                    'avg_ms': round(stats['total_seconds'] / max(stats['profiled'], 1) * 1000, 3),
+                    'max_ms': round(stats['max_seconds'] * 1000, 3)
+                })
+            return {
+                'enabled': self.enabled,
+                'sample_rate': self.sample_rate,
+                'interval': self.interval,
+                'since': datetime.fromtimestamp(self._started_at).isoformat() if self._started_at else None,
+                'samples': self._samples,
+                'distinct_stacks': len(self._stacks),
+                'dropped_samples': self._dropped,
+                'sampler_ms': round(self._sampler_seconds * 1000, 3),
+                'active': len(self._active),
+                'labels': sorted(labels, key=lambda item: item['samples'], reverse=True)
+            }
+
+
+# 全局效能分析器實例
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,93 @@
+"""
+Request Coalescer - 並行請求合併
+Concurrent callers asking for the same key share one computation; a result
+finished within the coalescing window is handed to later callers as well
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+class _Flight:
+    """一次進行中或剛完成的計算"""
+    
+    __slots__ = ('event', 'result', 'error', 'finished_at', 'waiters')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self.waiters = 0
+
+
+class RequestCoalescer:
+    """
+    並行請求合併
+    
+    第一個請求成為 leader 實際執行計算，計算期間到達的請求等待同一結果；
+    完成後 window 秒內到達的請求直接使用該結果。計算失敗時錯誤傳給等待中的
+    請求，但不會被重用。
+    """
+    
+    def __init__(self, window: float = 1.0, wait_timeout: float = 30.0):
+        self.logger = logging.getLogger(__name__)
+        self.window = window
+        self.wait_timeout = wait_timeout
+        self.computed = 0
+        self.shared = 0
+        self._flights: Dict[Any, _Flight] = {}
+        self._lock = threading.Lock()
+    
+    def run(self, key: Any, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        執行或共用計算
+        
+        Returns:
+            (結果, 是否為共用結果)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            reusable = flight is not None and (
+                flight.finished_at is None or time.monotonic() - flight.finished_at <= self.window
+            )
+            if reusable:
+                flight.waiters += 1
+                self.shared += 1
+            else:
+                flight = self._flights[key] = _Flight()
+                self.computed += 1
+        
+        if reusable:
+            if not flight.event.wait(self.wait_timeout):
+                raise TimeoutError(f'Timed out waiting for coalesced request: {key}')
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        
+        try:
+            flight.result = func()
+            return flight.result, False
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            raise
+        finally:
+            flight.finished_at = time.monotonic()
+            flight.event.set()
+            if flight.waiters:
+                self.logger.debug(f"合併請求 {key}: {flight.waiters} 個請求共用同一結果")
+    
+    def get_stats(self) -> Dict:
+        """獲取合併統計"""
+        total = self.computed + self.shared
+        return {
+            'window_seconds': self.window,
+            'computed': self.computed,
+            'shared': self.shared,
+            'shared_ratio': round(self.shared / total, 3) if total else 0.0
+        }
@@ -0,0 +1,375 @@
+"""
+History Retention Service - 歷史數據保留與壓縮服務
+Rolls raw meter history into hourly buckets, purges expired raw rows
+and reports real storage statistics
+"""
+
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, select, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..database import db, Meter, MeterHistory, MeterHistoryHourly, BillingRecord, SystemConfig, read_session
+from .counter_normalizer import counter_normalizer, utc_epoch
+
+
+def _floor_hour(value: datetime) -> datetime:
+    """取整到小時"""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+class HistoryRetentionService:
+    """歷史數據保留服務 - 先彙總、後清理、再回收空間"""
+
+    WATERMARK_KEY = 'history_rollup_watermark'
+    LAST_CLEANUP_KEY = 'history_last_cleanup'
+    LAST_RESULT_KEY = 'history_last_cleanup_result'
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._incremental_vacuum_ready = False
+
+    def _config(self, key: str, default):
+        """讀取應用程式配置 (無應用上下文時使用預設值)"""
+        try:
+            from flask import current_app
+            return current_app.config.get(key, default)
+        except RuntimeError:
+            return default
+
+    # ------------------------------------------------------------------
+    # 彙總 / Rollup
+    # ------------------------------------------------------------------
+    def get_rollup_watermark(self) -> Optional[datetime]:
+        """獲取彙總水位 - 此時間之前的小時皆已彙總"""
+        value = SystemConfig.get_value(self.WATERMARK_KEY)
+        return datetime.fromisoformat(value) if value else None
+
+    def rollup_pending(self, now: datetime = None) -> int:
+        """將已完成的小時彙總到 meter_history_hourly，返回寫入的彙總筆數"""
+        until = _floor_hour(now or datetime.utcnow())
+        watermark = self.get_rollup_watermark()
+
+        if watermark is None:
+            oldest = db.session.query(func.min(MeterHistory.recorded_at)).scalar()
+            if oldest is None:
+                return 0
+            watermark = _floor_hour(oldest)
+
+        chunk = timedelta(hours=self._config('HISTORY_ROLLUP_CHUNK_HOURS', 24))
+        written = 0
+
+        try:
+            chunk_start = watermark
+            while chunk_start < until:
+                chunk_end = min(chunk_start + chunk, until)
+                written += self._rollup_range(chunk_start, chunk_end)
+                # set_value 會一併提交彙總結果與新水位
+                SystemConfig.set_value(self.WATERMARK_KEY, chunk_end.isoformat(), '歷史彙總水位 (UTC)')
+                chunk_start = chunk_end
+        except SQLAlchemyError as e:
+            self.logger.error(f"彙總歷史數據失敗: {e}")
+            db.session.rollback()
+            raise
+
+        if written:
+            self.logger.info(f"歷史數據彙總完成: {written} 筆小時記錄 (至 {until.isoformat()})")
+        return written
+    
+    def last_rollup_readings(self, before: datetime) -> Dict[int, Tuple[float, float]]:
+        """
+        各電表在 before 之前最後一個小時彙總的末筆讀數
+        
+        Returns:
+            Dict: 電表 ID -> (累積電能, 該小時起點 epoch 秒)，作為下一段讀數的計數器基準
+        """
+        latest = select(
+            MeterHistoryHourly.meter_id,
+            func.max(MeterHistoryHourly.hour_start).label('hour_start')
+        ).where(MeterHistoryHourly.hour_start < before).group_by(MeterHistoryHourly.meter_id).subquery()
+        
+        rows = db.session.execute(
+            select(MeterHistoryHourly.meter_id, MeterHistoryHourly.energy_end, MeterHistoryHourly.hour_start)
+            .join(latest, and_(MeterHistoryHourly.meter_id == latest.c.meter_id,
+                               MeterHistoryHourly.hour_start == latest.c.hour_start))
+        )
+        return {meter_id: (energy_end, utc_epoch(hour_start)) for meter_id, energy_end, hour_start in rows}
+    
+    def _rollup_range(self, start: datetime, end: datetime) -> int:
+        """
+        彙總 [start, end) 區間內的原始記錄 (串流讀取，不載入整個結果集)
+        
+        用電量以 counter_normalizer 的規則逐筆計算，每筆增量計入該讀數所在的小時；
+        區間首筆讀數以前一個小時彙總的末筆讀數為基準，跨小時的增量不會遺失。
+        """
+        carry = self.last_rollup_readings(start)
+        stmt = select(
+            MeterHistory.meter_id,
+            MeterHistory.recorded_at,
+            MeterHistory.voltage,
+            MeterHistory.current,
+            MeterHistory.power,
+            MeterHistory.energy,
+            MeterHistory.power_on
+        ).where(
+            MeterHistory.recorded_at >= start,
+            MeterHistory.recorded_at < end
+        ).order_by(
+            MeterHistory.meter_id, MeterHistory.recorded_at
+        ).execution_options(yield_per=2000)
+
+        buckets: Dict[Tuple[int, datetime], Dict] = {}
+        series = {'meter_id': None, 'energies': [], 'times': [], 'buckets': []}
+        
+        def flush_series():
+            """將目前電表的逐筆增量累加到所屬小時"""
+            if series['meter_id'] is None:
+                return
+            deltas = counter_normalizer.series_deltas(series['energies'], series['times'],
+                                                      *carry.get(series['meter_id'], (None, None)))
+            for bucket, delta in zip(series['buckets'], deltas):
+                bucket['energy_used'] += delta
+            series['energies'], series['times'], series['buckets'] = [], [], []
+        
+        for meter_id, recorded_at, voltage, current, power, energy, power_on in db.session.execute(stmt):
+            if meter_id != series['meter_id']:
+                flush_series()
+                series['meter_id'] = meter_id
+            key = (meter_id, _floor_hour(recorded_at))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {
+                    'meter_id': meter_id,
+                    'hour_start': key[1],
+                    'sample_count': 0,
+                    'powered_count': 0,
+                    'voltage_sum': 0.0,
+                    'current_sum': 0.0,
+                    'power_sum': 0.0,
+                    'power_max': 0.0,
+                    'energy_start': energy or 0.0,
+                    'energy_end': energy or 0.0,
+                    'energy_used': 0.0
+                }
+            bucket['sample_count'] += 1
+            bucket['powered_count'] += 1 if power_on else 0
+            bucket['voltage_sum'] += voltage or 0.0
+            bucket['current_sum'] += current or 0.0
+            bucket['power_sum'] += power or 0.0
+            bucket['power_max'] = max(bucket['power_max'], power or 0.0)
+            bucket['energy_end'] = energy or 0.0
+            series['energies'].append(energy)
+            series['times'].append(utc_epoch(recorded_at))
+            series['buckets'].append(bucket)
+        flush_series()
+        
+        # 重新彙總時先刪除舊的小時記錄，確保可重複執行
+        db.session.execute(
+            delete(MeterHistoryHourly).where(
+                MeterHistoryHourly.hour_start >= start,
+                MeterHistoryHourly.hour_start < end
+            ),
+            execution_options={'synchronize_session': False}
+        )
+
+        if not buckets:
+            return 0
+
+        rows = []
+        for bucket in buckets.values():
+            count = bucket['sample_count']
+            rows.append({
+                'meter_id': bucket['meter_id'],
+                'hour_start': bucket['hour_start'],
+                'sample_count': count,
+                'powered_count': bucket['powered_count'],
+                'voltage_avg': bucket['voltage_sum'] / count,
+                'current_avg': bucket['current_sum'] / count,
+                'power_avg': bucket['power_sum'] / count,
+                'power_max': bucket['power_max'],
+                'energy_start': bucket['energy_start'],
+                'energy_end': bucket['energy_end'],
+                'energy_used': bucket['energy_used']
+            })
+
+        db.session.execute(insert(MeterHistoryHourly), rows)
+        return len(rows)
+
+    # ------------------------------------------------------------------
+    # 清理 / Purge
+    # ------------------------------------------------------------------
+    def purge_expired(self, now: datetime = None) -> Tuple[int, Optional[datetime]]:
+        """分批刪除超過保留期限且已彙總的原始記錄，返回 (刪除筆數, 截止時間)"""
+        now = now or datetime.utcnow()
+        watermark = self.get_rollup_watermark()
+        if watermark is None:
+            self.logger.info("尚未建立歷史彙總，跳過清理")
+            return 0, None
+
+        horizon = now - timedelta(days=self._config('HISTORY_RETENTION_DAYS', 90))
+        # 只刪除彙總已覆蓋的範圍
+        cutoff = min(horizon, watermark)
+        batch_size = self._config('HISTORY_PURGE_BATCH_SIZE', 5000)
+        max_batches = self._config('HISTORY_PURGE_MAX_BATCHES', 200)
+
+        purged = 0
+        try:
+            for _ in range(max_batches):
+                batch_ids = select(MeterHistory.id).where(
+                    MeterHistory.recorded_at < cutoff
+                ).limit(batch_size)
+                result = db.session.execute(
+                    delete(MeterHistory).where(MeterHistory.id.in_(batch_ids)),
+                    execution_options={'synchronize_session': False}
+                )
+                db.session.commit()
+
+                purged += result.rowcount or 0
+                if (result.rowcount or 0) < batch_size:
+                    break
+        except SQLAlchemyError as e:
+            self.logger.error(f"清理歷史數據失敗: {e}")
+            db.session.rollback()
+            raise
+
+        if purged:
+            self.logger.info(f"已清理 {purged} 筆過期歷史記錄 (早於 {cutoff.isoformat()})")
+        return purged, cutoff
+
+    # ------------------------------------------------------------------
+    # 空間回收 / Incremental vacuum
+    # ------------------------------------------------------------------
+    def _sqlite_file(self) -> Optional[str]:
+        """返回 SQLite 資料庫檔案路徑 (非 SQLite 或記憶體資料庫時為 None)"""
+        url = db.engine.url
+        if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+            return None
+        return url.database
+
+    def ensure_incremental_vacuum(self) -> bool:
+        """確保 SQLite 使用 auto_vacuum=INCREMENTAL (舊資料庫需一次完整 VACUUM 轉換)"""
+        if self._incremental_vacuum_ready:
+            return True
+        if self._sqlite_file() is None:
+            return False
+
+        with db.engine.connect() as conn:
+            conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+            mode = conn.execute(text('PRAGMA auto_vacuum')).scalar()
+            if mode != 2:
+                self.logger.info("轉換資料庫為增量回收模式 (auto_vacuum=INCREMENTAL)...")
+                conn.execute(text('PRAGMA auto_vacuum=INCREMENTAL'))
+                conn.execute(text('VACUUM'))
+
+        self._incremental_vacuum_ready = True
+        return True
+
+    def incremental_vacuum(self, pages: int = None) -> int:
+        """回收空閒頁，返回回收的頁數"""
+        if not self.ensure_incremental_vacuum():
+            return 0
+
+        pages = pages or self._config('HISTORY_VACUUM_PAGES', 2000)
+        with db.engine.connect() as conn:
+            conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+            before = conn.execute(text('PRAGMA freelist_count')).scalar() or 0
+            # incremental_vacuum 每次 step 釋放一頁，需以原生游標取完結果才會全部執行
+            cursor = conn.connection.driver_connection.cursor()
+            try:
+                cursor.execute(f'PRAGMA incremental_vacuum({int(pages)})')
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            after = conn.execute(text('PRAGMA freelist_count')).scalar() or 0
+
+        return max(0, before - after)
+
+    # ------------------------------------------------------------------
+    # 維護作業 / Maintenance
+    # ------------------------------------------------------------------
+    def run_maintenance(self, now: datetime = None) -> Dict:
+        """執行一次完整維護：彙總 → 清理 → 回收空間"""
+        started = time.perf_counter()
+        now = now or datetime.utcnow()
+
+        rolled_up = self.rollup_pending(now)
+        purged, cutoff = self.purge_expired(now)
+        vacuumed = self.incremental_vacuum() if purged else 0
+
+        result = {
+            'rolled_up_buckets': rolled_up,
+            'purged_records': purged,
+            'vacuumed_pages': vacuumed,
+            'cutoff': cutoff.isoformat() if cutoff else None,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+
+        SystemConfig.set_value(self.LAST_CLEANUP_KEY, now.isoformat(), '最後歷史清理時間 (UTC)')
+        SystemConfig.set_value(self.LAST_RESULT_KEY, str(purged), '最後歷史清理刪除筆數')
+        self.logger.info(f"歷史數據維護完成: {result}")
+        return result
+
+    # ------------------------------------------------------------------
+    # 統計 / Statistics
+    # ------------------------------------------------------------------
+    def get_storage_statistics(self) -> Dict:
+        """從資料庫讀取真實的儲存統計"""
+        # 全表統計走唯讀連線，避免與輪詢寫入互相阻擋
+        with read_session() as session:
+            oldest, newest = session.query(
+                func.min(MeterHistory.recorded_at),
+                func.max(MeterHistory.recorded_at)
+            ).one()
+            oldest_rollup = session.query(func.min(MeterHistoryHourly.hour_start)).scalar()
+            counts = {
+                'meter_count': session.query(func.count(Meter.id)).scalar(),
+                'total_records': session.query(func.count(MeterHistory.id)).scalar(),
+                'hourly_records': session.query(func.count(MeterHistoryHourly.id)).scalar(),
+                'billing_records': session.query(func.count(BillingRecord.id)).scalar()
+            }
+        
+        watermark = self.get_rollup_watermark()
+
+        stats = {
+            'database_status': 'active',
+            'database_backend': db.engine.url.get_backend_name(),
+            **counts,
+            'oldest_record': oldest.isoformat() if oldest else None,
+            'newest_record': newest.isoformat() if newest else None,
+            'oldest_hourly_record': oldest_rollup.isoformat() if oldest_rollup else None,
+            'rollup_watermark': watermark.isoformat() if watermark else None,
+            'retention_days': self._config('HISTORY_RETENTION_DAYS', 90),
+            'cleanup_schedule': f"原始記錄保留 {self._config('HISTORY_RETENTION_DAYS', 90)} 天，彙總後分批清理",
+            'last_cleanup': SystemConfig.get_value(self.LAST_CLEANUP_KEY),
+            'last_cleanup_purged': int(SystemConfig.get_value(self.LAST_RESULT_KEY) or 0),
+            'database_size_mb': None
+        }
+
+        db_file = self._sqlite_file()
+        if db_file:
+            size = 0
+            for suffix in ('', '-wal', '-shm'):
+                path = db_file + suffix
+                if os.path.exists(path):
+                    size += os.path.getsize(path)
+
+            page_size = db.session.execute(text('PRAGMA page_size')).scalar() or 0
+            stats.update({
+                'database_file': db_file,
+                'database_size_mb': round(size / (1024 * 1024), 2),
+                'page_count': db.session.execute(text('PRAGMA page_count')).scalar(),
+                'page_size': page_size,
+                'free_pages': db.session.execute(text('PRAGMA freelist_count')).scalar(),
+                'auto_vacuum': db.session.execute(text('PRAGMA auto_vacuum')).scalar(),
+                'journal_mode': db.session.execute(text('PRAGMA journal_mode')).scalar()
+            })
+
+        return stats
+
+
+# 全局服務實例
+retention_service = HistoryRetentionService()
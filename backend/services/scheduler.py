@@ -0,0 +1,264 @@
+"""
+Job Scheduler - 背景排程服務
+Timer-driven scheduler (heapq + Condition) hosting the daily reset and periodic maintenance
+"""
+
+import os
+import time
+import heapq
+import itertools
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+
+def next_local_midnight(now: datetime = None) -> datetime:
+    """下一個本地日期邊界"""
+    now = now or datetime.now()
+    return datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+
+
+class ScheduledJob:
+    """排程工作 - 固定間隔或由 next_run 函數決定下次執行時間"""
+    
+    def __init__(self, name: str, func: Callable, interval: Optional[float] = None,
+                 next_run: Optional[Callable[[datetime], datetime]] = None,
+                 first_delay: Optional[float] = None, run_at_start: bool = False):
+        if interval is None and next_run is None:
+            raise ValueError(f'Job {name} requires interval or next_run')
+        
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run_func = next_run
+        self.first_delay = first_delay
+        self.run_at_start = run_at_start
+        
+        self.due: Optional[float] = None          # 下次執行時間 (epoch 秒)
+        self.running = False
+        self.run_count = 0
+        self.error_count = 0
+        self.last_run: Optional[datetime] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_result = None
+        self.last_error: Optional[str] = None
+    
+    def first_due(self, now: float) -> float:
+        """啟動後的第一次執行時間"""
+        if self.run_at_start:
+            return now
+        if self.first_delay is not None:
+            return now + self.first_delay
+        return self.following_due(now)
+    
+    def following_due(self, now: float) -> float:
+        """下一次執行時間"""
+        if self.next_run_func is not None:
+            return self.next_run_func(datetime.fromtimestamp(now)).timestamp()
+        return now + self.interval
+    
+    def to_dict(self) -> Dict:
+        """轉換為字典格式"""
+        return {
+            'name': self.name,
+            'interval_seconds': self.interval,
+            'next_run': datetime.fromtimestamp(self.due).isoformat() if self.due else None,
+            'running': self.running,
+            'run_count': self.run_count,
+            'error_count': self.error_count,
+            'last_run': self.last_run.isoformat() if self.last_run else None,
+            'last_duration_ms': self.last_duration_ms,
+            'last_result': self.last_result,
+            'last_error': self.last_error
+        }
+
+
+class JobScheduler:
+    """
+    背景排程器
+    
+    所有工作依下次執行時間存放於最小堆，單一背景執行緒等待最早到期的工作，
+    新增或手動觸發工作時以 Condition 喚醒。
+    """
+    
+    # 最長等待時間 (秒)，系統時間被調整時仍能及時重新計算
+    MAX_WAIT = 60.0
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.app = None
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+    
+    @property
+    def running(self) -> bool:
+        return self._running
+    
+    def add_job(self, name: str, func: Callable, **options) -> ScheduledJob:
+        """註冊工作 (同名工作會被取代)"""
+        job = ScheduledJob(name, func, **options)
+        with self._condition:
+            self._jobs[name] = job
+            if self._running:
+                self._push(job, job.first_due(time.time()))
+                self._condition.notify()
+        return job
+    
+    def _push(self, job: ScheduledJob, due: float):
+        """排入堆中 (舊的堆項目在取出時依 due 比對後捨棄)"""
+        job.due = due
+        heapq.heappush(self._heap, (due, next(self._sequence), job.name))
+    
+    def start(self, app=None) -> bool:
+        """啟動背景執行緒"""
+        with self._condition:
+            if self._running:
+                return False
+            self.app = app or self.app
+            now = time.time()
+            self._heap = []
+            for job in self._jobs.values():
+                self._push(job, job.first_due(now))
+            self._running = True
+        
+        self._thread = threading.Thread(target=self._loop, name='job-scheduler', daemon=True)
+        self._thread.start()
+        self.logger.info(f"排程器已啟動: {', '.join(self._jobs) or '無工作'}")
+        return True
+    
+    def stop(self, timeout: float = 5.0):
+        """停止背景執行緒"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def run_now(self, name: str) -> bool:
+        """將工作提前到現在執行"""
+        with self._condition:
+            job = self._jobs.get(name)
+            if job is None or not self._running:
+                return False
+            self._push(job, time.time())
+            self._condition.notify()
+        return True
+    
+    def _next_due_job(self) -> Optional[ScheduledJob]:
+        """等待並取出下一個到期的工作 (停止時返回 None)"""
+        with self._condition:
+            while self._running:
+                if not self._heap:
+                    self._condition.wait(self.MAX_WAIT)
+                    continue
+                
+                due, _, name = self._heap[0]
+                job = self._jobs.get(name)
+                if job is None or job.due != due:
+                    heapq.heappop(self._heap)
+                    continue
+                
+                delay = due - time.time()
+                if delay > 0:
+                    self._condition.wait(min(delay, self.MAX_WAIT))
+                    continue
+                
+                heapq.heappop(self._heap)
+                job.due = None
+                job.running = True
+                return job
+        return None
+    
+    def _loop(self):
+        """背景執行緒主迴圈"""
+        while True:
+            job = self._next_due_job()
+            if job is None:
+                return
+            self._execute(job)
+            with self._condition:
+                job.running = False
+                if self._running and job.due is None:
+                    self._push(job, job.following_due(time.time()))
+    
+    def _execute(self, job: ScheduledJob):
+        """在應用上下文中執行工作，錯誤只記錄不中斷排程"""
+        started = time.perf_counter()
+        job.last_run = datetime.now()
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    job.last_result = job.func()
+            else:
+                job.last_result = job.func()
+            job.last_error = None
+        except Exception as e:
+            job.error_count += 1
+            job.last_error = str(e)
+            self.logger.error(f"排程工作失敗 - {job.name}: {e}")
+        finally:
+            job.run_count += 1
+            job.last_duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    
+    def get_jobs(self) -> List[Dict]:
+        """獲取所有工作狀態"""
+        with self._condition:
+            return [job.to_dict() for job in sorted(self._jobs.values(), key=lambda j: j.due or float('inf'))]
+
+
+# 全局排程器實例
+job_scheduler = JobScheduler()
+
+
+def init_scheduler(app):
+    """註冊內建工作 (不啟動執行緒，由 start_scheduler 在服務進程中啟動)"""
+    from .meter_service import meter_service
+    from .retention_service import retention_service
+    from .fleet_totals import fleet_totals
+    from .system_metrics import system_metrics
+    from .log_reader import log_reader
+    
+    job_scheduler.app = app
+    
+    # 每日用電量重置: 本地日期邊界執行，啟動時補做一次 (停機跨日)
+    job_scheduler.add_job('daily_reset', meter_service.run_daily_reset,
+                          next_run=next_local_midnight, run_at_start=True)
+    
+    # 歷史數據彙總與清理
+    interval = app.config.get('SCHEDULER_MAINTENANCE_INTERVAL', 3600)
+    job_scheduler.add_job('history_maintenance', retention_service.run_maintenance,
+                          interval=interval, first_delay=min(interval, 300))
+    
+    # 全系統累計與資料庫重新同步 (其他進程寫入的讀數)
+    job_scheduler.add_job('fleet_totals_resync', fleet_totals.resync,
+                          interval=app.config.get('FLEET_TOTALS_RESYNC_INTERVAL', 900))
+    
+    # 系統資源取樣 (狀態端點直接返回最新樣本)
+    system_metrics.configure(app)
+    job_scheduler.add_job('system_metrics', system_metrics.sample,
+                          interval=system_metrics.interval, run_at_start=True)
+    
+    # 日誌索引增量更新 (查詢時只需處理少量新增內容)
+    log_file = app.config.get('LOG_FILE')
+    if log_file:
+        job_scheduler.add_job('log_index', lambda: log_reader.build_index(log_file),
+                              interval=app.config.get('LOG_INDEX_INTERVAL', 300), first_delay=60)
+
+
+def start_scheduler(app, use_reloader: bool = False) -> bool:
+    """
+    啟動排程器
+    
+    使用 Werkzeug reloader 時只在實際服務的子進程啟動，避免監控進程重複執行工作。
+    """
+    if not app.config.get('SCHEDULER_ENABLED', True):
+        return False
+    if use_reloader and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        return False
+    return job_scheduler.start(app)
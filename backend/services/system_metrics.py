@@ -0,0 +1,159 @@
+"""
+System Metrics - 系統資源取樣
+Samples CPU, memory, disk and process metrics in the background so status
+endpoints return the latest sample without blocking
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+import psutil
+
+
+class SystemMetricsSampler:
+    """
+    系統資源取樣器
+    
+    cpu_percent 以 interval=None 呼叫，計算的是與上一次取樣之間的平均值，
+    不會阻塞。由排程器定期呼叫 sample()；排程器未啟動時，讀取端在樣本過期後
+    自行補取一次。
+    """
+    
+    def __init__(self, interval: float = 5.0, history_size: int = 120, disk_path: str = '/'):
+        self.logger = logging.getLogger(__name__)
+        self.interval = interval
+        self.disk_path = disk_path
+        self._history = deque(maxlen=history_size)
+        self._latest: Optional[Dict] = None
+        self._sampled_at = 0.0
+        self._lock = threading.Lock()
+        self._process = psutil.Process(os.getpid())
+        self.started_at = datetime.fromtimestamp(self._process.create_time())
+        
+        # 建立 CPU 計算基準 (第一次呼叫固定返回 0)
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+    
+    def configure(self, app):
+        """套用應用配置"""
+        self.interval = app.config.get('SYSTEM_METRICS_INTERVAL', self.interval)
+        self.disk_path = app.config.get('SYSTEM_METRICS_DISK_PATH', self.disk_path)
+        history_size = app.config.get('SYSTEM_METRICS_HISTORY', self._history.maxlen)
+        if history_size != self._history.maxlen:
+            with self._lock:
+                self._history = deque(self._history, maxlen=history_size)
+    
+    # ------------------------------------------------------------------
+    # 取樣 / Sampling
+    # ------------------------------------------------------------------
+    def sample(self) -> Dict:
+        """取樣一次並保存為最新樣本"""
+        now = datetime.now()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        process = self._process
+        
+        with process.oneshot():
+            process_memory = process.memory_info()
+            process_data = {
+                'pid': process.pid,
+                'cpu_percent': process.cpu_percent(interval=None),
+                'memory_rss': process_memory.rss,
+                'memory_percent': round(process.memory_percent(), 2),
+                'threads': process.num_threads(),
+                'open_files': self._count_open_files(process)
+            }
+        
+        data = {
+            'cpu_percent': psutil.cpu_percent(interval=None),
+            'cpu_count': psutil.cpu_count(),
+            'load_average': self._load_average(),
+            'memory': {
+                'total': memory.total,
+                'available': memory.available,
+                'percent': memory.percent,
+                'used': memory.used
+            },
+            'disk': {
+                'total': disk.total,
+                'free': disk.free,
+                'used': disk.used,
+                'percent': disk.percent
+            },
+            'process': process_data,
+            'sampled_at': now.isoformat()
+        }
+        
+        with self._lock:
+            self._latest = data
+            self._sampled_at = time.monotonic()
+            self._history.append((data['cpu_percent'], memory.percent, process_data['cpu_percent']))
+        return data
+    
+    @staticmethod
+    def _count_open_files(process) -> Optional[int]:
+        """開啟的檔案數 (Windows 無 num_fds)"""
+        try:
+            if hasattr(process, 'num_fds'):
+                return process.num_fds()
+            return process.num_handles()
+        except (psutil.Error, AttributeError):
+            return None
+    
+    @staticmethod
+    def _load_average() -> Optional[list]:
+        """系統負載 (Windows 上 psutil 以模擬方式提供，不可用時返回 None)"""
+        try:
+            return [round(value, 2) for value in psutil.getloadavg()]
+        except (OSError, AttributeError):
+            return None
+    
+    # ------------------------------------------------------------------
+    # 查詢 / Lookups
+    # ------------------------------------------------------------------
+    def get_latest(self) -> Dict:
+        """獲取最新樣本 (過期超過兩個取樣間隔時補取，不阻塞)"""
+        with self._lock:
+            latest = self._latest
+            stale = time.monotonic() - self._sampled_at > self.interval * 2
+        if latest is None or stale:
+            latest = self.sample()
+        return latest
+    
+    def get_rolling(self) -> Dict:
+        """近期樣本的平均與峰值"""
+        with self._lock:
+            history = list(self._history)
+        if not history:
+            return {'samples': 0}
+        
+        cpu, memory, process_cpu = zip(*history)
+        return {
+            'samples': len(history),
+            'window_seconds': round(len(history) * self.interval),
+            'cpu_percent_avg': round(sum(cpu) / len(cpu), 1),
+            'cpu_percent_max': max(cpu),
+            'memory_percent_avg': round(sum(memory) / len(memory), 1),
+            'process_cpu_percent_avg': round(sum(process_cpu) / len(process_cpu), 1)
+        }
+    
+    def get_uptime(self) -> Dict:
+        """應用與主機的運行時間"""
+        now = datetime.now()
+        boot_time = datetime.fromtimestamp(psutil.boot_time())
+        return {
+            'started': self.started_at.isoformat(),
+            'current': now.isoformat(),
+            'seconds': int((now - self.started_at).total_seconds()),
+            'system_boot': boot_time.isoformat(),
+            'system_seconds': int((now - boot_time).total_seconds())
+        }
+
+
+# 全局服務實例
+system_metrics = SystemMetricsSampler()
@@ -0,0 +1,380 @@
+"""
+Tariff Engine - 分時電價與累進計費引擎
+Prices hourly energy buckets for all meters in one vectorised pass
+"""
+
+import json
+import time
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, func, select
+
+from ..database import db, MeterHistory, MeterHistoryHourly, SystemConfig, read_session
+from ..database.config_cache import config_cache
+from .counter_normalizer import counter_normalizer, utc_epoch
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+def _parse_hour(value: str) -> int:
+    """解析 'HH:MM' 或 'HH:MM:SS'，返回小時 (24 表示當日結束)"""
+    parts = [int(part) for part in str(value).split(':')]
+    hour = parts[0]
+    if not 0 <= hour <= 24 or any(parts[1:]):
+        raise ValueError(f'時段邊界必須為整點: {value}')
+    return hour
+
+
+class CompiledTariff:
+    """
+    已編譯的電價表
+    
+    - bands: 分時電價，每個時段 start/end 為整點 (end 不含，end < start 表示跨日)，
+      可用 days 限定星期 (0=週一)
+    - tiers: 累進加價，依計費期間內每支電表的總用電量分段，
+      每段 surcharge 加在落入該段的度數上
+    - 價格以 7x24 (星期 x 小時) 查表，計算時只做陣列索引
+    """
+    
+    def __init__(self, tariff: Dict):
+        self.source = tariff
+        self.name = tariff.get('name', 'custom')
+        self.default_price = float(tariff.get('default_price', 4.0))
+        
+        # 星期 x 小時 價格表 / Weekday x hour price table
+        self.price_table = [[self.default_price] * 24 for _ in range(7)]
+        self.band_table = [['default'] * 24 for _ in range(7)]
+        for band in tariff.get('bands', []):
+            price = float(band['price'])
+            start = _parse_hour(band['start'])
+            end = _parse_hour(band['end'])
+            hours = list(range(start, end)) if start < end else list(range(start, 24)) + list(range(0, end))
+            days = [int(day) for day in band.get('days', range(7))]
+            if any(not 0 <= day <= 6 for day in days):
+                raise ValueError(f'星期必須為 0-6 (0=週一): {band.get("days")}')
+            for weekday in days:
+                for hour in hours:
+                    self.price_table[weekday][hour] = price
+                    self.band_table[weekday][hour] = band.get('name', 'band')
+        
+        # 累進級距 (上限遞增，最後一級可為 None 表示無上限)
+        self.tier_bounds = []
+        self.tier_surcharges = []
+        lower = 0.0
+        for tier in tariff.get('tiers', []):
+            upper = tier.get('up_to')
+            upper = float('inf') if upper is None else float(upper)
+            if upper <= lower:
+                raise ValueError('累進級距上限必須遞增')
+            self.tier_bounds.append((lower, upper))
+            self.tier_surcharges.append(float(tier.get('surcharge', 0.0)))
+            lower = upper
+        
+        if HAS_NUMPY:
+            self.price_array = np.array(self.price_table, dtype=np.float64)
+            self.tier_lower = np.array([bound[0] for bound in self.tier_bounds], dtype=np.float64)
+            self.tier_upper = np.array([bound[1] for bound in self.tier_bounds], dtype=np.float64)
+            self.tier_surcharge_array = np.array(self.tier_surcharges, dtype=np.float64)
+    
+    def price_at(self, local_time: datetime) -> float:
+        """指定本地時間的分時單價 (不含累進加價)"""
+        return self.price_table[local_time.weekday()][local_time.hour]
+    
+    def to_dict(self) -> Dict:
+        """轉換為字典格式"""
+        return dict(self.source)
+
+
+class TariffEngine:
+    """電價引擎 - 一次向量化計算所有電表在任意期間的電費"""
+    
+    CONFIG_KEY = 'tariff'
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+    
+    def _config(self, key: str, default):
+        """讀取應用程式配置 (無應用上下文時使用預設值)"""
+        try:
+            from flask import current_app
+            return current_app.config.get(key, default)
+        except RuntimeError:
+            return default
+    
+    # ------------------------------------------------------------------
+    # 電價設定 / Tariff configuration
+    # ------------------------------------------------------------------
+    def _build_tariff(self) -> CompiledTariff:
+        """編譯電價表 - 未設定時以目前單價建立單一費率"""
+        tariff_json = SystemConfig.get_value(self.CONFIG_KEY)
+        if tariff_json:
+            return CompiledTariff(json.loads(tariff_json))
+        
+        tariff = dict(self._config('DEFAULT_TARIFF', {}) or {})
+        tariff.setdefault('name', 'flat')
+        tariff['default_price'] = float(SystemConfig.get_value('unit_price', tariff.get('default_price', 4.0)))
+        return CompiledTariff(tariff)
+    
+    def get_tariff(self) -> CompiledTariff:
+        """獲取已編譯的電價表 (配置變更後才重新編譯)"""
+        try:
+            return config_cache.get_derived('tariff', self._build_tariff)
+        except Exception as e:
+            self.logger.error(f"電價表載入失敗，使用預設單價: {e}")
+            return CompiledTariff({'name': 'fallback', 'default_price': 4.0})
+    
+    def get_base_price(self) -> float:
+        """基本單價 (非分時時段的單價)"""
+        return self.get_tariff().default_price
+    
+    def set_tariff(self, tariff: Dict) -> CompiledTariff:
+        """驗證並保存電價表，ValueError 表示格式錯誤"""
+        try:
+            compiled = CompiledTariff(tariff)
+        except (KeyError, TypeError) as e:
+            raise ValueError(f'電價表格式錯誤: {e}') from e
+        
+        SystemConfig.set_value(self.CONFIG_KEY, json.dumps(tariff), '分時電價與累進計費設定')
+        SystemConfig.set_value('unit_price', str(compiled.default_price), '電費單價 (元/度)')
+        return compiled
+    
+    # ------------------------------------------------------------------
+    # 每小時用電量 / Hourly energy buckets
+    # ------------------------------------------------------------------
+    def load_hourly_energy(self, start: datetime, end: datetime,
+                           meter_ids: Optional[List[int]] = None):
+        """
+        讀取期間內每支電表每小時用電量
+        
+        已彙總的小時取自 meter_history_hourly，彙總水位之後的小時直接從原始記錄計算
+        (與彙總相同的逐筆增量規則)。小時以 UTC epoch 小時數 (整數) 表示，彙總部分由
+        SQLite 直接計算，避免逐列解析時間。
+        
+        僅支援 SQLite: epoch 小時以 strftime('%s', ...) 計算，其他資料庫需改寫此查詢。
+        
+        Returns:
+            (meter_ids, epoch_hours, energy_used) 三個等長序列
+        """
+        from .retention_service import retention_service
+        
+        watermark = retention_service.get_rollup_watermark()
+        rollup_end = min(max(watermark or start, start), end)
+        
+        def epoch_hour(column):
+            return db.cast(db.cast(func.strftime('%s', column), db.Integer) / 3600, db.Integer)
+        
+        rows = []
+        with read_session() as session:
+            if rollup_end > start:
+                query = (
+                    select(MeterHistoryHourly.meter_id, epoch_hour(MeterHistoryHourly.hour_start),
+                           func.coalesce(MeterHistoryHourly.energy_used, 0.0))
+                    .where(MeterHistoryHourly.hour_start >= start, MeterHistoryHourly.hour_start < rollup_end)
+                )
+                if meter_ids:
+                    query = query.where(MeterHistoryHourly.meter_id.in_(meter_ids))
+                rows.extend(session.execute(query).tuples())
+            
+            if end > rollup_end:
+                rows.extend(self._raw_hourly_energy(session, watermark, rollup_end, end, meter_ids))
+        
+        if not rows:
+            return [], [], []
+        meters, hours, energy = zip(*rows)
+        return meters, hours, energy
+    
+    def _raw_hourly_energy(self, session, watermark: Optional[datetime], count_from: datetime, end: datetime,
+                           meter_ids: Optional[List[int]] = None) -> List[tuple]:
+        """
+        尚未彙總的原始記錄: 以 counter_normalizer 規則計算逐筆增量並計入讀數所在的小時
+        
+        讀數自彙總水位起讀取 (只計入 count_from 之後的增量)，基準取最後一個小時彙總的
+        末筆讀數；尚無彙總時取 count_from 之前的最後一筆原始讀數。
+        """
+        from .retention_service import retention_service
+        
+        if watermark is not None and watermark <= count_from:
+            since = watermark
+            carry = retention_service.last_rollup_readings(watermark)
+        else:
+            since = count_from
+            latest = select(
+                MeterHistory.meter_id, func.max(MeterHistory.recorded_at).label('recorded_at')
+            ).where(MeterHistory.recorded_at < count_from).group_by(MeterHistory.meter_id)
+            if meter_ids:
+                latest = latest.where(MeterHistory.meter_id.in_(meter_ids))
+            latest = latest.subquery()
+            carry = {
+                meter_id: (energy, utc_epoch(recorded_at))
+                for meter_id, energy, recorded_at in session.execute(
+                    select(MeterHistory.meter_id, MeterHistory.energy, MeterHistory.recorded_at)
+                    .join(latest, and_(MeterHistory.meter_id == latest.c.meter_id,
+                                       MeterHistory.recorded_at == latest.c.recorded_at))
+                )
+            }
+        
+        query = (
+            select(MeterHistory.meter_id, MeterHistory.recorded_at, MeterHistory.energy)
+            .where(MeterHistory.recorded_at >= since, MeterHistory.recorded_at < end)
+            .order_by(MeterHistory.meter_id, MeterHistory.recorded_at)
+        )
+        if meter_ids:
+            query = query.where(MeterHistory.meter_id.in_(meter_ids))
+        
+        buckets: Dict[tuple, float] = {}
+        count_from_epoch = utc_epoch(count_from)
+        
+        def flush(meter_id, energies, times):
+            deltas = counter_normalizer.series_deltas(energies, times, *carry.get(meter_id, (None, None)))
+            for at, delta in zip(times, deltas):
+                if at >= count_from_epoch and delta:
+                    key = (meter_id, int(at // 3600))
+                    buckets[key] = buckets.get(key, 0.0) + delta
+        
+        current_meter, energies, times = None, [], []
+        for meter_id, recorded_at, energy in session.execute(query):
+            if meter_id != current_meter:
+                if current_meter is not None:
+                    flush(current_meter, energies, times)
+                current_meter, energies, times = meter_id, [], []
+            energies.append(energy)
+            times.append(utc_epoch(recorded_at))
+        if current_meter is not None:
+            flush(current_meter, energies, times)
+        
+        return [(meter_id, hour, energy) for (meter_id, hour), energy in buckets.items()]
+    
+    def _local_slot(self, epoch_hour: int):
+        """UTC epoch 小時轉換為本地 (星期, 小時)"""
+        local = datetime.fromtimestamp(int(epoch_hour) * 3600)
+        return local.weekday(), local.hour
+    
+    # ------------------------------------------------------------------
+    # 計價 / Pricing
+    # ------------------------------------------------------------------
+    def price_buckets(self, meters: List[int], hours: List[int], energy: List[float],
+                      tariff: Optional[CompiledTariff] = None) -> Dict[int, Dict]:
+        """
+        計算每支電表的電費
+        
+        Returns:
+            Dict[int, Dict]: meter_id -> energy_kwh, energy_cost, tier_surcharge, total_cost
+        """
+        tariff = tariff or self.get_tariff()
+        if not meters:
+            return {}
+        
+        if HAS_NUMPY:
+            return self._price_numpy(tariff, meters, hours, energy)
+        return self._price_python(tariff, meters, hours, energy)
+    
+    def _price_numpy(self, tariff: CompiledTariff, meters, hours, energy) -> Dict[int, Dict]:
+        """NumPy 向量化計算"""
+        meter_array = np.asarray(meters, dtype=np.int64)
+        energy_array = np.asarray(energy, dtype=np.float64)
+        hour_array = np.asarray(hours, dtype=np.int64)
+        
+        # 電表 ID 與小時各自對應到索引 (時區換算只對不重複的小時做一次)
+        meter_ids, meter_index = np.unique(meter_array, return_inverse=True)
+        unique_hours, hour_index = np.unique(hour_array, return_inverse=True)
+        slots = np.array([self._local_slot(hour) for hour in unique_hours], dtype=np.int64).reshape(-1, 2)
+        
+        # 分時單價查表
+        prices = tariff.price_array[slots[:, 0], slots[:, 1]][hour_index]
+        energy_totals = np.bincount(meter_index, weights=energy_array, minlength=len(meter_ids))
+        energy_costs = np.bincount(meter_index, weights=energy_array * prices, minlength=len(meter_ids))
+        
+        # 累進加價: (電表 x 級距) 一次廣播計算每級的度數
+        if len(tariff.tier_surcharges):
+            in_tier = np.clip(energy_totals[:, None], tariff.tier_lower, tariff.tier_upper) - tariff.tier_lower
+            surcharges = in_tier @ tariff.tier_surcharge_array
+        else:
+            surcharges = np.zeros(len(meter_ids))
+        
+        return {
+            int(meter_id): {
+                'energy_kwh': round(float(total), 3),
+                'energy_cost': round(float(cost), 2),
+                'tier_surcharge': round(float(surcharge), 2),
+                'total_cost': round(float(cost + surcharge), 2)
+            }
+            for meter_id, total, cost, surcharge in zip(meter_ids, energy_totals, energy_costs, surcharges)
+        }
+    
+    def _price_python(self, tariff: CompiledTariff, meters, hours, energy) -> Dict[int, Dict]:
+        """純 Python 計算 (未安裝 NumPy 時使用)"""
+        slots = {}
+        totals: Dict[int, List[float]] = {}
+        for meter_id, hour, kwh in zip(meters, hours, energy):
+            slot = slots.get(hour)
+            if slot is None:
+                slot = slots[hour] = self._local_slot(hour)
+            entry = totals.setdefault(meter_id, [0.0, 0.0])
+            entry[0] += kwh
+            entry[1] += kwh * tariff.price_table[slot[0]][slot[1]]
+        
+        results = {}
+        for meter_id, (total, cost) in sorted(totals.items()):
+            surcharge = sum(
+                (min(max(total, lower), upper) - lower) * rate
+                for (lower, upper), rate in zip(tariff.tier_bounds, tariff.tier_surcharges)
+            )
+            results[meter_id] = {
+                'energy_kwh': round(total, 3),
+                'energy_cost': round(cost, 2),
+                'tier_surcharge': round(surcharge, 2),
+                'total_cost': round(cost + surcharge, 2)
+            }
+        return results
+    
+    def compute_costs(self, start: datetime, end: datetime, meter_ids: Optional[List[int]] = None,
+                      tariff: Optional[Dict] = None) -> Dict:
+        """
+        計算期間內所有電表的電費 (UTC 時間)
+        
+        Args:
+            start, end: 計費期間 (含 start 不含 end)
+            meter_ids: 指定電表，None 表示全部
+            tariff: 試算用電價表，None 表示使用目前設定
+        """
+        started = time.perf_counter()
+        compiled = CompiledTariff(tariff) if tariff else self.get_tariff()
+        
+        meters, hours, energy = self.load_hourly_energy(start, end, meter_ids)
+        loaded = time.perf_counter()
+        per_meter = self.price_buckets(meters, hours, energy, compiled)
+        priced = time.perf_counter()
+        
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'tariff': compiled.name,
+            'engine': 'numpy' if HAS_NUMPY else 'python',
+            'bucket_count': len(meters),
+            'meters': [{'meter_id': meter_id, **values} for meter_id, values in per_meter.items()],
+            'total_energy_kwh': round(sum(values['energy_kwh'] for values in per_meter.values()), 3),
+            'total_cost': round(sum(values['total_cost'] for values in per_meter.values()), 2),
+            'load_ms': round((loaded - started) * 1000, 2),
+            'pricing_ms': round((priced - loaded) * 1000, 2)
+        }
+    
+    def compute_month(self, year: int, month: int, meter_ids: Optional[List[int]] = None,
+                      tariff: Optional[Dict] = None) -> Dict:
+        """計算指定月份 (本地時間) 的電費"""
+        from .billing_engine import local_to_utc
+        
+        start = datetime(year, month, 1)
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+        result = self.compute_costs(local_to_utc(start), local_to_utc(end), meter_ids, tariff)
+        result['month'] = f'{year:04d}-{month:02d}'
+        return result
+
+
+# 全局服務實例
+tariff_engine = TariffEngine()
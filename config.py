@@ -32,11 +32,25 @@ class Config:
         'pool_recycle': 300,
     }
     
+    # SQLite 儲存設定 / SQLite storage profile (每條連線建立時套用)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',           # 讀寫互不阻擋
+        'synchronous': 'NORMAL',         # WAL 下安全且減少 fsync
+        'mmap_size': 268435456,          # 256MB 記憶體映射
+        'cache_size': -65536,            # 64MB 頁面快取 (負數單位為 KiB)
+        'busy_timeout': 5000,            # 鎖定時等待 (毫秒)
+        'temp_store': 'MEMORY'
+    }
+    SQLITE_READER_ENABLED = True         # 唯讀端點使用獨立讀取引擎
+    SQLITE_READER_POOL_SIZE = 5
+    SQLITE_READER_MAX_OVERFLOW = 10
+    
     # Socket.IO 設定 / Socket.IO settings
     SOCKETIO_ASYNC_MODE = 'threading'
     SOCKETIO_CORS_ALLOWED_ORIGINS = "*"
     SOCKETIO_LOGGER = True
     SOCKETIO_ENGINEIO_LOGGER = True
+    METER_SWEEP_COALESCE_WINDOW = 1.0    # 全電表請求合併時間窗 (秒)，窗內請求共用一次掃描
     
     # CORS 設定 / CORS settings
     CORS_ORIGINS = ["http://localhost:5000", "http://127.0.0.1:5000"]
@@ -66,6 +80,7 @@ class Config:
     RTU_STOPBITS = int(os.environ.get('RTU_STOPBITS', 1))
     RTU_TIMEOUT = float(os.environ.get('RTU_TIMEOUT', 1.0))
     RTU_CACHE_EXPIRY = int(os.environ.get('RTU_CACHE_EXPIRY', 5))
+    RTU_TRACE_CAPACITY = 4096            # MODBUS 交易追蹤環形緩衝區容量 (筆)
     
     # RTU 模擬器地址設定 (TCP 模式)
     RTU_SIMULATOR_HOST = os.environ.get('RTU_SIMULATOR_HOST', '127.0.0.1')
@@ -85,6 +100,13 @@ class Config:
     DEFAULT_POWER_RANGE = (0, 15000)     # W
     DEFAULT_UNIT_PRICE = 4               # 元/度
     
+    # 預設電價表 / Default tariff (未設定分時時段時即為單一費率，單價取自 unit_price)
+    DEFAULT_TARIFF = {
+        'name': 'flat',
+        'bands': [],   # 分時時段，例: {'name': 'peak', 'start': '09:00', 'end': '22:00', 'price': 5.5, 'days': [0, 1, 2, 3, 4]}
+        'tiers': []    # 累進級距，例: {'up_to': 120, 'surcharge': 0.0}, {'up_to': None, 'surcharge': 1.2}
+    }
+    
     # 供電時段預設值 / Default power schedule
     DEFAULT_POWER_SCHEDULE = {
         'open_power': {
@@ -97,6 +119,34 @@ class Config:
         }
     }
     
+    # 系統配置快取設定 / SystemConfig cache settings
+    CONFIG_CACHE_CHECK_INTERVAL = 2.0    # 檢查其他進程配置變更的間隔 (秒)
+    
+    # 歷史數據保留設定 / History retention settings
+    HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', 90))  # 原始記錄保留天數
+    HISTORY_PURGE_BATCH_SIZE = 5000      # 每批刪除筆數
+    HISTORY_PURGE_MAX_BATCHES = 200      # 單次清理最多批次
+    HISTORY_ROLLUP_CHUNK_HOURS = 24      # 每次彙總處理的小時數
+    HISTORY_VACUUM_PAGES = 2000          # 每次增量回收的頁數
+    HISTORY_EXPORT_BATCH_SIZE = 5000     # 導出時每批讀取筆數
+    HISTORY_PAGE_DEFAULT_LIMIT = 500     # 歷史分頁預設每頁筆數
+    HISTORY_PAGE_MAX_LIMIT = 5000        # 歷史分頁每頁筆數上限
+    
+    # 電能計數器檢查 / Energy counter integrity
+    ENERGY_COUNTER_MAX = 999999.9        # 電表累積電能計數器上限 (超過後回捲)
+    COUNTER_RATED_POWER_KW = 22.0        # 單一電表額定功率 (判定異常跳動用)
+    COUNTER_JUMP_TOLERANCE = 1.5         # 容許超過額定功率的倍數
+    COUNTER_JUMP_SLACK_KWH = 0.5         # 固定容許量 (讀數取整誤差)
+    
+    
+    # 背景排程設定 / Background scheduler settings
+    SCHEDULER_ENABLED = True             # 啟用背景排程 (每日重置、歷史維護)
+    SCHEDULER_MAINTENANCE_INTERVAL = 3600  # 歷史維護執行間隔 (秒)
+    FLEET_TOTALS_RESYNC_INTERVAL = 900   # 全系統累計與資料庫重新同步間隔 (秒)
+    SYSTEM_METRICS_INTERVAL = 5          # 系統資源取樣間隔 (秒)
+    SYSTEM_METRICS_HISTORY = 120         # 保留的取樣數 (平均與峰值)
+    SYSTEM_METRICS_DISK_PATH = '/'       # 磁碟使用量統計的路徑
+    
     # 模擬模式配置 / Simulation mode configuration
     USE_POWER_SCHEDULE_IN_SIMULATION = True  # 模擬模式是否遵循供電時段
     FORCE_SIMULATION = os.environ.get('FORCE_SIMULATION', 'True').lower() == 'true'
@@ -113,6 +163,14 @@ class Config:
     # 日誌設定 / Logging settings
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
     LOG_FILE = DATA_DIR / 'logs' / 'power_meter_web.log'
+    LOG_INDEX_INTERVAL = 300             # 日誌查詢索引的增量更新間隔 (秒)
+    METRICS_ENABLED = True               # 提供 /metrics (Prometheus 文字格式)
+    
+    # 取樣式效能分析 / Sampling profiler (可由 PUT /api/system/profile 於執行期間切換)
+    PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'False').lower() == 'true'
+    PROFILER_SAMPLE_RATE = 0.1           # 被分析的 HTTP 請求與 Socket.IO 事件比例 (0-1)
+    PROFILER_INTERVAL = 0.005            # 堆疊取樣間隔 (秒)
+    PROFILER_MAX_STACKS = 20000          # 保留的不同堆疊數上限
     
     # 創建日誌目錄 / Create log directory
     LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -196,6 +254,9 @@ class TestingConfig(Config):
     # 加速測試的更新間隔
     REAL_TIME_UPDATE_INTERVAL = 0.1
     DATABASE_SAVE_INTERVAL = 1.0
+    
+    # 測試時不啟動背景排程
+    SCHEDULER_ENABLED = False
 
 
 # 配置字典 / Configuration dictionary
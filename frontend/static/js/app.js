@@ -120,6 +120,12 @@ class PowerMeterApp {
                 this.showNotification(data.message, 'success');
             });
             
+            // 監聽批量電表配置變更廣播
+            this.socket.on('meters_updated', (data) => {
+                this.showNotification(data.message, 'info');
+                this.refreshAllData();
+            });
+            
             // 監聽供電時段變更廣播
             this.socket.on('power_schedule_changed', (data) => {
                 console.log('Power schedule changed:', data);
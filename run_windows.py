@@ -64,6 +64,10 @@ if __name__ == '__main__':
         print("⚡ 系統準備就緒！按 Ctrl+C 停止服務")
         print("=" * 60)
         
+        # 啟動背景排程器 (每日重置、歷史維護)
+        from backend.services import start_scheduler
+        start_scheduler(app)
+        
         # 啟動 Socket.IO 應用程式
         socketio.run(
             app,
@@ -0,0 +1,27 @@
+"""
+Power Meter Web Edition - 效能測試共用統計
+Shared latency statistics for the benchmark and load-test scripts, so every
+report rounds and reports percentiles the same way
+"""
+
+
+def percentile(values, pct):
+    """計算百分位數 (秒 -> 毫秒)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return round(ordered[index] * 1000, 3)
+
+
+def latency_summary(samples):
+    """延遲樣本 (秒) 的統計摘要"""
+    return {
+        'samples': len(samples),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+        'p50_ms': percentile(samples, 50),
+        'p90_ms': percentile(samples, 90),
+        'p95_ms': percentile(samples, 95),
+        'p99_ms': percentile(samples, 99),
+        'max_ms': round(max(samples) * 1000, 3) if samples else 0.0
+    }
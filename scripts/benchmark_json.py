@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Power Meter Web Edition - JSON 序列化基準測試
+Encode time per meter payload for the stdlib encoder used by Flask's default
+provider versus the project's JSON provider (orjson when installed)
+
+用法 / Usage:
+    python scripts/benchmark_json.py --meters 50 --iterations 2000
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend import json_provider
+
+
+def build_payload(meters, native_datetime):
+    """建立與 /api/meters 相同結構的回應 (浮點數為主)"""
+    now = datetime.now()
+    timestamp = now if native_datetime else now.isoformat()
+    data = []
+    for meter_id in range(1, meters + 1):
+        data.append({
+            'id': meter_id,
+            'name': f'RTU電表{meter_id:02d}',
+            'parking': f'RTU-{meter_id:04d}',
+            'status': 'online',
+            'power_on': True,
+            'voltage': round(random.uniform(215, 225), 2),
+            'voltage_l1': round(random.uniform(215, 225), 2),
+            'voltage_l2': round(random.uniform(215, 225), 2),
+            'voltage_l3': round(random.uniform(215, 225), 2),
+            'current': round(random.uniform(0, 40), 2),
+            'current_l1': round(random.uniform(0, 15), 2),
+            'current_l2': round(random.uniform(0, 15), 2),
+            'current_l3': round(random.uniform(0, 15), 2),
+            'power': round(random.uniform(0, 9000), 2),
+            'power_apparent': round(random.uniform(0, 9500), 2),
+            'energy': round(random.uniform(0, 99999), 2),
+            'frequency': round(random.uniform(59.9, 60.1), 2),
+            'power_factor': round(random.uniform(0.85, 1.0), 3),
+            'last_update': timestamp,
+            'error_message': None
+        })
+    return {
+        'success': True,
+        'data': data,
+        'count': len(data),
+        'rtu_enabled': True,
+        'connection_status': {'connected': True, 'port': 'COM3'},
+        'timestamp': timestamp
+    }
+
+
+def measure(encode, payload, iterations):
+    """返回每次編碼的平均與最佳時間 (微秒)"""
+    for _ in range(min(iterations, 100)):
+        encode(payload)
+
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        encode(payload)
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        'mean_us': round(sum(samples) / len(samples) * 1e6, 1),
+        'p50_us': round(samples[len(samples) // 2] * 1e6, 1),
+        'min_us': round(samples[0] * 1e6, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON 序列化基準測試')
+    parser.add_argument('--meters', type=int, default=50, help='每個回應的電表數量')
+    parser.add_argument('--iterations', type=int, default=2000, help='每種編碼器的測試次數')
+    parser.add_argument('--output', help='將結果寫入 JSON 檔案')
+    args = parser.parse_args()
+
+    random.seed(42)
+    legacy_payload = build_payload(args.meters, native_datetime=False)
+    native_payload = build_payload(args.meters, native_datetime=True)
+
+    encoders = [
+        # Flask 預設 provider: 標準庫、sort_keys、ensure_ascii
+        ('stdlib (Flask default)', lambda obj: json.dumps(obj, sort_keys=True, separators=(',', ':')).encode(),
+         legacy_payload),
+        ('json_provider, isoformat strings', json_provider.dumps_bytes, legacy_payload),
+        ('json_provider, native datetime', json_provider.dumps_bytes, native_payload),
+    ]
+
+    backend = 'orjson' if json_provider.HAS_ORJSON else 'stdlib fallback'
+    print(f"🧪 {args.meters} 電表 / payload, {args.iterations} 次, json_provider 使用 {backend}")
+
+    results = []
+    baseline = None
+    for name, encode, payload in encoders:
+        result = measure(encode, payload, args.iterations)
+        result['name'] = name
+        result['bytes'] = len(encode(payload))
+        baseline = baseline or result['mean_us']
+        result['speedup'] = round(baseline / result['mean_us'], 2)
+        results.append(result)
+        print(f"   {name:<34} 平均 {result['mean_us']:>8} µs  p50 {result['p50_us']:>8} µs  "
+              f"{result['bytes']} bytes  x{result['speedup']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'json', 'backend': backend, 'meters': args.meters,
+                       'timestamp': datetime.now().isoformat(), 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"✅ 結果已寫入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Power Meter Web Edition - SQLite 儲存設定基準測試
+Mixed read/write benchmark comparing the default SQLite setup with the tuned storage profile
+
+用法 / Usage:
+    python scripts/benchmark_storage.py --duration 10 --readers 4
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from sqlalchemy import create_engine, insert, select, func, tuple_
+from sqlalchemy.exc import OperationalError
+
+from config import Config
+from backend.database.models import db, Meter, MeterHistory
+from backend.database.storage import register_pragmas
+
+from bench_stats import percentile
+
+
+def create_engines(db_path, profile, readers):
+    """依設定建立寫入與讀取引擎"""
+    url = f'sqlite:///{db_path}'
+    options = {'pool_size': readers + 2, 'max_overflow': 0, 'connect_args': {'check_same_thread': False}}
+    
+    if profile == 'default':
+        # 預設設定: rollback journal，讀寫共用同一個引擎
+        engine = create_engine(url, **options)
+        return engine, engine
+    
+    pragmas = dict(Config.SQLITE_PRAGMAS)
+    writer = create_engine(url, **options)
+    register_pragmas(writer, pragmas)
+    
+    reader = create_engine(url, **options)
+    reader_pragmas = {key: value for key, value in pragmas.items() if key != 'journal_mode'}
+    reader_pragmas['query_only'] = 'ON'
+    register_pragmas(reader, reader_pragmas)
+    return writer, reader
+
+
+def seed_database(engine, meters, seed_rows):
+    """建立資料表並寫入初始歷史數據"""
+    db.metadata.create_all(engine)
+    start = datetime.utcnow() - timedelta(seconds=seed_rows // meters * 60)
+    
+    with engine.begin() as conn:
+        conn.execute(insert(Meter), [
+            {'meter_id': i, 'name': f'RTU電表{i:02d}', 'parking': f'RTU-{i:04d}'}
+            for i in range(1, meters + 1)
+        ])
+        batch = []
+        for i in range(seed_rows):
+            batch.append({
+                'meter_id': i % meters + 1,
+                'voltage': 220.0, 'current': 5.0, 'power': 1000.0, 'energy': i * 0.01,
+                'power_on': True, 'power_status': 'powered',
+                'recorded_at': start + timedelta(seconds=(i // meters) * 60)
+            })
+            if len(batch) >= 10000:
+                conn.execute(insert(MeterHistory), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(MeterHistory), batch)
+
+
+def run_profile(profile, args):
+    """執行單一設定的混合讀寫測試"""
+    tmp_dir = tempfile.mkdtemp(prefix='pm_bench_')
+    db_path = os.path.join(tmp_dir, 'bench.db')
+    writer, reader = create_engines(db_path, profile, args.readers)
+    seed_database(writer, args.meters, args.seed_rows)
+    
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {'write_latency': [], 'read_latency': [], 'write_errors': 0, 'read_errors': 0}
+    
+    def writer_loop():
+        """模擬輪詢寫入: 每次 commit 一輪所有電表"""
+        while not stop.is_set():
+            now = datetime.utcnow()
+            rows = [{
+                'meter_id': meter_id, 'voltage': 220.0, 'current': 5.0, 'power': 1000.0,
+                'energy': random.uniform(0, 1000), 'power_on': True, 'power_status': 'powered',
+                'recorded_at': now
+            } for meter_id in range(1, args.meters + 1)]
+            started = time.perf_counter()
+            try:
+                with writer.begin() as conn:
+                    conn.execute(insert(MeterHistory), rows)
+                with lock:
+                    stats['write_latency'].append(time.perf_counter() - started)
+            except OperationalError:
+                with lock:
+                    stats['write_errors'] += 1
+    
+    def reader_loop():
+        """模擬分析查詢: 分頁讀取與彙總"""
+        while not stop.is_set():
+            meter_id = random.randint(1, args.meters)
+            started = time.perf_counter()
+            try:
+                with reader.connect() as conn:
+                    if random.random() < 0.2:
+                        conn.execute(
+                            select(MeterHistory.meter_id, func.avg(MeterHistory.power), func.max(MeterHistory.energy))
+                            .group_by(MeterHistory.meter_id)
+                        ).all()
+                    else:
+                        conn.execute(
+                            select(MeterHistory.id, MeterHistory.recorded_at, MeterHistory.power, MeterHistory.energy)
+                            .where(MeterHistory.meter_id == meter_id,
+                                   tuple_(MeterHistory.recorded_at, MeterHistory.id) > (datetime(2000, 1, 1), 0))
+                            .order_by(MeterHistory.recorded_at, MeterHistory.id)
+                            .limit(500)
+                        ).all()
+                with lock:
+                    stats['read_latency'].append(time.perf_counter() - started)
+            except OperationalError:
+                with lock:
+                    stats['read_errors'] += 1
+    
+    threads = [threading.Thread(target=writer_loop, daemon=True)]
+    threads += [threading.Thread(target=reader_loop, daemon=True) for _ in range(args.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    
+    writer.dispose()
+    reader.dispose()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    return {
+        'profile': profile,
+        'duration_s': args.duration,
+        'readers': args.readers,
+        'writes': len(stats['write_latency']),
+        'writes_per_s': round(len(stats['write_latency']) / args.duration, 1),
+        'write_p50_ms': percentile(stats['write_latency'], 50),
+        'write_p95_ms': percentile(stats['write_latency'], 95),
+        'write_errors': stats['write_errors'],
+        'reads': len(stats['read_latency']),
+        'reads_per_s': round(len(stats['read_latency']) / args.duration, 1),
+        'read_p50_ms': percentile(stats['read_latency'], 50),
+        'read_p95_ms': percentile(stats['read_latency'], 95),
+        'read_errors': stats['read_errors']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 儲存設定混合讀寫基準測試')
+    parser.add_argument('--duration', type=float, default=10.0, help='每個設定的測試秒數')
+    parser.add_argument('--readers', type=int, default=4, help='讀取執行緒數量')
+    parser.add_argument('--meters', type=int, default=50, help='電表數量')
+    parser.add_argument('--seed-rows', type=int, default=200000, help='初始歷史記錄筆數')
+    parser.add_argument('--profile', choices=['default', 'tuned', 'both'], default='both')
+    parser.add_argument('--output', help='將結果寫入 JSON 檔案')
+    args = parser.parse_args()
+    
+    profiles = ['default', 'tuned'] if args.profile == 'both' else [args.profile]
+    results = []
+    
+    for profile in profiles:
+        print(f"🗄️  測試設定: {profile} ({args.duration}s, {args.readers} readers)...")
+        result = run_profile(profile, args)
+        results.append(result)
+        print(f"   寫入 {result['writes_per_s']}/s (p95 {result['write_p95_ms']} ms, 錯誤 {result['write_errors']})")
+        print(f"   讀取 {result['reads_per_s']}/s (p95 {result['read_p95_ms']} ms, 錯誤 {result['read_errors']})")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'storage', 'timestamp': datetime.now().isoformat(), 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"✅ 結果已寫入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Power Meter Web Edition - 效能基準測試套件
+Offline benchmark suite: register decoding, acquisition against the bundled
+Modbus simulator (backend/modbus/simulator.py), batch persistence, /api/meters latency and
+Socket.IO broadcast latency. Results are written as JSON and can be
+compared with a previous run to spot regressions between releases.
+
+用法 / Usage:
+    python scripts/benchmark_suite.py
+    python scripts/benchmark_suite.py --only decode,api --api-sizes 50,500
+    python scripts/benchmark_suite.py --only acquisition --sim-baud 9600 --sim-latency-ms 10
+    python scripts/benchmark_suite.py --compare benchmarks/suite-1.0.0-web-beta-20250101-120000.json
+
+需要效能測試工具套件 / Requires the benchmark tooling:
+    pip install -r requirements-bench.txt
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from bench_stats import percentile, latency_summary
+
+SECTIONS = ('decode', 'acquisition', 'persistence', 'api', 'socketio')
+
+
+def free_port():
+    """取得一個可用的本機埠"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# ----------------------------------------------------------------------
+# 應用程式載入 / Application loading
+# ----------------------------------------------------------------------
+def prepare_environment(simulator_port):
+    """設定暫存數據庫與本機模擬器 (需在載入 config 之前)"""
+    tmp_dir = tempfile.mkdtemp(prefix='pm_suite_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ.setdefault('FLASK_ENV', 'production')
+    os.environ['MODBUS_MODE'] = 'TCP'
+    os.environ['RTU_SIMULATOR_HOST'] = '127.0.0.1'
+    os.environ['RTU_SIMULATOR_PORT'] = str(simulator_port)
+
+
+def load_app():
+    """載入應用程式並關閉會影響測量的背景功能"""
+    import app as app_module
+    app_module.app.config['SCHEDULER_ENABLED'] = False
+    # 每次掃描都實際讀取，不共用結果
+    app_module.sweep_coalescer.window = 0
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    return app_module
+
+
+def start_server(context):
+    """在背景執行緒啟動 Socket.IO 伺服器 (只啟動一次)，返回埠號"""
+    if 'server_port' not in context:
+        app_module = context['app']
+        port = free_port()
+        threading.Thread(
+            target=lambda: app_module.socketio.run(app_module.app, host='127.0.0.1', port=port,
+                                                   use_reloader=False, allow_unsafe_werkzeug=True),
+            daemon=True
+        ).start()
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        context['server_port'] = port
+    return context['server_port']
+
+
+# ----------------------------------------------------------------------
+# 測試項目 / Benchmarks
+# ----------------------------------------------------------------------
+def bench_decode(args, context):
+    """寄存器解碼吞吐量 (IEEE 754 FLOAT32)"""
+    from backend.modbus.rtu_client import IEEE754Handler
+    
+    random.seed(42)
+    pairs = [IEEE754Handler.float_to_registers(random.uniform(0, 1000)) for _ in range(args.decode_samples)]
+    decode = IEEE754Handler.registers_to_float
+    for reg1, reg2 in pairs[:1000]:
+        decode(reg1, reg2)
+    
+    started = time.perf_counter()
+    for reg1, reg2 in pairs:
+        decode(reg1, reg2)
+    elapsed = time.perf_counter() - started
+    
+    return [{
+        'name': 'decode.float32',
+        'metrics': {
+            'values': len(pairs),
+            'values_per_s': round(len(pairs) / elapsed),
+            'ns_per_value': round(elapsed / len(pairs) * 1e9, 1)
+        }
+    }]
+
+
+def bench_acquisition(args, context):
+    """單一電表讀取與完整掃描 (本機 MODBUS TCP 模擬器)"""
+    from backend.modbus.rtu_client import ModbusRTUClient
+    
+    simulator = context['simulator']
+    client = ModbusRTUClient({'cache_expiry': 0})
+    if not client.connect():
+        raise RuntimeError(f"無法連接模擬器 127.0.0.1:{os.environ['RTU_SIMULATOR_PORT']}")
+    
+    samples = []
+    transactions_before = simulator.get_stats()['requests']
+    for _ in range(args.rounds):
+        for meter_id in range(1, args.meters + 1):
+            started = time.perf_counter()
+            data = client.read_meter_data(meter_id)
+            samples.append(time.perf_counter() - started)
+            if data.get('simulated'):
+                raise RuntimeError(f'電表 {meter_id} 讀取失敗，返回模擬值')
+    transactions = simulator.get_stats()['requests'] - transactions_before
+    client.disconnect()
+    
+    results = [{
+        'name': 'acquisition.read_meter_data',
+        'metrics': dict(latency_summary(samples),
+                        transactions_per_meter=round(transactions / len(samples), 1))
+    }]
+    
+    # 完整掃描: 與瀏覽器相同的 request_meter_data 事件 (讀取、寫入數據庫、回應)
+    import socketio as socketio_client
+    
+    app = context['app'].app
+    app.config['METER_COUNT'] = args.meters
+    app.config['RTU_ENABLED'] = True
+    port = start_server(context)
+    
+    response = threading.Event()
+    sio = socketio_client.Client(reconnection=False)
+    sio.on('meter_data_response', lambda data: response.set())
+    sio.connect(f'http://127.0.0.1:{port}', transports=['websocket'], wait_timeout=10)
+    sweep_samples = []
+    for index in range(args.sweeps):
+        response.clear()
+        started = time.perf_counter()
+        sio.emit('request_meter_data', {'request_id': f'bench-{index}', 'all_meters': True})
+        if not response.wait(120):
+            raise RuntimeError('掃描未返回 meter_data_response')
+        sweep_samples.append(time.perf_counter() - started)
+    sio.disconnect()
+    
+    results.append({
+        'name': f'acquisition.sweep[{args.meters}]',
+        'metrics': dict(latency_summary(sweep_samples),
+                        meters_per_s=round(args.meters * len(sweep_samples) / sum(sweep_samples), 1))
+    })
+    return results
+
+
+def bench_persistence(args, context):
+    """batch_save_meters 寫入速率"""
+    from backend.services import meter_service
+    
+    app = context['app'].app
+    meters = context['simulator'].meters
+    samples = []
+    rows = 0
+    with app.app_context():
+        for index in range(args.rounds + 1):
+            batch = [{
+                'meter_id': meter_id,
+                'voltage': 220.0, 'current': 5.0, 'power': 1100.0,
+                'energy': meters[meter_id].total_energy + (index + 1) * 0.1,
+                'power_on': True, 'power_status': 'powered'
+            } for meter_id in range(1, args.meters + 1)]
+            started = time.perf_counter()
+            saved = meter_service.batch_save_meters(batch)
+            elapsed = time.perf_counter() - started
+            if index == 0:
+                # 第一批建立電表記錄，不計入
+                continue
+            samples.append(elapsed)
+            rows += saved
+    
+    return [{
+        'name': f'persistence.batch_save_meters[{args.meters}]',
+        'metrics': dict(latency_summary(samples), rows_per_s=round(rows / sum(samples), 1))
+    }]
+
+
+def bench_api(args, context):
+    """/api/meters 延遲 (不同電表數量)"""
+    app = context['app'].app
+    app.config['RTU_ENABLED'] = False
+    client = app.test_client()
+    results = []
+    
+    for size in args.api_sizes:
+        app.config['METER_COUNT'] = size
+        for _ in range(3):
+            client.get('/api/meters')
+        
+        samples = []
+        response_bytes = 0
+        for _ in range(args.api_requests):
+            started = time.perf_counter()
+            response = client.get('/api/meters')
+            samples.append(time.perf_counter() - started)
+            response_bytes = len(response.data)
+            if response.status_code != 200:
+                raise RuntimeError(f'/api/meters 返回 {response.status_code}')
+        
+        results.append({
+            'name': f'api.meters[{size}]',
+            'metrics': dict(latency_summary(samples), response_bytes=response_bytes)
+        })
+    
+    app.config['METER_COUNT'] = args.meters
+    return results
+
+
+def bench_socketio(args, context):
+    """Socket.IO 廣播延遲 (N 個 websocket 客戶端)"""
+    import socketio as socketio_client
+    
+    app_module = context['app']
+    app = app_module.app
+    app.config['RTU_ENABLED'] = False
+    app.config['METER_COUNT'] = args.meters
+    with app.test_client() as client:
+        meters = client.get('/api/meters').get_json()['data']
+    
+    port = start_server(context)
+    
+    results = []
+    for count in args.clients:
+        lock = threading.Lock()
+        received = threading.Event()
+        latencies = []
+        state = {'pending': 0}
+        
+        def on_broadcast(data):
+            latency = time.perf_counter() - data['sent']
+            with lock:
+                latencies.append(latency)
+                state['pending'] -= 1
+                if state['pending'] == 0:
+                    received.set()
+        
+        clients = []
+        connect_samples = []
+        for _ in range(count):
+            sio = socketio_client.Client(reconnection=False)
+            sio.on('benchmark_broadcast', on_broadcast)
+            started = time.perf_counter()
+            sio.connect(f'http://127.0.0.1:{port}', transports=['websocket'], wait_timeout=10)
+            connect_samples.append(time.perf_counter() - started)
+            clients.append(sio)
+        
+        fanout_samples = []
+        lost = 0
+        for _ in range(args.broadcasts):
+            with lock:
+                state['pending'] = count
+                received.clear()
+            started = time.perf_counter()
+            app_module.socketio.emit('benchmark_broadcast', {'sent': started, 'data': meters})
+            fanout_samples.append(time.perf_counter() - started)
+            if not received.wait(10):
+                lost += state['pending']
+        
+        for sio in clients:
+            sio.disconnect()
+        
+        results.append({
+            'name': f'socketio.broadcast[{count}]',
+            'metrics': dict(latency_summary(latencies),
+                            connect_p95_ms=percentile(connect_samples, 95),
+                            emit_p95_ms=percentile(fanout_samples, 95),
+                            lost=lost)
+        })
+    return results
+
+
+BENCHMARKS = {
+    'decode': bench_decode,
+    'acquisition': bench_acquisition,
+    'persistence': bench_persistence,
+    'api': bench_api,
+    'socketio': bench_socketio
+}
+
+
+# ----------------------------------------------------------------------
+# 結果比較 / Result comparison
+# ----------------------------------------------------------------------
+def compare_results(results, baseline_path, threshold):
+    """與先前結果比較，列出超過門檻的退步"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {entry['name']: entry['metrics'] for entry in json.load(f)['results']}
+    
+    regressions = 0
+    print(f"\n📊 與 {baseline_path} 比較 (門檻 {threshold:.0%})")
+    for entry in results:
+        previous = baseline.get(entry['name'])
+        if previous is None:
+            continue
+        for metric, value in entry['metrics'].items():
+            old = previous.get(metric)
+            if not old or not isinstance(value, (int, float)):
+                continue
+            if metric.endswith('_per_s'):
+                change = (old - value) / old       # 越高越好
+            elif metric.endswith('_ms') or metric.endswith('_ns') or metric.startswith('ns_'):
+                change = (value - old) / old       # 越低越好
+            else:
+                continue
+            if change > threshold:
+                regressions += 1
+                print(f"   ❌ {entry['name']} {metric}: {old} → {value} ({change:+.0%})")
+            elif change < -threshold:
+                print(f"   ✅ {entry['name']} {metric}: {old} → {value} ({-change:+.0%} 改善)")
+    if not regressions:
+        print("   沒有超過門檻的退步")
+    return regressions
+
+
+def git_revision():
+    """目前的 git commit (無法取得時返回 None)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def parse_list(value, cast=str):
+    return [cast(item) for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='效能基準測試套件')
+    parser.add_argument('--only', type=parse_list, default=list(SECTIONS),
+                        help=f"執行的項目 (逗號分隔): {','.join(SECTIONS)}")
+    parser.add_argument('--meters', type=int, default=50, help='讀取、掃描與寫入測試的電表數量')
+    parser.add_argument('--rounds', type=int, default=5, help='讀取與寫入測試的輪數')
+    parser.add_argument('--sweeps', type=int, default=5, help='完整掃描次數')
+    parser.add_argument('--sim-baud', type=int, default=0,
+                        help='模擬器的串列波特率 (0 表示不模擬傳輸時間，9600 接近實際 RS-485 匯流排)')
+    parser.add_argument('--sim-latency-ms', type=float, default=0.0, help='模擬器的從站處理延遲 (毫秒)')
+    parser.add_argument('--decode-samples', type=int, default=200000, help='解碼測試的寄存器組數')
+    parser.add_argument('--api-sizes', type=lambda v: parse_list(v, int), default=[50, 500, 5000],
+                        help='/api/meters 測試的電表數量')
+    parser.add_argument('--api-requests', type=int, default=30, help='每種電表數量的請求次數')
+    parser.add_argument('--clients', type=lambda v: parse_list(v, int), default=[1, 10, 50],
+                        help='Socket.IO 客戶端數量')
+    parser.add_argument('--broadcasts', type=int, default=50, help='每種客戶端數量的廣播次數')
+    parser.add_argument('--output', help='結果 JSON 路徑 (預設: benchmarks/suite-<版本>-<時間>.json)')
+    parser.add_argument('--compare', help='與先前的結果 JSON 比較')
+    parser.add_argument('--threshold', type=float, default=0.10, help='視為退步的變化比例')
+    args = parser.parse_args()
+    
+    unknown = set(args.only) - set(SECTIONS)
+    if unknown:
+        parser.error(f"未知的項目: {', '.join(sorted(unknown))}")
+    
+    port = free_port()
+    prepare_environment(port)
+    from backend.modbus.simulator import ModbusSimulator, FaultProfile
+    
+    simulator = ModbusSimulator(range(1, args.meters + 1), seed=42,
+                                faults=FaultProfile(latency_ms=args.sim_latency_ms, baudrate=args.sim_baud))
+    simulator.start_tcp('127.0.0.1', port)
+    context = {'simulator': simulator}
+    if set(args.only) - {'decode'}:
+        context['app'] = load_app()
+    
+    from config import APP_INFO
+    
+    results = []
+    for section in SECTIONS:
+        if section not in args.only:
+            continue
+        print(f"🧪 {section}: {BENCHMARKS[section].__doc__}")
+        for entry in BENCHMARKS[section](args, context):
+            results.append(entry)
+            metrics = ', '.join(f'{key}={value}' for key, value in entry['metrics'].items())
+            print(f"   {entry['name']:<40} {metrics}")
+    simulator.stop()
+    
+    now = datetime.now()
+    report = {
+        'benchmark': 'suite',
+        'version': APP_INFO['version'],
+        'git_revision': git_revision(),
+        'timestamp': now.isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'results': results
+    }
+    
+    output = Path(args.output) if args.output else (
+        PROJECT_ROOT / 'benchmarks' / f"suite-{APP_INFO['version']}-{now:%Y%m%d-%H%M%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ 結果已寫入 {output}")
+    
+    if args.compare:
+        regressions = compare_results(results, args.compare, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
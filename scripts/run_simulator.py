@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Power Meter Web Edition - MODBUS 電表模擬器
+Local Modbus TCP / RTU meter simulator for load and fault testing without hardware
+
+用法 / Usage:
+    python scripts/run_simulator.py --units 50
+    python scripts/run_simulator.py --units 50 --baud 9600 --latency-ms 15 --jitter-ms 5 --loss 0.01 --dead 7,12-14
+    python scripts/run_simulator.py --no-tcp --rtu                 # 建立虛擬終端 (Linux)
+    python scripts/run_simulator.py --no-tcp --serial COM11        # com0com 虛擬串口對 (Windows)
+
+應用程式連線 / Point the application at it:
+    MODBUS_MODE=TCP RTU_SIMULATOR_HOST=127.0.0.1 RTU_SIMULATOR_PORT=5502 python app.py
+    RTU_PORT=<虛擬終端路徑> python app.py
+"""
+
+import sys
+import time
+import signal
+import logging
+import argparse
+from pathlib import Path
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from config import Config
+from backend.modbus.simulator import ModbusSimulator, FaultProfile
+
+
+def parse_units(value):
+    """解析單元 ID 列表，例如 "1-50" 或 "3,7,10-12" """
+    units = set()
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = map(int, part.split('-'))
+            units.update(range(start, end + 1))
+        else:
+            units.add(int(part))
+    return sorted(units)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MODBUS 電表模擬器')
+    parser.add_argument('--units', default=str(Config.METER_COUNT),
+                        help='模擬的單元 ID: 數量 (例如 50) 或範圍列表 (例如 1-20,31-40)')
+    parser.add_argument('--host', default=Config.RTU_SIMULATOR_HOST, help='TCP 監聽位址')
+    parser.add_argument('--port', type=int, default=Config.RTU_SIMULATOR_PORT, help='TCP 監聽埠')
+    parser.add_argument('--no-tcp', action='store_true', help='不啟動 MODBUS TCP 端點')
+    parser.add_argument('--rtu', action='store_true', help='建立虛擬終端作為 MODBUS RTU 端點 (POSIX)')
+    parser.add_argument('--serial', help='在指定串口提供 MODBUS RTU 端點')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='從站處理延遲 (毫秒)')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='延遲隨機變動幅度 ± (毫秒)')
+    parser.add_argument('--loss', type=float, default=0.0, help='回應遺失機率 (0-1)')
+    parser.add_argument('--dead', type=parse_units, default=[], help='不回應的單元 ID，例如 7,12-14')
+    parser.add_argument('--baud', type=int, default=0, help='模擬串列傳輸時間的波特率 (0 表示不模擬)')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='電能累積的時間倍率')
+    parser.add_argument('--seed', type=int, help='隨機種子 (可重現的負載與故障)')
+    parser.add_argument('--stats-interval', type=float, default=10.0, help='統計輸出間隔 (秒，0 表示不輸出)')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+    units = list(range(1, int(args.units) + 1)) if args.units.isdigit() else parse_units(args.units)
+    if args.no_tcp and not args.rtu and not args.serial:
+        parser.error('至少需要一個端點 (TCP、--rtu 或 --serial)')
+    
+    faults = FaultProfile(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, loss_rate=args.loss,
+                          dead_units=args.dead, baudrate=args.baud)
+    simulator = ModbusSimulator(units, faults=faults, time_scale=args.time_scale, seed=args.seed)
+    
+    print(f"🔌 MODBUS 電表模擬器: {len(units)} 個單元 ({units[0]}-{units[-1]})")
+    print(f"   故障設定: {faults.to_dict()}")
+    if not args.no_tcp:
+        port = simulator.start_tcp(args.host, args.port)
+        print(f"   TCP: {args.host}:{port}  →  MODBUS_MODE=TCP RTU_SIMULATOR_PORT={port}")
+    if args.rtu:
+        path = simulator.start_rtu()
+        print(f"   RTU: {path}  →  RTU_PORT={path}")
+    if args.serial:
+        simulator.start_rtu(args.serial, baudrate=args.baud or 9600)
+        print(f"   RTU: {args.serial}")
+    print("   按 Ctrl+C 停止")
+    
+    stopping = []
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    
+    last_report = time.monotonic()
+    while not stopping:
+        time.sleep(0.2)
+        if args.stats_interval and time.monotonic() - last_report >= args.stats_interval:
+            last_report = time.monotonic()
+            stats = simulator.get_stats()
+            print(f"📊 請求 {stats['requests']}  回應 {stats['responses']}  例外 {stats['exceptions']}  "
+                  f"無回應 {stats['no_response']}  遺失 {stats['dropped']}  CRC 錯誤 {stats['crc_errors']}")
+    
+    simulator.stop()
+    print("✅ 模擬器已停止")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Power Meter Web Edition - Socket.IO 負載測試
+Spawns N python-socketio clients that behave like the dashboard pages and
+measures connect time, end-to-end update latency and server CPU / RSS
+
+模式 / Modes:
+    poll       與 app.js 相同: 連線、join_room、定期送出 request_meter_data
+    subscribe  只連線並等待廣播；測試程式定期透過 PATCH /api/meters 觸發 meters_updated
+
+用法 / Usage:
+    python scripts/socketio_load_test.py --url http://127.0.0.1:5001 --clients 10,50,100 --duration 60
+    python scripts/socketio_load_test.py --mode subscribe --clients 200 --broadcast-interval 2
+
+每個客戶端使用獨立的背景執行緒，單一測試進程適合數百個客戶端；
+更多客戶端時可在多台機器或多個進程同時執行。
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime
+from urllib.parse import urlparse
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+try:
+    import requests
+    import socketio
+except ImportError as e:
+    print(f"❌ 缺少套件: {e.name}")
+    print("請執行：pip install -r requirements-bench.txt")
+    sys.exit(1)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from bench_stats import latency_summary
+
+
+# ----------------------------------------------------------------------
+# 伺服器資源監控 / Server resource monitor
+# ----------------------------------------------------------------------
+class ServerMonitor:
+    """
+    定期取樣伺服器進程的 CPU 與 RSS
+    
+    伺服器在本機時直接以 psutil 讀取進程；否則讀取 /api/system/status
+    回報的進程數據 (由伺服器背景取樣)。
+    """
+    
+    def __init__(self, base_url, interval=1.0, pid=None):
+        self.base_url = base_url
+        self.interval = interval
+        self.samples = []
+        self.source = 'api'
+        self._process = None
+        self._stop = threading.Event()
+        self._thread = None
+        
+        if pid is None:
+            pid = self._status_process().get('pid')
+        local_host = urlparse(base_url).hostname in ('127.0.0.1', 'localhost', '::1')
+        if psutil is not None and pid and local_host and psutil.pid_exists(pid):
+            self._process = psutil.Process(pid)
+            self._process.cpu_percent(interval=None)
+            self.source = 'psutil'
+    
+    def _status_process(self):
+        try:
+            response = requests.get(f'{self.base_url}/api/system/status', timeout=5)
+            return response.json()['data']['system'].get('process') or {}
+        except (requests.RequestException, ValueError, KeyError):
+            return {}
+    
+    def sample(self):
+        if self._process is not None:
+            with self._process.oneshot():
+                return {'cpu_percent': self._process.cpu_percent(interval=None),
+                        'rss': self._process.memory_info().rss,
+                        'threads': self._process.num_threads()}
+        process = self._status_process()
+        if not process:
+            return None
+        return {'cpu_percent': process.get('cpu_percent', 0.0), 'rss': process.get('memory_rss', 0),
+                'threads': process.get('threads')}
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            sample = self.sample()
+            if sample is not None:
+                sample['t'] = time.monotonic()
+                self.samples.append(sample)
+    
+    def start(self):
+        self.samples = []
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        
+        if not self.samples:
+            return {'source': self.source, 'samples': 0}
+        cpu = [sample['cpu_percent'] for sample in self.samples]
+        rss = [sample['rss'] for sample in self.samples]
+        return {
+            'source': self.source,
+            'samples': len(self.samples),
+            'cpu_percent_avg': round(sum(cpu) / len(cpu), 1),
+            'cpu_percent_max': round(max(cpu), 1),
+            'rss_start_mb': round(rss[0] / 1048576, 1),
+            'rss_end_mb': round(rss[-1] / 1048576, 1),
+            'rss_max_mb': round(max(rss) / 1048576, 1),
+            'threads_max': max((sample['threads'] or 0) for sample in self.samples)
+        }
+
+
+# ----------------------------------------------------------------------
+# 負載測試 / Load test
+# ----------------------------------------------------------------------
+class LoadStage:
+    """一個負載階段: 建立 N 個客戶端並維持 duration 秒"""
+    
+    def __init__(self, args, count):
+        self.args = args
+        self.count = count
+        self.lock = threading.Lock()
+        self.clients = []
+        self.connect_times = []
+        self.connect_errors = []
+        self.latencies = []
+        self.pending = {}           # request_id -> 送出時間 (poll 模式)
+        self.broadcast = None       # (序號, 送出時間, 已收到的客戶端) (subscribe 模式)
+        self.broadcasts_sent = 0
+        self.received = 0
+        self.unexpected_disconnects = 0
+        self.stopping = False
+    
+    # 客戶端 / Clients
+    def _create_client(self, index):
+        sio = socketio.Client(reconnection=False)
+        
+        @sio.on('meter_data_response')
+        def on_response(data):
+            received_at = time.perf_counter()
+            with self.lock:
+                self.received += 1
+                sent_at = self.pending.pop(data.get('request_id'), None)
+                if sent_at is not None:
+                    self.latencies.append(received_at - sent_at)
+        
+        @sio.on('meters_updated')
+        def on_meters_updated(data):
+            received_at = time.perf_counter()
+            with self.lock:
+                self.received += 1
+                if self.broadcast is not None and index not in self.broadcast[2]:
+                    self.broadcast[2].add(index)
+                    self.latencies.append(received_at - self.broadcast[1])
+        
+        @sio.on('disconnect')
+        def on_disconnect(*_):
+            if not self.stopping:
+                with self.lock:
+                    self.unexpected_disconnects += 1
+        
+        return sio
+    
+    def _connect(self, index):
+        sio = self._create_client(index)
+        started = time.perf_counter()
+        try:
+            sio.connect(self.args.url, transports=self.args.transports, wait_timeout=self.args.timeout)
+        except socketio.exceptions.ConnectionError as e:
+            with self.lock:
+                self.connect_errors.append(str(e))
+            return None
+        elapsed = time.perf_counter() - started
+        sio.emit('join_room', {'room': self.args.room})
+        with self.lock:
+            self.connect_times.append(elapsed)
+        return sio
+    
+    def _ramp_up(self):
+        """依 ramp 速率建立客戶端"""
+        delay = 1.0 / self.args.ramp if self.args.ramp > 0 else 0
+        threads = []
+        for index in range(self.count):
+            thread = threading.Thread(target=lambda i=index: self.clients.append((i, self._connect(i))),
+                                      daemon=True)
+            thread.start()
+            threads.append(thread)
+            if delay:
+                time.sleep(delay)
+        for thread in threads:
+            thread.join()
+        self.clients = [(index, sio) for index, sio in self.clients if sio is not None]
+    
+    # 負載 / Load generation
+    def _poll_loop(self, deadline):
+        """每個客戶端以隨機相位每 interval 秒送出一次 request_meter_data"""
+        interval = self.args.interval
+        schedule = [(time.monotonic() + random.uniform(0, interval), index, sio) for index, sio in self.clients]
+        sequence = 0
+        while time.monotonic() < deadline:
+            schedule.sort(key=lambda item: item[0])
+            due, index, sio = schedule[0]
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(min(wait, deadline - time.monotonic()) if deadline > time.monotonic() else 0)
+                continue
+            sequence += 1
+            request_id = f'load-{index}-{sequence}'
+            with self.lock:
+                self.pending[request_id] = time.perf_counter()
+            try:
+                sio.emit('request_meter_data', {'request_id': request_id, 'all_meters': True})
+            except socketio.exceptions.BadNamespaceError:
+                with self.lock:
+                    self.pending.pop(request_id, None)
+            schedule[0] = (due + interval, index, sio)
+    
+    def _broadcast_loop(self, deadline):
+        """定期以相同名稱更新一個電表，觸發 meters_updated 廣播"""
+        meter_id = self.args.broadcast_meter
+        response = requests.get(f'{self.args.url}/api/meters/{meter_id}', timeout=10)
+        name = response.json()['data']['name']
+        sequence = 0
+        
+        while time.monotonic() < deadline:
+            sequence += 1
+            with self.lock:
+                self.broadcast = (sequence, time.perf_counter(), set())
+            self.broadcasts_sent += 1
+            requests.patch(f'{self.args.url}/api/meters', json={'meters': [{'meter_id': meter_id, 'name': name}]},
+                           timeout=10)
+            time.sleep(min(self.args.broadcast_interval, max(0.0, deadline - time.monotonic())))
+    
+    def run(self, monitor):
+        print(f"🚀 {self.count} 個客戶端 ({self.args.mode} 模式)，建立連線中...")
+        monitor.start()
+        ramp_started = time.monotonic()
+        self._ramp_up()
+        ramp_seconds = time.monotonic() - ramp_started
+        print(f"   已連線 {len(self.clients)}/{self.count} ({ramp_seconds:.1f}s)，持續 {self.args.duration}s...")
+        
+        load_started = time.monotonic()
+        deadline = load_started + self.args.duration
+        if self.args.mode == 'poll':
+            self._poll_loop(deadline)
+        else:
+            self._broadcast_loop(deadline)
+        # 等待最後的回應
+        time.sleep(min(self.args.timeout, 2.0))
+        load_seconds = time.monotonic() - load_started
+        
+        self.stopping = True
+        for _, sio in self.clients:
+            try:
+                sio.disconnect()
+            except Exception:
+                pass
+        server = monitor.stop()
+        
+        if self.args.mode == 'poll':
+            expected = len(self.latencies) + len(self.pending)
+            missing = len(self.pending)
+        else:
+            expected = self.broadcasts_sent * len(self.clients)
+            missing = expected - len(self.latencies)
+        
+        return {
+            'clients': self.count,
+            'connected': len(self.clients),
+            'connect_errors': len(self.connect_errors),
+            'connect': latency_summary(self.connect_times),
+            'ramp_seconds': round(ramp_seconds, 2),
+            'updates': dict(latency_summary(self.latencies), expected=expected, missing=missing),
+            'messages_per_s': round(self.received / load_seconds, 1),
+            'unexpected_disconnects': self.unexpected_disconnects,
+            'server': server
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Socket.IO 負載測試')
+    parser.add_argument('--url', default='http://127.0.0.1:5001', help='伺服器網址')
+    parser.add_argument('--clients', type=lambda v: [int(item) for item in v.split(',') if item.strip()],
+                        default=[10, 50, 100], help='各階段的客戶端數量 (逗號分隔)')
+    parser.add_argument('--mode', choices=['poll', 'subscribe'], default='poll')
+    parser.add_argument('--duration', type=float, default=60.0, help='每個階段的持續秒數')
+    parser.add_argument('--ramp', type=float, default=20.0, help='每秒建立的客戶端數 (0 表示同時建立)')
+    parser.add_argument('--interval', type=float, default=5.0, help='poll 模式每個客戶端的請求間隔 (秒)')
+    parser.add_argument('--broadcast-interval', type=float, default=2.0, help='subscribe 模式的廣播觸發間隔 (秒)')
+    parser.add_argument('--broadcast-meter', type=int, default=1, help='subscribe 模式用於觸發廣播的電表 ID')
+    parser.add_argument('--room', default='dashboard', help='連線後加入的房間')
+    parser.add_argument('--transport', choices=['websocket', 'polling', 'upgrade'], default='upgrade',
+                        help='傳輸方式 (upgrade 與瀏覽器相同: polling 後升級為 websocket)')
+    parser.add_argument('--timeout', type=float, default=20.0, help='連線逾時 (秒)')
+    parser.add_argument('--server-pid', type=int, help='伺服器進程 ID (預設由 /api/system/status 取得)')
+    parser.add_argument('--sample-interval', type=float, default=1.0, help='伺服器資源取樣間隔 (秒)')
+    parser.add_argument('--output', help='報告 JSON 路徑 (預設: benchmarks/socketio-load-<模式>-<時間>.json)')
+    args = parser.parse_args()
+    args.url = args.url.rstrip('/')
+    args.transports = {'websocket': ['websocket'], 'polling': ['polling'],
+                       'upgrade': ['polling', 'websocket']}[args.transport]
+    
+    try:
+        requests.get(f'{args.url}/api/system/status', timeout=5).raise_for_status()
+    except requests.RequestException as e:
+        print(f"❌ 無法連接伺服器 {args.url}: {e}")
+        sys.exit(1)
+    
+    monitor = ServerMonitor(args.url, args.sample_interval, args.server_pid)
+    print(f"🧪 Socket.IO 負載測試: {args.url} ({args.transport}, 資源取樣: {monitor.source})")
+    
+    stages = []
+    for count in args.clients:
+        result = LoadStage(args, count).run(monitor)
+        stages.append(result)
+        updates = result['updates']
+        server = result['server']
+        print(f"   連線 p95 {result['connect']['p95_ms']} ms，錯誤 {result['connect_errors']}")
+        print(f"   更新延遲 p50 {updates['p50_ms']} / p95 {updates['p95_ms']} / p99 {updates['p99_ms']} ms，"
+              f"遺失 {updates['missing']}/{updates['expected']}，{result['messages_per_s']} msg/s")
+        if server.get('samples'):
+            print(f"   伺服器 CPU 平均 {server['cpu_percent_avg']}% (峰值 {server['cpu_percent_max']}%)，"
+                  f"RSS {server['rss_start_mb']} → {server['rss_end_mb']} MB")
+    
+    now = datetime.now()
+    report = {
+        'benchmark': 'socketio_load',
+        'timestamp': now.isoformat(),
+        'url': args.url,
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'transports')},
+        'stages': stages
+    }
+    output = Path(args.output) if args.output else (
+        PROJECT_ROOT / 'benchmarks' / f'socketio-load-{args.mode}-{now:%Y%m%d-%H%M%S}.json')
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ 報告已寫入 {output}")
+
+
+if __name__ == '__main__':
+    main()
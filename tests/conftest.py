@@ -0,0 +1,39 @@
+"""
+測試共用設定 / Shared pytest configuration
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# 添加專案根目錄到 Python 路徑
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+# 配置於匯入時讀取環境變數，需在匯入應用程式之前設定
+TEST_DB_DIR = tempfile.mkdtemp(prefix='power-meter-tests-')
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{Path(TEST_DB_DIR) / 'test.db'}")
+os.environ.setdefault('FLASK_ENV', 'production')
+
+
+@pytest.fixture(scope='session')
+def app():
+    """使用暫存資料庫的應用程式 (不啟動背景排程)"""
+    from app import create_app
+
+    application, _ = create_app()
+    application.config['TESTING'] = True
+    return application
+
+
+@pytest.fixture
+def app_context(app):
+    """應用程式上下文，結束時回滾未提交的變更"""
+    from backend.database import db
+
+    with app.app_context():
+        yield app
+        db.session.rollback()
@@ -0,0 +1,90 @@
+"""
+計費區段切分測試 / Billing segmentation tests
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.database import db, BillingRecord, MeterHistory
+from backend.services.billing_engine import BillingEngine, local_to_utc
+from backend.services.tariff_engine import tariff_engine
+
+DAY = datetime(2025, 3, 10)
+
+
+def at(hour, minute=0, day=0):
+    """本地時間轉換為 UTC (與系統時區無關)"""
+    return local_to_utc(DAY + timedelta(days=day, hours=hour, minutes=minute))
+
+
+def records(meter_id):
+    return BillingRecord.query.filter_by(meter_id=meter_id).order_by(BillingRecord.start_time).all()
+
+
+@pytest.fixture
+def engine(app_context):
+    """每個測試使用新的引擎狀態 (預設供電時段 06:00-22:00)"""
+    return BillingEngine()
+
+
+def test_split_at_schedule_transition(engine):
+    engine.record_reading(11, 100.0, at(21))
+    engine.record_reading(11, 101.0, at(21, 30))
+    engine.record_reading(11, 103.0, at(22, 30))
+    db.session.commit()
+
+    open_power, close_power = records(11)
+    assert open_power.power_schedule_type == 'open_power'
+    assert close_power.power_schedule_type == 'close_power'
+    # 21:30 到 22:30 的 2 度依時間內插，切換點前後各一半
+    assert open_power.energy_used == pytest.approx(2.0, abs=1e-3)
+    assert close_power.energy_used == pytest.approx(1.0, abs=1e-3)
+    assert open_power.end_time == close_power.start_time
+    assert close_power.end_time is None
+
+
+def test_split_at_local_midnight(engine):
+    engine.record_reading(12, 200.0, at(23))
+    engine.record_reading(12, 204.0, at(1, day=1))
+    db.session.commit()
+
+    before, after = records(12)
+    assert (before.billing_date, after.billing_date) == (DAY.date(), DAY.date() + timedelta(days=1))
+    assert before.power_schedule_type == after.power_schedule_type == 'close_power'
+    assert before.energy_used == pytest.approx(2.0, abs=1e-3)
+    assert after.energy_used == pytest.approx(2.0, abs=1e-3)
+    assert before.end_time == after.start_time == at(0, day=1)
+
+
+def test_counter_drop_is_not_billed(engine):
+    engine.record_reading(13, 500.0, at(10))
+    engine.record_reading(13, 0.5, at(10, 10))
+    engine.record_reading(13, 1.5, at(10, 20))
+    db.session.commit()
+
+    (segment,) = records(13)
+    assert segment.energy_used == pytest.approx(1.0)
+
+
+def test_segment_cost_matches_tariff_engine(engine):
+    previous = tariff_engine.get_tariff().to_dict()
+    tariff_engine.set_tariff({'name': 'test', 'default_price': 3.0,
+                              'bands': [{'name': 'peak', 'start': '21:00', 'end': '22:00', 'price': 6.0}]})
+    try:
+        for minutes, energy in ((0, 100.0), (30, 101.0), (90, 103.0)):
+            recorded_at = at(21 + minutes // 60, minutes % 60)
+            engine.record_reading(14, energy, recorded_at)
+            db.session.add(MeterHistory(meter_id=14, voltage=220.0, current=1.0, power=100.0, energy=energy,
+                                        power_on=True, power_status='powered', recorded_at=recorded_at))
+        db.session.commit()
+
+        open_power, close_power = records(14)
+        # 21:30 的 1 度為尖峰 6 元；22:30 的 2 度為 3 元 (切換點前後各 1 度)
+        assert open_power.total_cost == pytest.approx(9.0, abs=1e-2)
+        assert close_power.total_cost == pytest.approx(3.0, abs=1e-2)
+
+        costs = tariff_engine.compute_costs(at(20), at(23), meter_ids=[14])
+        assert costs['total_cost'] == pytest.approx(open_power.total_cost + close_power.total_cost, abs=1e-2)
+    finally:
+        tariff_engine.set_tariff(previous)
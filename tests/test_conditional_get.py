@@ -0,0 +1,38 @@
+"""
+條件式 GET 測試 / Conditional GET (ETag) tests
+"""
+
+import pytest
+
+from backend.database.models import SystemConfig
+
+
+@pytest.fixture
+def client(app_context):
+    return app_context.test_client()
+
+
+def test_unchanged_config_returns_304(client):
+    first = client.get('/api/system/config')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    second = client.get('/api/system/config', headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+
+    # 配置變更後回傳新內容
+    SystemConfig.set_value('update_interval', '45')
+    third = client.get('/api/system/config', headers={'If-None-Match': etag})
+    assert third.status_code == 200
+    assert third.headers['ETag'] != etag
+    assert third.get_json()['data']['update_interval']['current'] == 45
+
+
+@pytest.mark.parametrize('path', ['/api/meters', '/api/meters/1'])
+def test_live_meter_reads_are_not_cached(client, path):
+    # 即時讀數不經過資料版本，不可回應 304
+    response = client.get(path)
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert client.get(path, headers={'If-None-Match': '*'}).status_code == 200
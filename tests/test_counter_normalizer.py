@@ -0,0 +1,143 @@
+"""
+累積電能計數器正規化測試 / Counter normalizer tests
+"""
+
+import math
+import importlib
+from datetime import datetime
+
+import pytest
+
+from backend.services.counter_normalizer import (CounterNormalizer, FLAG_OK, FLAG_BASELINE, FLAG_RESET,
+                                                 FLAG_ROLLOVER, FLAG_IMPLAUSIBLE, FLAG_SIMULATED, FLAG_INVALID,
+                                                 FLAG_REBASE)
+
+# backend.services 匯出的同名實例會遮蔽模組屬性
+normalizer_module = importlib.import_module('backend.services.counter_normalizer')
+
+NOON = datetime(2025, 3, 10, 12, 0).timestamp()
+MIDNIGHT = datetime(2025, 3, 11).timestamp()
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def normalizer(request, monkeypatch):
+    """NumPy 與純 Python 兩種實作都需得到相同結果"""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+        monkeypatch.setattr(normalizer_module, 'HAS_NUMPY', True)
+    else:
+        monkeypatch.setattr(normalizer_module, 'HAS_NUMPY', False)
+    return CounterNormalizer()
+
+
+def reading(normalizer, previous, current, now, previous_at, simulated=False, meter_id=1):
+    result = normalizer.normalize([meter_id], [previous], [current], [simulated], now=now,
+                                  previous_at=[previous_at])
+    return {key: values[0] for key, values in result.items()}
+
+
+def test_normal_increment(normalizer):
+    result = reading(normalizer, 100.0, 101.5, NOON, NOON - 600)
+    assert result['flags'] == FLAG_OK
+    assert result['delta'] == pytest.approx(1.5)
+    assert result['today'] == pytest.approx(1.5)
+    assert result['baseline'] == 101.5
+
+
+def test_first_reading_only_sets_baseline(normalizer):
+    result = reading(normalizer, 0.0, 523.4, NOON, None)
+    assert result['flags'] == FLAG_BASELINE
+    assert result['delta'] == 0.0
+    assert result['baseline'] == 523.4
+
+
+def test_counter_reset_counts_energy_since_reset(normalizer):
+    result = reading(normalizer, 500.0, 0.3, NOON, NOON - 600)
+    assert result['flags'] == FLAG_RESET
+    assert result['delta'] == pytest.approx(0.3)
+    assert result['baseline'] == 0.3
+
+
+def test_counter_rollover(normalizer):
+    result = reading(normalizer, 999999.0, 0.5, NOON, NOON - 600)
+    assert result['flags'] == FLAG_ROLLOVER
+    assert result['delta'] == pytest.approx(1.4)
+    assert result['baseline'] == 0.5
+
+
+def test_implausible_jump_keeps_baseline(normalizer):
+    result = reading(normalizer, 100.0, 500.0, NOON, NOON - 60)
+    assert result['flags'] == FLAG_IMPLAUSIBLE
+    assert result['delta'] == 0.0
+    assert result['baseline'] == 100.0
+
+    # 跳動是瞬間錯誤: 下一筆正常讀數仍由原基準計算
+    result = reading(normalizer, 100.0, 101.0, NOON + 60, NOON)
+    assert result['flags'] == FLAG_OK
+    assert result['delta'] == pytest.approx(1.0)
+
+
+def test_implausible_jump_confirmed_by_next_reading(normalizer):
+    reading(normalizer, 100.0, 500.0, NOON, NOON - 60)
+    result = reading(normalizer, 100.0, 500.2, NOON + 60, NOON)
+    assert result['flags'] == FLAG_REBASE
+    assert result['delta'] == pytest.approx(0.2)
+    assert result['baseline'] == 500.2
+
+
+def test_unknown_previous_time_does_not_limit_growth(normalizer):
+    result = reading(normalizer, 100.0, 150.0, NOON, None)
+    assert result['flags'] == FLAG_OK
+    assert result['delta'] == pytest.approx(50.0)
+
+
+def test_midnight_split(normalizer):
+    # 午夜前後各 10 分鐘: 一半屬於今日
+    result = reading(normalizer, 100.0, 102.0, MIDNIGHT + 600, MIDNIGHT - 600)
+    assert result['flags'] == FLAG_OK
+    assert result['delta'] == pytest.approx(2.0)
+    assert result['today'] == pytest.approx(1.0)
+
+
+def test_simulated_and_invalid_keep_baseline(normalizer):
+    simulated = reading(normalizer, 100.0, 250.0, NOON, NOON - 60, simulated=True)
+    assert simulated['flags'] == FLAG_SIMULATED
+    assert simulated['delta'] == 0.0
+    assert simulated['baseline'] == 100.0
+
+    invalid = reading(normalizer, 100.0, float('nan'), NOON, NOON - 60, meter_id=2)
+    assert invalid['flags'] == FLAG_INVALID
+    assert invalid['delta'] == 0.0
+    assert invalid['baseline'] == 100.0
+
+
+def test_batch_classification(normalizer):
+    previous_at = NOON - 600
+    result = normalizer.normalize(
+        [1, 2, 3, 4],
+        previous=[100.0, 500.0, 999999.0, 100.0],
+        current=[101.0, 0.3, 0.5, 900.0],
+        simulated=[False, False, False, False],
+        now=NOON,
+        previous_at=[previous_at] * 4
+    )
+    assert result['flags'] == [FLAG_OK, FLAG_RESET, FLAG_ROLLOVER, FLAG_IMPLAUSIBLE]
+    assert [round(value, 3) for value in result['delta']] == [1.0, 0.3, 1.4, 0.0]
+    assert not any(math.isnan(value) for value in result['today'])
+
+
+def test_series_deltas_carry_baseline_and_reset():
+    normalizer = CounterNormalizer()
+    times = [NOON + 600 * index for index in range(5)]
+    # 由前一段基準 100.0 起算；第三筆計數器歸零
+    deltas = normalizer.series_deltas([100.5, 101.0, 0.2, 0.6, 0.9], times, baseline=100.0,
+                                      baseline_at=NOON - 600)
+    assert [round(delta, 3) for delta in deltas] == [0.5, 0.5, 0.2, 0.4, 0.3]
+
+
+def test_series_deltas_without_baseline_and_with_spike():
+    normalizer = CounterNormalizer()
+    times = [NOON + 60 * index for index in range(4)]
+    # 首筆只建立基準；第二筆為瞬間跳動，不影響之後的增量
+    deltas = normalizer.series_deltas([100.0, 900.0, 100.4, 100.8], times)
+    assert [round(delta, 3) for delta in deltas] == [0.0, 0.0, 0.4, 0.4]
@@ -0,0 +1,78 @@
+"""
+歷史鍵集分頁測試 / Keyset pagination tests
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.database import db, MeterHistory
+from backend.services.meter_service import meter_service
+
+T0 = datetime(2025, 3, 10, 4, 0)
+# 多筆記錄共用相同 recorded_at，頁面邊界會落在相同時間的記錄之間
+OFFSETS = [0, 0, 0, 60, 60, 120, 120]
+
+
+@pytest.fixture
+def history(app_context):
+    """電表 21 的歷史記錄 (電表 22 的記錄不應出現在結果中)"""
+    MeterHistory.query.filter(MeterHistory.meter_id.in_([21, 22])).delete(synchronize_session=False)
+    rows = [MeterHistory(meter_id=21, voltage=220.0, current=1.0, power=100.0, energy=100.0 + index,
+                         power_on=True, power_status='powered', recorded_at=T0 + timedelta(seconds=offset))
+            for index, offset in enumerate(OFFSETS)]
+    rows.append(MeterHistory(meter_id=22, voltage=220.0, current=1.0, power=100.0, energy=1.0,
+                             power_on=True, power_status='powered', recorded_at=T0))
+    db.session.add_all(rows)
+    db.session.commit()
+    # 記錄以唯一的 energy 辨識，預期順序為 (recorded_at, id)
+    expected = sorted((row.recorded_at, row.id, row.energy) for row in rows if row.meter_id == 21)
+    return [energy for _, _, energy in expected]
+
+
+def read_all(order, limit, **kwargs):
+    """依 next_cursor 讀完所有頁面，返回 (各筆 energy, 頁數)"""
+    ids, pages, cursor = [], 0, None
+    while True:
+        page = meter_service.get_meter_history_page(21, cursor=cursor, limit=limit, order=order,
+                                                    fields=['energy'], **kwargs)
+        pages += 1
+        ids.extend(record['energy'] for record in page['records'])
+        assert page['count'] <= limit
+        if not page['has_more']:
+            assert page['next_cursor'] is None
+            return ids, pages
+        cursor = page['next_cursor']
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 7])
+def test_pages_cover_equal_timestamps_once(history, limit):
+    ids, pages = read_all('asc', limit)
+    assert ids == history
+    assert pages == -(-len(history) // limit)
+
+
+@pytest.mark.parametrize('limit', [2, 4])
+def test_descending_pages(history, limit):
+    ids, _ = read_all('desc', limit)
+    assert ids == list(reversed(history))
+
+
+def test_exact_multiple_has_no_empty_last_page(history):
+    page = meter_service.get_meter_history_page(21, limit=len(history), fields=['energy'])
+    assert page['count'] == len(history)
+    assert page['has_more'] is False
+    assert page['next_cursor'] is None
+
+
+def test_time_range_is_half_open(history):
+    ids, _ = read_all('asc', 2, start=T0 + timedelta(seconds=60), end=T0 + timedelta(seconds=120))
+    assert ids == history[3:5]
+
+
+def test_cursor_must_match_order(history):
+    page = meter_service.get_meter_history_page(21, limit=2, order='asc', fields=['energy'])
+    with pytest.raises(ValueError):
+        meter_service.get_meter_history_page(21, cursor=page['next_cursor'], limit=2, order='desc')
+    with pytest.raises(ValueError):
+        meter_service.get_meter_history_page(21, cursor='not-a-cursor', limit=2)
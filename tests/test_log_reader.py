@@ -0,0 +1,176 @@
+"""
+日誌查詢測試 / Log reader tests
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.services.log_reader import LogReader
+
+START = datetime(2025, 3, 10, 8, 0, 0)
+
+
+def make_records(count, start=START, error_every=None, width=40):
+    """產生 (時間, 等級, 訊息) 記錄；每 4 筆一筆多行記錄，訊息長度不一以錯開區塊邊界"""
+    records = []
+    for i in range(count):
+        if error_every and i % error_every == 0:
+            level = 'ERROR'
+        else:
+            level = ('DEBUG', 'INFO', 'WARNING')[i % 3]
+        message = f'record {i} ' + 'x' * (i * 7 % width)
+        if i % 4 == 1:
+            message += f'\nTraceback (most recent call last):\n  File "worker.py", line {i}\nRuntimeError: {i}'
+        records.append((start + timedelta(seconds=i), level, message))
+    return records
+
+
+def write_log(path, records, newline='\n', mode='wb'):
+    lines = []
+    for number, (timestamp, level, message) in enumerate(records):
+        header = timestamp.strftime('%Y-%m-%d %H:%M:%S') + f',{timestamp.microsecond // 1000:03d}'
+        text = f'{header} {level}: {message} [in /srv/backend/app.py:{number + 1}]'
+        lines.extend(text.split('\n'))
+    with open(path, mode) as f:
+        f.write(''.join(line + newline for line in lines).encode('utf-8'))
+
+
+def expected(records, minimum=('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')):
+    return [(timestamp.isoformat(), level, message)
+            for timestamp, level, message in reversed(records) if level in minimum]
+
+
+def entries(result):
+    return [(log['timestamp'], log['level'], log['message']) for log in result['logs']]
+
+
+@pytest.fixture
+def reader():
+    """以很小的區塊/讀取量建立查詢服務，讓記錄大量跨越邊界"""
+    reader = LogReader()
+    reader.CHUNK_SIZE = 64
+    reader.BLOCK_SIZE = 512
+    return reader
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_reverse_reader_matches_forward_order(tmp_path, reader, newline):
+    path = tmp_path / 'app.log'
+    records = make_records(200)
+    write_log(path, records, newline)
+
+    result = reader.query(path, limit=1000, level='DEBUG')
+    assert entries(result) == expected(records)
+    assert all(log['module'] == 'app' for log in result['logs'])
+    assert result['logs'][0]['source'] == '/srv/backend/app.py:200'
+    assert len(reader._indexes[str(path)]['blocks']) > 10
+
+
+def test_default_sizes_carry_across_chunks(tmp_path):
+    reader = LogReader()
+    path = tmp_path / 'app.log'
+    records = make_records(900, width=1600)
+    write_log(path, records, '\r\n')
+    # 確認確實跨越多個 64 KiB 讀取與 256 KiB 區塊
+    assert path.stat().st_size > 2 * reader.BLOCK_SIZE
+
+    result = reader.query(path, limit=1000, level='DEBUG')
+    assert entries(result) == expected(records)
+    assert len(reader._indexes[str(path)]['blocks']) >= 3
+
+
+def test_limit_and_level(tmp_path, reader):
+    path = tmp_path / 'app.log'
+    records = make_records(200, error_every=25)
+    write_log(path, records)
+
+    assert entries(reader.query(path, limit=5, level='DEBUG')) == expected(records)[:5]
+    assert entries(reader.query(path, limit=1000)) == expected(records, ('INFO', 'WARNING', 'ERROR'))
+    assert entries(reader.query(path, limit=1000, level='warning')) == expected(records, ('WARNING', 'ERROR'))
+    assert entries(reader.query(path, limit=3, level='ERROR')) == expected(records, ('ERROR',))[:3]
+    with pytest.raises(ValueError):
+        reader.query(path, level='VERBOSE')
+
+
+def test_level_filter_skips_blocks(tmp_path, reader):
+    path = tmp_path / 'app.log'
+    # 只有最舊的一筆是 ERROR
+    records = make_records(200, error_every=1000)
+    write_log(path, records)
+
+    result = reader.query(path, limit=10, level='ERROR')
+    assert entries(result) == expected(records, ('ERROR',))
+    blocks = reader._indexes[str(path)]['blocks']
+    assert result['skipped_blocks'] == len(blocks) - 1
+    # 尾端未索引區段 (已為空) 與含 ERROR 的第一個區塊
+    assert result['scanned_blocks'] == 2
+
+
+def test_since_stops_at_older_blocks(tmp_path, reader):
+    path = tmp_path / 'app.log'
+    records = make_records(200)
+    write_log(path, records)
+
+    since = START + timedelta(seconds=150)
+    result = reader.query(path, limit=1000, level='DEBUG', since=since)
+    assert entries(result) == expected(records[150:])
+    assert result['scanned_blocks'] < len(reader._indexes[str(path)]['blocks'])
+
+
+def test_appended_records_extend_index(tmp_path, reader):
+    path = tmp_path / 'app.log'
+    records = make_records(100)
+    write_log(path, records)
+    reader.query(path)
+    blocks = len(reader._indexes[str(path)]['blocks'])
+
+    more = make_records(50, start=START + timedelta(hours=1))
+    write_log(path, more, mode='ab')
+    result = reader.query(path, limit=1000, level='DEBUG')
+    assert entries(result) == expected(records + more)
+    index = reader._indexes[str(path)]
+    assert index['indexed_to'] == path.stat().st_size
+    assert len(index['blocks']) > blocks
+
+
+def test_truncated_log_rebuilds_index(tmp_path, reader):
+    path = tmp_path / 'app.log'
+    write_log(path, make_records(200))
+    reader.query(path)
+
+    records = make_records(20, start=START + timedelta(days=1))
+    write_log(path, records)
+    result = reader.query(path, limit=1000, level='DEBUG')
+    assert entries(result) == expected(records)
+
+    index = reader._indexes[str(path)]
+    assert index['indexed_to'] == path.stat().st_size
+    with open(tmp_path / 'app.log.idx', encoding='utf-8') as f:
+        assert json.load(f)['indexed_to'] == path.stat().st_size
+
+    # 新的服務實例從旁路檔載入同一份索引
+    fresh = LogReader()
+    fresh.CHUNK_SIZE, fresh.BLOCK_SIZE = reader.CHUNK_SIZE, reader.BLOCK_SIZE
+    assert entries(fresh.query(path, limit=1000, level='DEBUG')) == expected(records)
+    assert fresh._indexes[str(path)]['blocks'] == index['blocks']
+
+
+def test_rotated_log_rebuilds_index(tmp_path, reader):
+    path = tmp_path / 'app.log'
+    write_log(path, make_records(50))
+    reader.query(path)
+
+    # 輪替後的新檔較大，只能由開頭內容辨識
+    records = make_records(80, start=START + timedelta(days=1))
+    write_log(path, records)
+    result = reader.query(path, limit=1000, level='DEBUG')
+    assert entries(result) == expected(records)
+    assert reader._indexes[str(path)]['indexed_to'] == path.stat().st_size
+
+
+def test_missing_log(tmp_path, reader):
+    result = reader.query(tmp_path / 'missing.log')
+    assert result['available'] is False and result['logs'] == []
+    assert reader.build_index(tmp_path / 'missing.log') is None
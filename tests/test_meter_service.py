@@ -0,0 +1,98 @@
+"""
+電表數據保存測試 / Meter batch persistence tests
+"""
+
+import pytest
+from sqlalchemy import event, update
+
+from backend.database import db, Meter
+from backend.services.counter_normalizer import counter_normalizer
+from backend.services.dashboard_aggregator import dashboard_aggregator
+from backend.services.meter_service import meter_service
+from backend.services.tariff_engine import tariff_engine
+
+
+def sweep(readings):
+    """模擬一次擷取掃描寫入: [(meter_id, energy), ...]"""
+    batch = [{'meter_id': meter_id, 'energy': energy, 'power': 1000.0, 'power_on': True}
+             for meter_id, energy in readings]
+    assert meter_service.batch_save_meters(batch) == len(batch)
+
+
+@pytest.fixture
+def statements(app_context):
+    """記錄執行的 SQL 語句"""
+    executed = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_execute)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', before_execute)
+
+
+def test_dashboard_update_runs_no_queries(app_context, statements, monkeypatch):
+    meter_ids = list(range(60, 65))
+    sweep([(meter_id, 100.0) for meter_id in meter_ids])
+    dashboard_aggregator.get_dashboard(meter_count=50)
+
+    during_update = []
+    record_readings = dashboard_aggregator.record_readings
+
+    def counting_record_readings(readings, *args, **kwargs):
+        start = len(statements)
+        record_readings(readings, *args, **kwargs)
+        during_update.append(len(statements) - start)
+
+    monkeypatch.setattr(dashboard_aggregator, 'record_readings', counting_record_readings)
+    sweep([(meter_id, 100.5) for meter_id in meter_ids])
+    assert during_update == [0]
+
+
+@pytest.fixture
+def flat_peak_tariff(app_context):
+    """全日尖峰 6.0 元，基本單價 3.0 元"""
+    previous = tariff_engine.get_tariff().to_dict()
+    tariff_engine.set_tariff({'name': 'test', 'default_price': 3.0,
+                              'bands': [{'name': 'peak', 'start': '00:00', 'end': '24:00', 'price': 6.0}]})
+    yield
+    tariff_engine.set_tariff(previous)
+
+
+def test_dashboard_cost_uses_time_of_use_prices(app_context, flat_peak_tariff):
+    dashboard_aggregator.get_dashboard(meter_count=50)
+    sweep([(66, 1000.0)])
+    sweep([(66, 1000.4)])
+
+    meter = Meter.query.filter_by(meter_id=66).one()
+    assert meter.cost_today == pytest.approx(2.4)
+
+    dashboard = dashboard_aggregator.get_dashboard(meter_count=50)
+    top = {item['meter_id']: item for item in dashboard['top_consumers']}
+    assert top[66]['cost'] == pytest.approx(2.4)
+    assert dashboard['summary']['total_cost'] == pytest.approx(
+        sum(row.cost_today or 0.0 for row in Meter.query.all()), abs=0.01)
+
+
+def test_sweep_does_not_undo_concurrent_daily_reset(app_context, monkeypatch):
+    sweep([(67, 500.0)])
+    sweep([(67, 500.4)])
+    assert Meter.query.filter_by(meter_id=67).one().daily_energy == pytest.approx(0.4)
+
+    # 掃描已載入電表記錄後，另一個連線完成每日重置
+    normalize = counter_normalizer.normalize
+
+    def normalize_then_reset(*args, **kwargs):
+        result = normalize(*args, **kwargs)
+        with db.engine.begin() as connection:
+            connection.execute(update(Meter).values(daily_energy=0.0, cost_today=0.0))
+        return result
+
+    monkeypatch.setattr(counter_normalizer, 'normalize', normalize_then_reset)
+    sweep([(67, 500.8)])
+
+    db.session.expire_all()
+    meter = Meter.query.filter_by(meter_id=67).one()
+    assert meter.daily_energy == pytest.approx(0.4)
+    assert meter.total_energy == pytest.approx(500.8)
@@ -0,0 +1,36 @@
+"""
+執行期指標測試 / Metrics registry tests
+"""
+
+from backend.database.config_cache import config_cache
+from backend.services.metrics import MetricsRegistry, render_metrics
+
+
+def test_render_counter_gauge_histogram():
+    registry = MetricsRegistry(prefix='test_')
+    counter = registry.counter('reads_total', 'Reads', ['slave'])
+    gauge = registry.gauge('clients', 'Clients')
+    histogram = registry.histogram('poll_seconds', 'Poll time', buckets=(0.1, 1.0))
+
+    counter.labels(3).inc()
+    counter.labels(3).inc(2)
+    gauge.set_function(lambda: 5)
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE test_reads_total counter' in lines
+    assert 'test_reads_total{slave="3"} 3' in lines
+    assert 'test_clients 5' in lines
+    assert 'test_poll_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_poll_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'test_poll_seconds_count 2' in lines
+
+
+def test_config_cache_counter_read_at_render(monkeypatch):
+    monkeypatch.setattr(config_cache, 'hits', 41)
+    monkeypatch.setattr(config_cache, 'misses', 2)
+    lines = render_metrics().splitlines()
+    assert lines.count('# TYPE powermeter_config_cache_requests_total counter') == 1
+    assert 'powermeter_config_cache_requests_total{result="hit"} 41' in lines
+    assert 'powermeter_config_cache_requests_total{result="miss"} 2' in lines
@@ -0,0 +1,26 @@
+"""
+MODBUS 錯誤分類測試 / Modbus error classification tests
+"""
+
+import pytest
+
+from backend.modbus.trace import OUTCOME_NAMES, outcome_for_exception
+from backend.services.metrics import classify_modbus_error
+
+
+@pytest.mark.parametrize('error, expected', [
+    (TimeoutError(), 'timeout'),
+    (OSError('Modbus Error: [Input/Output] No Response received from the remote slave'), 'timeout'),
+    (IOError('serial read timed out'), 'timeout'),
+    (OSError('No communication with the instrument (no answer)'), 'timeout'),
+    (ValueError('CRC mismatch'), 'exception'),
+    (KeyboardInterrupt(), 'exception')
+])
+def test_trace_and_metrics_agree(error, expected):
+    assert classify_modbus_error(error) == expected
+    assert OUTCOME_NAMES[outcome_for_exception(error)] == expected
+
+
+def test_error_response_object():
+    # pymodbus 回傳的錯誤回應不是例外
+    assert classify_modbus_error(object()) == 'error_response'
@@ -0,0 +1,64 @@
+"""
+MODBUS 匯流排指標測試 / Modbus bus metric tests
+"""
+
+import pytest
+
+from backend.services.metrics import (MODBUS_BUS_BUSY_SECONDS, MODBUS_ERRORS, MODBUS_POLL_SECONDS,
+                                      MODBUS_TRANSACTIONS)
+from backend.services.power_meter_controller import WebPowerMeterController
+
+SLAVE = 77
+
+
+class FakeInstrument:
+    """以固定回應取代 minimalmodbus.Instrument"""
+
+    def __init__(self, fail_reads=False):
+        self.fail_reads = fail_reads
+        self.relay = False
+
+    def read_registers(self, address, count, functioncode=3):
+        if self.fail_reads:
+            raise OSError('No communication with the instrument (no answer)')
+        return [0x4348, 0x0000]
+
+    def read_bit(self, address, functioncode=1):
+        return self.relay
+
+    def write_bit(self, address, value, functioncode=5):
+        raise OSError('Checksum error in rtu mode')
+
+
+def controller(instrument):
+    web_controller = WebPowerMeterController.__new__(WebPowerMeterController)
+    web_controller.slave_address = SLAVE
+    web_controller.instrument = instrument
+    return web_controller
+
+
+def value(metric, *labels):
+    return metric.labels(*labels).value
+
+
+def test_polls_count_transactions_and_bus_time():
+    transactions = value(MODBUS_TRANSACTIONS, SLAVE)
+    polls = MODBUS_POLL_SECONDS.labels(SLAVE).counts[:]
+    busy = value(MODBUS_BUS_BUSY_SECONDS)
+
+    data = controller(FakeInstrument()).get_monitoring_data()
+    assert data['success'] is True
+    assert value(MODBUS_TRANSACTIONS, SLAVE) == transactions + 4
+    assert sum(MODBUS_POLL_SECONDS.labels(SLAVE).counts) == sum(polls) + 1
+    assert value(MODBUS_BUS_BUSY_SECONDS) > busy
+
+
+def test_failed_reads_and_coil_writes_count_errors():
+    timeouts = value(MODBUS_ERRORS, SLAVE, 'timeout')
+    exceptions = value(MODBUS_ERRORS, SLAVE, 'exception')
+
+    web_controller = controller(FakeInstrument(fail_reads=True))
+    assert web_controller.read_kwh() == (None, None)
+    assert web_controller.control_relay('ON') is False
+    assert value(MODBUS_ERRORS, SLAVE, 'timeout') == timeouts + 1
+    assert value(MODBUS_ERRORS, SLAVE, 'exception') == exceptions + 1
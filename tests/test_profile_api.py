@@ -0,0 +1,48 @@
+"""
+效能分析 API 測試 / Sampling profiler API tests
+"""
+
+import pytest
+
+from backend.services.profiler import sampling_profiler
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    # 不啟動取樣執行緒；結束時還原全局分析器的設定與累計結果
+    monkeypatch.setattr(sampling_profiler, 'set_enabled', lambda enabled: setattr(sampling_profiler, 'enabled', enabled))
+    for name in ('enabled', 'sample_rate', 'interval'):
+        monkeypatch.setattr(sampling_profiler, name, getattr(sampling_profiler, name))
+    yield app.test_client()
+    sampling_profiler.reset()
+
+
+@pytest.mark.parametrize('body', [
+    {'enabled': 'false'},
+    {'enabled': 1},
+    {'reset': 'true'},
+    {'sample_rate': 2},
+    {'interval': 'fast'}
+])
+def test_update_rejects_invalid_values(client, body):
+    response = client.put('/api/system/profile', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == '參數格式錯誤'
+
+
+def test_update_toggles_and_resets(client):
+    response = client.put('/api/system/profile', json={'enabled': True, 'sample_rate': 0.5})
+    assert response.status_code == 200
+    assert response.get_json()['data']['enabled'] is True
+
+    sampling_profiler._samples = 3
+    response = client.put('/api/system/profile', json={'enabled': False, 'reset': True})
+    assert response.status_code == 200
+    assert response.get_json()['data']['enabled'] is False
+    assert response.get_json()['data']['samples'] == 0
+
+
+def test_get_does_not_reset(client):
+    sampling_profiler._samples = 3
+    assert client.get('/api/system/profile?format=json&reset=true').get_json()['data']['samples'] == 3
+    assert client.get('/api/system/profile?format=xml').status_code == 400
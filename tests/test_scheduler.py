@@ -0,0 +1,33 @@
+"""
+背景排程測試 / Scheduler tests
+"""
+
+from datetime import datetime
+
+from backend.services.scheduler import ScheduledJob, next_local_midnight
+
+
+def test_next_local_midnight():
+    assert next_local_midnight(datetime(2025, 3, 10, 12, 30)) == datetime(2025, 3, 11)
+    assert next_local_midnight(datetime(2025, 3, 10, 23, 59, 59)) == datetime(2025, 3, 11)
+    # 剛過午夜時排到下一個午夜，而非立即執行
+    assert next_local_midnight(datetime(2025, 3, 11)) == datetime(2025, 3, 12)
+
+
+def test_next_local_midnight_month_and_year_end():
+    assert next_local_midnight(datetime(2025, 2, 28, 18)) == datetime(2025, 3, 1)
+    assert next_local_midnight(datetime(2025, 12, 31, 23)) == datetime(2026, 1, 1)
+
+
+def test_daily_job_due_at_midnight():
+    job = ScheduledJob('daily_reset', lambda: None, next_run=next_local_midnight)
+    now = datetime(2025, 3, 10, 23, 59).timestamp()
+    assert job.first_due(now) == datetime(2025, 3, 11).timestamp()
+    assert job.following_due(datetime(2025, 3, 11).timestamp()) == datetime(2025, 3, 12).timestamp()
+
+
+def test_interval_job():
+    job = ScheduledJob('cleanup', lambda: None, interval=300, first_delay=30)
+    assert job.first_due(1000.0) == 1030.0
+    assert job.following_due(1030.0) == 1330.0
+    assert ScheduledJob('startup', lambda: None, interval=300, run_at_start=True).first_due(1000.0) == 1000.0
@@ -0,0 +1,116 @@
+"""
+分時電價與累進加價測試 / Tariff band and tier tests
+"""
+
+import importlib
+from datetime import datetime
+
+import pytest
+
+from backend.services.tariff_engine import CompiledTariff, TariffEngine
+
+# backend.services 匯出的同名實例會遮蔽模組屬性
+tariff_module = importlib.import_module('backend.services.tariff_engine')
+
+# 2025-03-10 為週一
+MONDAY = datetime(2025, 3, 10)
+
+TARIFF = {
+    'name': 'test',
+    'default_price': 3.0,
+    'bands': [
+        {'name': 'peak', 'start': '09:00', 'end': '17:00', 'price': 5.0, 'days': [0, 1, 2, 3, 4]},
+        {'name': 'night', 'start': '22:00', 'end': '06:00', 'price': 2.0}
+    ],
+    'tiers': [
+        {'up_to': 10, 'surcharge': 0.0},
+        {'up_to': 20, 'surcharge': 1.0},
+        {'up_to': None, 'surcharge': 2.0}
+    ]
+}
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def engine(request, monkeypatch):
+    """NumPy 與純 Python 兩種實作都需得到相同結果"""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+        monkeypatch.setattr(tariff_module, 'HAS_NUMPY', True)
+    else:
+        monkeypatch.setattr(tariff_module, 'HAS_NUMPY', False)
+    return TariffEngine()
+
+
+def epoch_hour(local_time):
+    return int(local_time.timestamp() // 3600)
+
+
+def test_band_lookup():
+    tariff = CompiledTariff(TARIFF)
+    assert tariff.price_at(MONDAY.replace(hour=10)) == 5.0
+    assert tariff.price_at(MONDAY.replace(hour=8)) == 3.0
+    # 跨日時段: 22:00 - 06:00
+    assert tariff.price_at(MONDAY.replace(hour=23)) == 2.0
+    assert tariff.price_at(MONDAY.replace(hour=5)) == 2.0
+    # 週末不適用尖峰時段
+    assert tariff.price_at(datetime(2025, 3, 15, 10)) == 3.0
+
+
+def test_tiers_must_increase():
+    with pytest.raises(ValueError):
+        CompiledTariff({'tiers': [{'up_to': 10, 'surcharge': 1.0}, {'up_to': 10, 'surcharge': 2.0}]})
+
+
+def test_non_whole_hour_boundary_rejected():
+    with pytest.raises(ValueError):
+        CompiledTariff({'bands': [{'start': '09:30', 'end': '17:00', 'price': 5.0}]})
+
+
+def test_band_pricing(engine):
+    tariff = CompiledTariff(TARIFF)
+    hours = [epoch_hour(MONDAY.replace(hour=10)), epoch_hour(MONDAY.replace(hour=23))]
+    result = engine.price_buckets([1, 1], hours, [2.0, 3.0], tariff)
+    assert result[1]['energy_kwh'] == pytest.approx(5.0)
+    assert result[1]['energy_cost'] == pytest.approx(2.0 * 5.0 + 3.0 * 2.0)
+    assert result[1]['tier_surcharge'] == 0.0
+
+
+@pytest.mark.parametrize('total, surcharge', [
+    (8.0, 0.0),
+    (10.0, 0.0),
+    (15.0, 5.0),
+    (20.0, 10.0),
+    (25.0, 20.0)
+])
+def test_tier_surcharge(engine, total, surcharge):
+    tariff = CompiledTariff(TARIFF)
+    hour = epoch_hour(MONDAY.replace(hour=7))
+    result = engine.price_buckets([1, 1], [hour, hour + 1], [total / 2, total / 2], tariff)
+    assert result[1]['energy_cost'] == pytest.approx(total * 3.0)
+    assert result[1]['tier_surcharge'] == pytest.approx(surcharge)
+    assert result[1]['total_cost'] == pytest.approx(total * 3.0 + surcharge)
+
+
+def test_tiers_apply_per_meter(engine):
+    tariff = CompiledTariff(TARIFF)
+    hour = epoch_hour(MONDAY.replace(hour=7))
+    result = engine.price_buckets([1, 2, 2], [hour, hour, hour + 1], [12.0, 6.0, 6.0], tariff)
+    assert result[1]['tier_surcharge'] == pytest.approx(2.0)
+    assert result[2]['tier_surcharge'] == pytest.approx(2.0)
+    assert result[2]['energy_kwh'] == pytest.approx(12.0)
+
+
+@pytest.mark.parametrize('days', [[7], [-1], [0, 9]])
+def test_band_days_out_of_range_rejected(days):
+    with pytest.raises(ValueError):
+        CompiledTariff({'bands': [{'start': '09:00', 'end': '17:00', 'price': 5.0, 'days': days}]})
+
+
+def test_put_tariff_with_invalid_day_returns_400(app_context):
+    previous = tariff_module.tariff_engine.get_tariff().to_dict()
+    response = app_context.test_client().put('/api/system/tariff', json={
+        'default_price': 3.0,
+        'bands': [{'start': '09:00', 'end': '17:00', 'price': 5.0, 'days': [7]}]
+    })
+    assert response.status_code == 400
+    assert tariff_module.tariff_engine.get_tariff().to_dict() == previous